@@ -1,6 +1,8 @@
 # backend/app.py
 
 import os
+import json
+import click
 import logging
 from logging.handlers import RotatingFileHandler
 from flask import Flask, jsonify, render_template, request, redirect, url_for
@@ -86,6 +88,7 @@ def create_app(config_class=Config):
     register_blueprints(app)
     register_error_handlers(app)
     register_core_routes(app)
+    register_cli_commands(app)
 
     # Socket.IO olaylarını içe aktar
     try:
@@ -261,13 +264,51 @@ def register_core_routes(app):
 
     @app.route("/health")
     def health_check():
+        from backend.ml.model_registry import model_registry
+        from backend.services.embedding_refresh_service import embedding_refresh_queue
+        from backend.services.recommendation_cache import recommendation_cache
+        from backend.ml.candidate_pipeline import candidate_pipeline
+        ml_status = model_registry.status()
         return jsonify({
             "status": "online",
             "environment": os.getenv("FLASK_ENV", "development"),
-            "version": "2.0.0"
+            "version": "2.0.0",
+            "ml_model_version": ml_status["active_version"],
+            "ml_models": ml_status,
+            "embedding_queue": embedding_refresh_queue.get_stats(),
+            "recommendation_cache": recommendation_cache.get_stats(),
+            "recommendation_pipeline": candidate_pipeline.get_stats()
         }), 200
 
 
+def register_cli_commands(app):
+    """Bakım / gece işleri komutları (flask <komut>)"""
+
+    @app.cli.command("materialize-similarities")
+    @click.option("--top-k", default=20, show_default=True, help="Kullanıcı başına saklanacak benzer kullanıcı")
+    @click.option("--min-score", default=0.3, show_default=True, help="Minimum benzerlik skoru")
+    @click.option("--n-jobs", default=-1, show_default=True, help="Süreç sayısı (-1 = tüm çekirdekler)")
+    @click.option("--restart", is_flag=True, help="Checkpoint'i yok say, yeni anlık görüntüyle başla")
+    @click.option("--generations", is_flag=True, help="Yeni nesle yaz, bitince aktif nesli değiştir")
+    def materialize_similarities(top_k, min_score, n_jobs, restart, generations):
+        """Tüm-çiftler top-k benzerliklerini user_similarities tablosuna yazar."""
+        from backend.services.similarity_materialization_service import SimilarityMaterializationJob
+        job = SimilarityMaterializationJob(top_k=top_k, min_score=min_score, n_jobs=n_jobs,
+                                           use_generations=generations)
+        report = job.run(resume=not restart)
+        click.echo(json.dumps(report, indent=2))
+
+    @app.cli.command("expire-similarities")
+    @click.option("--days", default=7, show_default=True, help="Bu günden eski kayıtlar silinir")
+    @click.option("--chunk-size", default=5000, show_default=True, help="Parça başına silinecek kayıt")
+    @click.option("--pause", default=0.05, show_default=True, help="Parçalar arası bekleme (s)")
+    def expire_similarities(days, chunk_size, pause):
+        """Süresi dolmuş benzerlik kayıtlarını parçalı siler."""
+        from backend.models.similarity_model import UserSimilarity
+        deleted = UserSimilarity.clear_old_similarities(days_old=days, chunk_size=chunk_size, pause=pause)
+        click.echo(f"{deleted} kayıt silindi")
+
+
 # Flask uygulamasını export et
 app = create_app()
 
@@ -0,0 +1,231 @@
+import numpy as np
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, Optional, Callable, Set, Tuple
+from backend.ml.metadata_index import SameAs
+from backend.ml.similarity_engine import top_k_indices
+
+logger = logging.getLogger(__name__)
+
+
+class StageStats:
+    """Aşama başına gecikme sayaçları (ms)."""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, items: int = 0):
+        ms = seconds * 1000.0
+        with self._lock:
+            stats = self._stats.setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                                   "last_ms": 0.0, "items": 0})
+            stats["count"] += 1
+            stats["total_ms"] += ms
+            stats["max_ms"] = max(stats["max_ms"], ms)
+            stats["last_ms"] = ms
+            stats["items"] += items
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                stage: {**stats, "avg_ms": stats["total_ms"] / stats["count"] if stats["count"] else 0.0}
+                for stage, stats in self._stats.items()
+            }
+
+
+class CandidatePipeline:
+    """
+    İki aşamalı benzer kullanıcı önerisi.
+
+    1) Aday üretimi (ucuz): ANN indeksinin adayları, aynı topluluktaki üyeler ve aynı bölümdeki
+       kullanıcılar; toplam aday bütçesi ve kaynak başına pay ile sınırlı.
+    2) Yeniden sıralama: adaylar tam blok-ağırlıklı skorla puanlanır, ardından iş kuralları
+       (pasif kullanıcılar, hariç tutulanlar, daha önce gösterilen öneriler) uygulanır.
+
+    Her aşamanın gecikmesi ayrı ölçülür.
+    """
+
+    SOURCES = ("ann", "community", "department")
+
+    def __init__(self, candidate_budget: int = 500, source_shares: Optional[Dict[str, float]] = None,
+                 seen_capacity: int = 50, max_tracked_users: int = 100000, random_state: int = 42):
+        self.candidate_budget = candidate_budget
+        self.source_shares = source_shares or {"ann": 0.6, "community": 0.25, "department": 0.15}
+        self.seen_capacity = seen_capacity
+        self.max_tracked_users = max_tracked_users
+        self.random_state = random_state
+        self.stage_stats = StageStats()
+        self._seen: "OrderedDict[str, deque]" = OrderedDict()  # user_id -> son gösterilen öneriler (LRU)
+        self._seen_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Gösterilen öneriler
+    # ------------------------------------------------------------------
+
+    def mark_seen(self, user_id: str, suggested_ids: List[str]):
+        with self._seen_lock:
+            seen = self._seen.get(user_id)
+            if seen is None:
+                seen = self._seen[user_id] = deque(maxlen=self.seen_capacity)
+            self._seen.move_to_end(user_id)
+            seen.extend(suggested_ids)
+            while len(self._seen) > self.max_tracked_users:
+                self._seen.popitem(last=False)
+
+    def seen(self, user_id: str) -> Set[str]:
+        with self._seen_lock:
+            return set(self._seen.get(user_id, ()))
+
+    # ------------------------------------------------------------------
+    # Aşama 1: aday üretimi
+    # ------------------------------------------------------------------
+
+    def _sample(self, rows: np.ndarray, size: int, row: int) -> np.ndarray:
+        """Kullanıcıya sabit tohumlu örneklem (ilk N satıra yanlılık olmasın)."""
+        if len(rows) <= size:
+            return rows
+        rng = np.random.default_rng(self.random_state + row)
+        return rng.choice(rows, size, replace=False)
+
+    def _community_rows(self, engine, assigner, user_id: str) -> np.ndarray:
+        if assigner is None:
+            return np.empty(0, dtype=np.intp)
+        rows = (engine.row_of(member) for member in assigner.community_members_of(user_id))
+        return np.asarray([row for row in rows if row is not None], dtype=np.intp)
+
+    def generate(self, engine, assigner, user_id: str,
+                 exclude_ids: Optional[Set[str]] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Aday satırları ve kaynak başına satırlar. Kaynaklar sırayla paylarına kadar doldurulur;
+        bir kaynağın kullanmadığı pay sonrakine devreder. Korpus bütçeden küçükse tüm satırlar adaydır.
+        exclude_ids baştan alınmış sayılır; elenecek kullanıcılar bütçe harcamaz.
+        Satır numaraları rerank'e kadar geçerli kalmalı: engine.lock.read() altında çağrılır (bkz. recommend).
+        """
+        start = time.perf_counter()
+        row = engine.row_of(user_id)
+        n = engine.n_rows
+        valid = engine.valid_mask()
+        budget = self.candidate_budget
+
+        sources: Dict[str, np.ndarray] = {}
+        if engine.user_count - 1 <= budget:
+            sources["all"] = np.flatnonzero(valid)
+        else:
+            taken = np.zeros(n, dtype=bool)
+            taken[row] = True
+            excluded = [r for r in map(engine.row_of, exclude_ids or ()) if r is not None]
+            taken[excluded] = True
+            remaining = budget
+            for position, source in enumerate(self.SOURCES):
+                quota = remaining if position == len(self.SOURCES) - 1 else \
+                    min(remaining, int(round(budget * self.source_shares.get(source, 0.0))))
+
+                source_start = time.perf_counter()
+                if source == "ann":
+                    rows = engine.ann_index.candidate_rows(engine.row_vector(row)) \
+                        if engine.ann_index is not None else np.empty(0, dtype=np.intp)
+                elif source == "community":
+                    rows = self._community_rows(engine, assigner, user_id)
+                else:
+                    rows = np.flatnonzero(SameAs('department').mask(engine, row) & valid)
+
+                rows = rows[valid[rows] & ~taken[rows]]
+                if len(rows) > quota and source == "ann":
+                    # ANN adayları bütçeye sığmazsa kaba skorla (kuantizer varsa kodlardan) en yakınlar tutulur
+                    coarse = engine.score_rows(row, rows, quantized=True)
+                    rows = rows[top_k_indices(coarse, quota)]
+                else:
+                    rows = self._sample(rows, quota, row)
+
+                taken[rows] = True
+                sources[source] = rows
+                remaining -= len(rows)
+                self.stage_stats.record(f"candidates.{source}", time.perf_counter() - source_start, len(rows))
+
+            # Kaynaklar bütçeyi dolduramadıysa rastgele örneklemle tamamlanır
+            if remaining > 0:
+                rows = np.flatnonzero(valid & ~taken)
+                sources["random"] = self._sample(rows, remaining, row)
+
+        candidates = np.unique(np.concatenate(list(sources.values()))) if sources else np.empty(0, dtype=np.intp)
+        candidates = candidates[candidates != row]
+        self.stage_stats.record("candidates", time.perf_counter() - start, len(candidates))
+        return candidates, sources
+
+    # ------------------------------------------------------------------
+    # Aşama 2: yeniden sıralama
+    # ------------------------------------------------------------------
+
+    def rerank(self, engine, user_id: str, candidates: np.ndarray, limit: int,
+               weights: Optional[Dict[str, float]] = None, exclude_ids: Optional[Set[str]] = None,
+               active_filter: Optional[Callable[[List[str]], Set[str]]] = None) -> List[Dict[str, Any]]:
+        """
+        Adayları tam skorla puanlar ve iş kurallarını uygular.
+        exclude_ids: doğrudan elenecek kullanıcılar (ör. mevcut bağlantılar).
+        active_filter: user_id listesinden aktif olanları döndüren çağrı (ör. tek DB sorgusu);
+        yalnızca en iyi pencere için çağrılır.
+        Daha önce gösterilen öneriler sona itilir: yeni aday kalmazsa yeniden gösterilebilir.
+        """
+        start = time.perf_counter()
+        row = engine.row_of(user_id)
+        if len(candidates) == 0:
+            return []
+
+        scores = engine.score_rows(row, candidates, weights)
+        if exclude_ids:
+            excluded = np.fromiter((uid in exclude_ids for uid in engine.user_ids_at(candidates)),
+                                   dtype=bool, count=len(candidates))
+            scores[excluded] = -np.inf
+
+        seen = self.seen(user_id)
+        window = top_k_indices(scores, min(len(candidates), (limit + len(seen)) * 3))
+        window = window[np.isfinite(scores[window])]
+        window_ids = engine.user_ids_at(candidates[window])
+
+        active = active_filter(window_ids) if active_filter is not None else None
+        fresh, repeated = [], []
+        for i, uid in zip(window, window_ids):
+            if active is not None and uid not in active:
+                continue
+            (repeated if uid in seen else fresh).append((i, uid))
+
+        results = [
+            {
+                'user_id': uid,
+                'similarity_score': round(float(scores[i]), 4),
+                'metadata': engine.user_metadata.get(uid)
+            }
+            for i, uid in (fresh + repeated)[:limit]
+        ]
+        self.stage_stats.record("rerank", time.perf_counter() - start, len(candidates))
+        return results
+
+    def recommend(self, engine, assigner, user_id: str, limit: int = 5,
+                  weights: Optional[Dict[str, float]] = None, exclude_ids: Optional[Set[str]] = None,
+                  active_filter: Optional[Callable[[List[str]], Set[str]]] = None) -> List[Dict[str, Any]]:
+        """Aday üretimi + yeniden sıralama; gösterilen öneriler işaretlenir."""
+        start = time.perf_counter()
+        # İki aşama aynı satır düzenini görmeli: arka plan yenilemeleri arada satır taşıyamaz
+        with engine.lock.read():
+            if not engine.has_user(user_id) or engine.user_count < 2:
+                return []
+            candidates, _ = self.generate(engine, assigner, user_id, exclude_ids)
+            results = self.rerank(engine, user_id, candidates, limit, weights, exclude_ids, active_filter)
+        self.mark_seen(user_id, [r['user_id'] for r in results])
+        self.stage_stats.record("total", time.perf_counter() - start, len(results))
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "candidate_budget": self.candidate_budget,
+            "source_shares": self.source_shares,
+            "stages": self.stage_stats.snapshot(),
+            "tracked_users": len(self._seen)
+        }
+
+
+# Global pipeline instance
+candidate_pipeline = CandidatePipeline()
@@ -0,0 +1,63 @@
+import numpy as np
+import logging
+from typing import Dict, Any, Optional
+from sklearn.metrics import silhouette_score, davies_bouldin_score, calinski_harabasz_score
+
+logger = logging.getLogger(__name__)
+
+# Silhouette O(s^2) ikili mesafe ister; örneklem boyutu bu sınırla kırpılır (s^2 <= MAX_PAIRWISE)
+DEFAULT_SILHOUETTE_SAMPLE = 5000
+MAX_PAIRWISE = 25_000_000
+
+
+def silhouette_sample_size(n: int, sample_size: int = DEFAULT_SILHOUETTE_SAMPLE,
+                           max_pairwise: int = MAX_PAIRWISE) -> int:
+    """İstenen örneklem boyutunu veri boyutu ve ikili iş sınırıyla kırpar."""
+    return int(min(n, sample_size, int(np.sqrt(max_pairwise))))
+
+
+def sampled_silhouette(embeddings: np.ndarray, labels: np.ndarray,
+                       sample_size: int = DEFAULT_SILHOUETTE_SAMPLE, max_pairwise: int = MAX_PAIRWISE,
+                       random_state: int = 42) -> Optional[float]:
+    """
+    Sabit tohumlu örneklem üzerinde silhouette. İkili mesafe sayısı max_pairwise'ı aşmaz.
+    Tanımsızsa (tek küme, her nokta ayrı küme) None döner.
+    """
+    n = len(embeddings)
+    size = silhouette_sample_size(n, sample_size, max_pairwise)
+    if size < 2:
+        return None
+
+    if size < n:
+        rng = np.random.default_rng(random_state)
+        idx = rng.choice(n, size, replace=False)
+        embeddings, labels = embeddings[idx], labels[idx]
+
+    if not 1 < len(np.unique(labels)) < len(labels):
+        return None
+    return float(silhouette_score(embeddings, labels))
+
+
+def clustering_quality(embeddings: np.ndarray, labels: np.ndarray,
+                       sample_size: int = DEFAULT_SILHOUETTE_SAMPLE, max_pairwise: int = MAX_PAIRWISE,
+                       random_state: int = 42) -> Dict[str, Any]:
+    """
+    Sınırlı maliyetli kümeleme kalite metrikleri:
+    örneklenmiş silhouette (O(s^2), s sınırlı), Davies-Bouldin ve Calinski-Harabasz (O(n*k)).
+    """
+    embeddings = np.asarray(embeddings)
+    labels = np.asarray(labels)
+    n_labels = len(np.unique(labels))
+
+    metrics: Dict[str, Any] = {
+        "silhouette_score": sampled_silhouette(embeddings, labels, sample_size, max_pairwise, random_state),
+        "silhouette_sample_size": silhouette_sample_size(len(embeddings), sample_size, max_pairwise),
+        "davies_bouldin_score": None,
+        "calinski_harabasz_score": None
+    }
+
+    if 1 < n_labels < len(labels):
+        metrics["davies_bouldin_score"] = float(davies_bouldin_score(embeddings, labels))
+        metrics["calinski_harabasz_score"] = float(calinski_harabasz_score(embeddings, labels))
+
+    return metrics
@@ -2,24 +2,74 @@ import numpy as np
 import joblib
 import pandas as pd
 from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
 import logging
 import os
-from typing import Dict, List, Any, Tuple
+import time
+import threading
+from collections import OrderedDict
+from joblib import Parallel, delayed
+from typing import Dict, List, Any, Tuple, Optional
+from backend.ml.cluster_metrics import clustering_quality, sampled_silhouette, DEFAULT_SILHOUETTE_SAMPLE, MAX_PAIRWISE
 
 logger = logging.getLogger(__name__)
 
 
+def _fit_candidate_k(sample: np.ndarray, k: int, random_state: int, silhouette_sample: int) -> Dict[str, Any]:
+    """Tek bir k adayını örneklem üzerinde eğitip skorlar (joblib işçisinde çalışır)."""
+    start = time.perf_counter()
+    kmeans = KMeans(n_clusters=k, n_init='auto', random_state=random_state)
+    labels = kmeans.fit_predict(sample)
+
+    return {
+        "k": k,
+        "inertia": float(kmeans.inertia_),
+        "silhouette": sampled_silhouette(sample, labels, silhouette_sample, random_state=random_state),
+        "seconds": time.perf_counter() - start
+    }
+
+
+def stratified_sample(n: int, sample_size: int, strata: Optional[np.ndarray] = None,
+                      random_state: int = 42) -> np.ndarray:
+    """
+    n satırdan sample_size'lık indeks örneklemi. strata verilirse (ör. önceki küme etiketleri,
+    bölüm kodları) her grup oranı kadar, en az bir örnekle temsil edilir.
+    """
+    rng = np.random.default_rng(random_state)
+    if sample_size >= n:
+        return np.arange(n)
+    if strata is None:
+        return np.sort(rng.choice(n, sample_size, replace=False))
+
+    strata = np.asarray(strata)
+    chosen = []
+    for value in np.unique(strata):
+        members = np.flatnonzero(strata == value)
+        quota = max(1, int(round(sample_size * len(members) / n)))
+        chosen.append(rng.choice(members, min(quota, len(members)), replace=False))
+    return np.sort(np.concatenate(chosen))
+
+
 class ClusteringModel:
     """Kullanıcı kümeleme modeli sınıfı"""
 
-    def __init__(self, n_clusters: int = 5, random_state: int = 42):
+    def __init__(self, n_clusters: int = 5, random_state: int = 42,
+                 silhouette_sample_size: int = DEFAULT_SILHOUETTE_SAMPLE, max_pairwise: int = MAX_PAIRWISE):
         self.n_clusters = n_clusters
         self.random_state = random_state
+        # Kalite metriklerinin maliyet sınırı (bkz. cluster_metrics)
+        self.silhouette_sample_size = silhouette_sample_size
+        self.max_pairwise = max_pairwise
         self.model = KMeans(n_clusters=n_clusters, random_state=random_state)
         self.is_trained = False
         self.cluster_centers_ = None
         self.labels_ = None
+        self.k_selection_report_: Optional[Dict[str, Any]] = None  # son paralel k seçiminin raporu
+
+        # CSR küme -> satır indeksi: kümenin satırları cluster_rows_[offsets[c]:offsets[c + 1]]
+        self.cluster_rows_: Optional[np.ndarray] = None
+        self.cluster_offsets_: Optional[np.ndarray] = None
+        # Aynı sırada dizilmiş embedding'ler; her küme bitişik bir bloktur (kopyasız dilim)
+        self.cluster_embeddings_: Optional[np.ndarray] = None
 
     def train(self, embeddings: np.ndarray) -> Dict[str, Any]:
         """Modeli kullanıcı embedding'leri üzerinde eğit"""
@@ -32,12 +82,12 @@ class ClusteringModel:
             self.labels_ = self.model.fit_predict(embeddings)
             self.cluster_centers_ = self.model.cluster_centers_
             self.is_trained = True
+            self._build_cluster_index(embeddings)
 
-            # Kümeleme kalitesini değerlendir
-            if len(np.unique(self.labels_)) > 1:
-                silhouette_avg = silhouette_score(embeddings, self.labels_)
-            else:
-                silhouette_avg = 0.0
+            # Kümeleme kalitesini değerlendir (örneklenmiş silhouette + O(n*k) metrikler)
+            quality = clustering_quality(embeddings, self.labels_, self.silhouette_sample_size,
+                                         self.max_pairwise, self.random_state)
+            silhouette_avg = quality["silhouette_score"] or 0.0
 
             # Küme istatistikleri
             cluster_counts = np.bincount(self.labels_)
@@ -52,13 +102,39 @@ class ClusteringModel:
                 "silhouette_score": float(silhouette_avg),
                 "cluster_stats": cluster_stats,
                 "n_clusters": self.n_clusters,
-                "n_samples": len(embeddings)
+                "n_samples": len(embeddings),
+                "quality_metrics": quality
             }
 
         except Exception as e:
             logger.error(f"Kümeleme eğitim hatası: {str(e)}")
             return {"success": False, "error": str(e)}
 
+    def _build_cluster_index(self, embeddings: Optional[np.ndarray] = None):
+        """labels_'tan CSR küme indeksini (ve verilirse küme sıralı embedding bloğunu) kurar."""
+        if self.labels_ is None:
+            self.cluster_rows_ = self.cluster_offsets_ = self.cluster_embeddings_ = None
+            return
+
+        labels = np.asarray(self.labels_)
+        self.cluster_rows_ = np.argsort(labels, kind='stable')
+        counts = np.bincount(labels, minlength=self.n_clusters)
+        self.cluster_offsets_ = np.concatenate([[0], np.cumsum(counts)])
+        if embeddings is not None:
+            self.cluster_embeddings_ = np.ascontiguousarray(np.asarray(embeddings)[self.cluster_rows_])
+
+    def cluster_rows(self, cluster_id: int) -> np.ndarray:
+        """Kümeye ait eğitim satırlarının indeksleri (O(1) dilim)."""
+        if self.cluster_offsets_ is None or not 0 <= cluster_id < len(self.cluster_offsets_) - 1:
+            return np.empty(0, dtype=np.intp)
+        return self.cluster_rows_[self.cluster_offsets_[cluster_id]:self.cluster_offsets_[cluster_id + 1]]
+
+    def cluster_block(self, cluster_id: int) -> Optional[np.ndarray]:
+        """Kümenin eğitim embedding'leri; bitişik blok, kopyasız."""
+        if self.cluster_embeddings_ is None or not 0 <= cluster_id < len(self.cluster_offsets_) - 1:
+            return None
+        return self.cluster_embeddings_[self.cluster_offsets_[cluster_id]:self.cluster_offsets_[cluster_id + 1]]
+
     def predict(self, embeddings: np.ndarray) -> np.ndarray:
         """Yeni embedding'ler için küme tahmini yap"""
         try:
@@ -74,8 +150,12 @@ class ClusteringModel:
             logger.error(f"Küme tahmin hatası: {str(e)}")
             return np.array([-1] * len(embeddings))  # Geçersiz küme
 
-    def find_optimal_clusters(self, embeddings: np.ndarray, max_k: int = 10) -> int:
-        """Optimal küme sayısını bul (Elbow method)"""
+    def find_optimal_clusters(self, embeddings: np.ndarray, max_k: int = 10, parallel: bool = False,
+                              **parallel_kwargs) -> int:
+        """Optimal küme sayısını bul (Elbow method). parallel=True: bkz. find_optimal_clusters_parallel"""
+        if parallel:
+            return self.find_optimal_clusters_parallel(embeddings, max_k=max_k, **parallel_kwargs)["k"]
+
         try:
             if len(embeddings) < 2:
                 return 1
@@ -107,6 +187,65 @@ class ClusteringModel:
             logger.error(f"Optimal küme bulma hatası: {str(e)}")
             return 2  # Varsayılan
 
+    def find_optimal_clusters_parallel(self, embeddings: np.ndarray, max_k: int = 10, min_k: int = 2,
+                                       sample_size: int = 10000, silhouette_sample: int = 2000,
+                                       strata: Optional[np.ndarray] = None, n_jobs: int = -1,
+                                       refit: bool = False) -> Dict[str, Any]:
+        """
+        Aday k değerlerini tabakalı bir örneklem üzerinde joblib süreçleriyle paralel eğitir.
+        Her aday inertia ve örneklenmiş silhouette ile skorlanır; en yüksek silhouette kazanır
+        (silhouette hesaplanamazsa elbow kuralı kullanılır). refit=True ise yalnızca kazanan k
+        tüm veri üzerinde eğitilir. k başına süreler rapora yazılır.
+        """
+        start = time.perf_counter()
+        try:
+            n = len(embeddings)
+            max_k = min(max_k, n - 1)
+            if max_k < min_k:
+                return {"success": False, "k": max(1, max_k), "message": "Yeterli veri yok"}
+
+            if strata is None and self.is_trained and self.labels_ is not None and len(self.labels_) == n:
+                strata = self.labels_  # önceki kümeler doğal tabakalardır
+            sample = np.asarray(embeddings)[stratified_sample(n, sample_size, strata, self.random_state)]
+
+            candidates = Parallel(n_jobs=n_jobs)(
+                delayed(_fit_candidate_k)(sample, k, self.random_state, silhouette_sample)
+                for k in range(min_k, max_k + 1)
+            )
+
+            inertias = [c["inertia"] for c in candidates]
+            elbow_k = candidates[0]["k"]
+            if len(inertias) >= 3:
+                elbow_k = candidates[int(np.argmax(np.abs(np.diff(inertias, n=2)))) + 1]["k"]
+
+            scored = [c for c in candidates if c["silhouette"] is not None]
+            best_k = max(scored, key=lambda c: c["silhouette"])["k"] if scored else elbow_k
+
+            report = {
+                "success": True,
+                "k": best_k,
+                "elbow_k": elbow_k,
+                "sample_size": len(sample),
+                "candidates": candidates,
+                "search_seconds": time.perf_counter() - start
+            }
+
+            if refit:
+                refit_start = time.perf_counter()
+                self.n_clusters = best_k
+                self.model = KMeans(n_clusters=best_k, random_state=self.random_state)
+                report["train"] = self.train(embeddings)
+                report["refit_seconds"] = time.perf_counter() - refit_start
+
+            self.k_selection_report_ = report
+            logger.info(f"Paralel k seçimi: k={best_k} (elbow: {elbow_k}), "
+                        f"{len(candidates)} aday, {report['search_seconds']:.2f}s")
+            return report
+
+        except Exception as e:
+            logger.error(f"Paralel optimal küme bulma hatası: {str(e)}")
+            return {"success": False, "k": 2, "error": str(e)}
+
     def get_cluster_characteristics(self, user_data: List[Dict], embeddings: np.ndarray) -> Dict[int, Dict[str, Any]]:
         """Kümelerin karakteristik özelliklerini analiz et"""
         try:
@@ -115,11 +254,12 @@ class ClusteringModel:
 
             cluster_chars = {}
 
+            if self.cluster_offsets_ is None:
+                self._build_cluster_index()
+
             for cluster_id in range(self.n_clusters):
-                # Küme üyelerini bul
-                cluster_mask = (self.labels_ == cluster_id)
-                cluster_embeddings = embeddings[cluster_mask]
-                cluster_users = [user_data[i] for i in range(len(user_data)) if cluster_mask[i]]
+                # Küme üyeleri CSR indeksinden (yalnızca kümenin satırları gezilir)
+                cluster_users = [user_data[i] for i in self.cluster_rows(cluster_id)]
 
                 if len(cluster_users) == 0:
                     continue
@@ -191,7 +331,10 @@ class ClusteringModel:
                 'cluster_centers_': self.cluster_centers_,
                 'labels_': self.labels_,
                 'n_clusters': self.n_clusters,
-                'random_state': self.random_state
+                'random_state': self.random_state,
+                'cluster_rows_': self.cluster_rows_,
+                'cluster_offsets_': self.cluster_offsets_,
+                'cluster_embeddings_': self.cluster_embeddings_
             }
 
             joblib.dump(model_data, filepath)
@@ -200,17 +343,22 @@ class ClusteringModel:
         except Exception as e:
             logger.error(f"Model kaydetme hatası: {str(e)}")
 
-    def load_model(self, filepath: str) -> bool:
-        """Modeli yükle"""
+    def load_model(self, filepath: str, mmap_mode: Optional[str] = None) -> bool:
+        """Modeli yükle. mmap_mode='r' ile büyük diziler (labels_, küme blokları) diskten eşlenir."""
         try:
             if os.path.exists(filepath):
-                model_data = joblib.load(filepath)
+                model_data = joblib.load(filepath, mmap_mode=mmap_mode)
                 self.model = model_data['model']
                 self.is_trained = model_data['is_trained']
                 self.cluster_centers_ = model_data['cluster_centers_']
                 self.labels_ = model_data['labels_']
                 self.n_clusters = model_data['n_clusters']
                 self.random_state = model_data['random_state']
+                self.cluster_rows_ = model_data.get('cluster_rows_')
+                self.cluster_offsets_ = model_data.get('cluster_offsets_')
+                if self.cluster_rows_ is None or self.cluster_offsets_ is None:
+                    self._build_cluster_index()
+                self.cluster_embeddings_ = model_data.get('cluster_embeddings_')
 
                 logger.info(f"Kümeleme modeli yüklendi: {filepath}")
                 return True
@@ -222,18 +370,29 @@ class ClusteringModel:
             logger.error(f"Model yükleme hatası: {str(e)}")
             return False
 
+    def memory_bytes(self) -> int:
+        """Modelin büyük dizilerinin bayt cinsinden boyutu (mmap ile eşlenmiş olanlar dahil)."""
+        arrays = (self.labels_, self.cluster_centers_, self.cluster_rows_,
+                  self.cluster_offsets_, self.cluster_embeddings_)
+        return int(sum(a.nbytes for a in arrays if isinstance(a, np.ndarray)))
+
     def get_similar_users_in_cluster(self, user_embedding: np.ndarray, cluster_id: int,
-                                     all_embeddings: np.ndarray, all_user_ids: List[str],
+                                     all_embeddings: Optional[np.ndarray], all_user_ids: List[str],
                                      top_k: int = 5) -> List[Tuple[str, float]]:
-        """Aynı kümedeki benzer kullanıcıları bul"""
+        """Aynı kümedeki benzer kullanıcıları bul (all_embeddings=None ise eğitimdeki küme bloğu kullanılır)"""
         try:
             if not self.is_trained:
                 return []
 
-            # Aynı kümedeki kullanıcıları bul
-            cluster_mask = (self.labels_ == cluster_id)
-            cluster_embeddings = all_embeddings[cluster_mask]
-            cluster_user_ids = [all_user_ids[i] for i in range(len(all_user_ids)) if cluster_mask[i]]
+            if self.cluster_offsets_ is None:
+                self._build_cluster_index()
+
+            # Aynı kümedeki kullanıcılar: yalnızca kümenin satırlarına dokunulur
+            rows = self.cluster_rows(cluster_id)
+            cluster_embeddings = self.cluster_block(cluster_id) if all_embeddings is None else all_embeddings[rows]
+            if cluster_embeddings is None:
+                return []
+            cluster_user_ids = [all_user_ids[i] for i in rows]
 
             if len(cluster_embeddings) == 0:
                 return []
@@ -262,39 +421,112 @@ class ClusteringModel:
 
 # Model yöneticisi sınıfı
 class ClusteringModelManager:
-    """Kümeleme modeli yöneticisi"""
+    """
+    Kümeleme modeli yöneticisi.
+
+    Modeller ilk get_model çağrısında diskten (joblib mmap_mode='r') tembel yüklenir ve
+    LRU sırasında tutulur; toplam boyut memory_budget_bytes'ı aşınca en uzun süredir
+    kullanılmayan model bellekten çıkarılır (kaydedilmemişse önce kaydedilir).
+    """
+
+    DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
 
-    def __init__(self, models_dir: str = "backend/ml/models"):
+    def __init__(self, models_dir: str = "backend/ml/models", memory_budget_bytes: Optional[int] = DEFAULT_MEMORY_BUDGET,
+                 mmap: bool = True):
         self.models_dir = models_dir
-        self.models = {}  # model_name -> ClusteringModel
+        self.memory_budget_bytes = memory_budget_bytes
+        self.mmap = mmap
+        self.models: "OrderedDict[str, ClusteringModel]" = OrderedDict()  # LRU: en son kullanılan sonda
+        self._dirty = set()  # diske yazılmamış modeller (çıkarılmadan önce kaydedilir)
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "evictions": 0}
         os.makedirs(models_dir, exist_ok=True)
 
+    def _model_path(self, model_name: str) -> str:
+        return os.path.join(self.models_dir, f"{model_name}.pkl")
+
+    def _put(self, model_name: str, model: ClusteringModel):
+        self.models[model_name] = model
+        self.models.move_to_end(model_name)
+        self._evict(keep=model_name)
+
+    def _evict(self, keep: Optional[str] = None):
+        """Bütçe aşıldıkça LRU sırasıyla model çıkarır (az önce kullanılan model hariç)."""
+        if self.memory_budget_bytes is None:
+            return
+        while self.memory_usage() > self.memory_budget_bytes and len(self.models) > 1:
+            model_name = next(iter(self.models))
+            if model_name == keep:
+                break
+            model = self.models.pop(model_name)
+            if model_name in self._dirty:
+                model.save_model(self._model_path(model_name))
+                self._dirty.discard(model_name)
+            self.stats["evictions"] += 1
+            logger.info(f"Kümeleme modeli bellekten çıkarıldı: {model_name}")
+
+    def memory_usage(self) -> int:
+        return sum(model.memory_bytes() for model in self.models.values())
+
     def create_model(self, model_name: str, n_clusters: int = 5) -> ClusteringModel:
         """Yeni model oluştur"""
-        model = ClusteringModel(n_clusters=n_clusters)
-        self.models[model_name] = model
-        return model
+        with self._lock:
+            model = ClusteringModel(n_clusters=n_clusters)
+            self._dirty.add(model_name)
+            self._put(model_name, model)
+            return model
 
     def get_model(self, model_name: str) -> ClusteringModel:
-        """Modeli getir"""
-        return self.models.get(model_name)
+        """Modeli getir; bellekte yoksa diskten tembel yükler"""
+        with self._lock:
+            model = self.models.get(model_name)
+            if model is not None:
+                self.stats["hits"] += 1
+                self.models.move_to_end(model_name)
+                return model
+
+            self.stats["misses"] += 1
+            if self.load_model(model_name):
+                return self.models[model_name]
+            return None
+
+    def mark_dirty(self, model_name: str):
+        """Bellekteki model değiştirildi (ör. yeniden eğitildi); çıkarılırsa önce kaydedilir."""
+        with self._lock:
+            if model_name in self.models:
+                self._dirty.add(model_name)
+                self._evict(keep=model_name)
 
     def save_all_models(self):
-        """Tüm modelleri kaydet"""
-        for model_name, model in self.models.items():
-            filepath = os.path.join(self.models_dir, f"{model_name}.pkl")
-            model.save_model(filepath)
+        """Bellekteki tüm modelleri kaydet"""
+        with self._lock:
+            for model_name, model in self.models.items():
+                model.save_model(self._model_path(model_name))
+            self._dirty.clear()
 
     def load_model(self, model_name: str) -> bool:
         """Modeli diskten yükle"""
-        filepath = os.path.join(self.models_dir, f"{model_name}.pkl")
-        model = ClusteringModel()
-        success = model.load_model(filepath)
+        with self._lock:
+            model = ClusteringModel()
+            success = model.load_model(self._model_path(model_name), mmap_mode='r' if self.mmap else None)
 
-        if success:
-            self.models[model_name] = model
+            if success:
+                self.stats["loads"] += 1
+                self._dirty.discard(model_name)
+                self._put(model_name, model)
 
-        return success
+            return success
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "resident_models": list(self.models.keys()),
+                "memory_bytes": self.memory_usage(),
+                "memory_budget_bytes": self.memory_budget_bytes
+            }
 
 
 # Global model manager instance
@@ -1,13 +1,29 @@
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional, Set
 import logging
+import heapq
+import copy
+import time
 from .similarity_engine import SimilarityEngine
+from .locks import read_locked, write_locked
+from .community_optimizer import CommunityOptimizer
 
 logger = logging.getLogger(__name__)
 
 
 class CommunityAssigner:
-    """Kullanıcıları topluluklara atama sınıfı"""
+    """
+    Kullanıcıları topluluklara atama sınıfı.
+
+    Her topluluk için üye embedding'lerinin (blok normalize) toplamı ve kare toplamı tutulur.
+    Kullanıcının bir topluluğa ortalama benzerliği tek iç çarpımdır; tüm topluluklar
+    tek matris-vektör çarpımıyla skorlanır, grup uyumu da toplamlardan kapalı formda çıkar.
+
+    Topluluk durumu motorun embedding'lerinden türediği için motorun kilidini paylaşır:
+    değiştiren işlemler yazma, öneriler okuma kilidi altında çalışır.
+    """
+
+    INITIAL_CAPACITY = 64
 
     def __init__(self, similarity_engine: SimilarityEngine, min_community_size: int = 3, max_community_size: int = 10):
         self.similarity_engine = similarity_engine
@@ -15,6 +31,180 @@ class CommunityAssigner:
         self.max_community_size = max_community_size
         self.communities = []  # Topluluk listesi: [{"id": str, "members": List[str], "compatibility": float}]
 
+        # Satır = self.communities indeksi
+        self._community_index: Dict[str, int] = {}  # community_id -> satır
+        self._sums: Optional[np.ndarray] = None  # (capacity, dim) üye vektörleri toplamı
+        self._square_sums: Optional[np.ndarray] = None  # (capacity, dim) üye vektörlerinin kare toplamı
+        self._counts = np.zeros(0, dtype=np.int32)  # toplamlara katılmış üye sayısı
+        self._memberships: Dict[str, List[int]] = {}  # user_id -> üyesi olduğu topluluk satırları
+        # (topluluk satırı, user_id) -> toplamlara eklenen vektör; çıkarırken aynısı düşülür
+        self._contributions: Dict[Tuple[int, str], np.ndarray] = {}
+
+        # Artımlı optimizasyon; merkezleri çalıştırmalar arasında saklar
+        self.optimizer = CommunityOptimizer(self)
+
+    @property
+    def lock(self):
+        return self.similarity_engine.lock
+
+    # --------------------------------------------------
+    # RUNNING SUMS
+    # --------------------------------------------------
+
+    def _ensure_vectors(self, n_communities: int, dim: int):
+        """Toplam matrislerini gerekirse katlayarak büyütür (boyut değiştiyse sıfırdan kurar)."""
+        if self._sums is not None and self._sums.shape[1] == dim and n_communities <= len(self._sums):
+            return
+        capacity = max(self.INITIAL_CAPACITY, n_communities, 2 * (0 if self._sums is None else len(self._sums)))
+        sums = np.zeros((capacity, dim), dtype=np.float32)
+        square_sums = np.zeros((capacity, dim), dtype=np.float32)
+        counts = np.zeros(capacity, dtype=np.int32)
+        if self._sums is not None and self._sums.shape[1] == dim:
+            n = len(self._sums)
+            sums[:n], square_sums[:n], counts[:n] = self._sums, self._square_sums, self._counts
+        self._sums, self._square_sums, self._counts = sums, square_sums, counts
+
+    def _add_member_vector(self, idx: int, user_id: str):
+        self._memberships.setdefault(user_id, []).append(idx)
+        vector = self.similarity_engine.get_embedding(user_id)
+        if vector is None:
+            return
+        self._add_contribution(idx, user_id, vector)
+
+    def _add_contribution(self, idx: int, user_id: str, vector: np.ndarray):
+        self._ensure_vectors(len(self.communities), len(vector))
+        self._sums[idx] += vector
+        self._square_sums[idx] += vector * vector
+        self._counts[idx] += 1
+        self._contributions[(idx, user_id)] = vector
+
+    def _remove_member_vector(self, idx: int, user_id: str):
+        memberships = self._memberships.get(user_id, [])
+        if idx in memberships:
+            memberships.remove(idx)
+        self._remove_contribution(idx, user_id)
+
+    def _remove_contribution(self, idx: int, user_id: str):
+        # Motordaki güncel embedding değil, eklenirken toplama giren vektör düşülür
+        vector = self._contributions.pop((idx, user_id), None)
+        if vector is None or self._sums is None:
+            return
+        self._sums[idx] -= vector
+        self._square_sums[idx] -= vector * vector
+        self._counts[idx] -= 1
+
+    @write_locked
+    def move_user(self, user_id: str, from_community_id: str, to_community_id: str) -> bool:
+        """Üyeyi bir topluluktan diğerine taşır; iki topluluğun toplamları ve uyumu güncellenir."""
+        source = self._community_index.get(from_community_id)
+        target = self._community_index.get(to_community_id)
+        if source is None or target is None or user_id not in self.communities[source]['members']:
+            return False
+
+        self.communities[source]['members'].remove(user_id)
+        self._remove_member_vector(source, user_id)
+        self.communities[target]['members'].append(user_id)
+        self._add_member_vector(target, user_id)
+
+        for idx in (source, target):
+            self.communities[idx]['compatibility'] = self._group_compatibility(idx)
+        return True
+
+    @write_locked
+    def refresh_member(self, user_id: str) -> int:
+        """
+        Kullanıcının embedding'i yeniden üretildikten sonra üyesi olduğu toplulukların toplamlarına
+        eski -> yeni farkını uygular. Motordan çıkarılmışsa eski katkısı düşülür. Güncellenen topluluk sayısı.
+        """
+        vector = self.similarity_engine.get_embedding(user_id)
+        updated = 0
+        for idx in self._memberships.get(user_id, []):
+            self._remove_contribution(idx, user_id)
+            if vector is not None:
+                self._add_contribution(idx, user_id, vector)
+            self.communities[idx]['compatibility'] = self._group_compatibility(idx)
+            updated += 1
+        return updated
+
+    @write_locked
+    def remove_user(self, user_id: str) -> List[str]:
+        """Kullanıcıyı tüm topluluklarından çıkarır (ör. hesap silindiğinde); çıkarıldığı topluluk id'leri."""
+        removed = []
+        for idx in list(self._memberships.get(user_id, [])):
+            community = self.communities[idx]
+            if user_id in community['members']:
+                community['members'].remove(user_id)
+            self._remove_member_vector(idx, user_id)
+            community['compatibility'] = self._group_compatibility(idx)
+            removed.append(community['id'])
+        self._memberships.pop(user_id, None)
+        return removed
+
+    @read_locked
+    def community_members_of(self, user_id: str) -> Set[str]:
+        """Kullanıcının üyesi olduğu topluluklardaki diğer üyeler."""
+        return {
+            member
+            for idx in self._memberships.get(user_id, [])
+            for member in self.communities[idx]['members']
+            if member != user_id
+        }
+
+    @write_locked
+    def rebuild_community_vectors(self):
+        """Toplamları mevcut embedding'lerden yeniden kurar (toplu embedding güncellemesinden sonra)."""
+        self._community_index = {c['id']: idx for idx, c in enumerate(self.communities)}
+        self._sums = self._square_sums = None
+        self._counts = np.zeros(0, dtype=np.int32)
+        self._memberships = {}
+        self._contributions = {}
+        dim = self.similarity_engine.dimension
+        if dim is None:
+            return
+        self._ensure_vectors(len(self.communities), dim)
+        for idx, community in enumerate(self.communities):
+            for member_id in community['members']:
+                self._add_member_vector(idx, member_id)
+
+    def _community_scores(self, user_id: str) -> np.ndarray:
+        """
+        Kullanıcının tüm topluluklara ortalama benzerliği (kendisi hariç), tek matris-vektör çarpımı.
+        Üyesiz topluluk 1.0, kendisinden başka üyesi olmayan topluluk 0.0 alır.
+        """
+        n = len(self.communities)
+        vector = self.similarity_engine.get_embedding(user_id)
+        if n == 0 or vector is None or self._sums is None:
+            return np.zeros(n, dtype=np.float32)
+
+        query = vector * self.similarity_engine._weight_vector()
+        return self._scores_for_queries(query[None, :], [self._memberships.get(user_id)], [vector])[0]
+
+    def _scores_for_queries(self, queries: np.ndarray, memberships: Optional[List[Optional[List[int]]]] = None,
+                            vectors: Optional[List[np.ndarray]] = None) -> np.ndarray:
+        """(n_queries, n_communities) ortalama benzerlik matrisi; tek GEMM. memberships verilirse
+        sorgu kullanıcısının kendi katkısı üyesi olduğu topluluklardan düşülür."""
+        n = len(self.communities)
+        totals = queries @ self._sums[:n].T
+        counts = np.broadcast_to(self._counts[:n].astype(np.float32), totals.shape).copy()
+
+        for i, own in enumerate(memberships or []):
+            if own:
+                totals[i, own] -= float(vectors[i] @ queries[i])
+                counts[i, own] -= 1
+
+        scores = np.divide(totals, counts, out=np.zeros(totals.shape, dtype=np.float32), where=counts > 0)
+        empty = np.fromiter((len(c['members']) == 0 for c in self.communities), dtype=bool, count=n)
+        scores[:, empty] = 1.0
+        return scores
+
+    def _group_compatibility(self, idx: int) -> float:
+        if self._sums is None:
+            return 1.0
+        return self.similarity_engine.group_compatibility_from_sums(
+            self._sums[idx], self._square_sums[idx], int(self._counts[idx])
+        )
+
+    @write_locked
     def assign_user_to_community(self, user_id: str, user_data: Dict[str, Any]) -> str:
         """Kullanıcıyı uygun topluluğa ata veya yeni topluluk oluştur"""
         try:
@@ -39,40 +229,196 @@ class CommunityAssigner:
             logger.error(f"Kullanıcı atama hatası: {str(e)}")
             return self._create_new_community(user_id)  # Fallback
 
-    def _find_best_community(self, user_id: str, min_compatibility: float = 0.6) -> str:
-        """Kullanıcı için en uygun topluluğu bul"""
-        best_community_id = None
-        best_score = min_compatibility
+    # --------------------------------------------------
+    # BULK ASSIGNMENT
+    # --------------------------------------------------
+
+    @write_locked
+    def assign_users_bulk(self, users: List[Tuple[str, Dict[str, Any]]], min_compatibility: float = 0.6,
+                          candidates_per_user: int = 5) -> Dict[str, str]:
+        """
+        Yeni bir grubu (ör. testi bitiren dönem) tek geçişte, geliş sırasından bağımsız atar.
+
+        1. Kullanıcı x topluluk skor matrisi tek GEMM ile hesaplanır; her kullanıcının en iyi
+           candidates_per_user topluluğu bir öncelik kuyruğuna girer.
+        2. Kuyruktan en yüksek skor çekilir; topluluk o arada değiştiyse skor yeniden hesaplanıp
+           kuyruğa geri konur (lazy greedy), aksi halde max_community_size dolmadıysa atanır.
+        3. Yerleşemeyenler için yeni topluluklar açılır: bir tohum kullanıcı en benzer yerleşmemiş
+           kullanıcılarla doldurulur, en az min_community_size kişi hedeflenir.
+        """
+        assignments: Dict[str, str] = {}
+        if not users:
+            return assignments
 
-        for community in self.communities:
-            # Topluluk dolu mu kontrol et
-            if len(community['members']) >= self.max_community_size:
+        try:
+            engine = self.similarity_engine
+            engine.add_users(users)
+            user_ids = [uid for uid in dict.fromkeys(uid for uid, _ in users) if engine.has_user(uid)]
+            if not user_ids:
+                return assignments
+
+            self._ensure_vectors(len(self.communities), engine.dimension)
+            rows = np.fromiter((engine._id_to_row[uid] for uid in user_ids), dtype=np.intp, count=len(user_ids))
+            vectors = np.array(engine._matrix[rows])
+            queries = vectors * engine._weight_vector()
+
+            pending = self._greedy_fill(user_ids, queries, min_compatibility, candidates_per_user, assignments)
+            self._open_communities(user_ids, vectors, queries, pending, min_compatibility, assignments)
+
+            logger.info(f"{len(assignments)} kullanıcı toplu olarak {len(set(assignments.values()))} topluluğa atandı")
+        except Exception as e:
+            logger.error(f"Toplu topluluk atama hatası: {str(e)}")
+            for uid, data in users:
+                if uid not in assignments:
+                    assignments[uid] = self.assign_user_to_community(uid, data)
+
+        return assignments
+
+    def _greedy_fill(self, user_ids: List[str], queries: np.ndarray, min_compatibility: float,
+                     candidates_per_user: int, assignments: Dict[str, str]) -> np.ndarray:
+        """Mevcut toplulukları öncelik kuyruğuyla doldurur; yerleşemeyen kullanıcı indekslerini döndürür."""
+        n = len(self.communities)
+        if n == 0:
+            return np.arange(len(user_ids))
+
+        sizes = np.fromiter((len(c['members']) for c in self.communities), dtype=np.int32, count=n)
+        scores = self._scores_for_queries(queries)
+        scores[:, sizes >= self.max_community_size] = -np.inf
+
+        top = self.similarity_engine._top_k_indices(scores, candidates_per_user)
+        versions = np.zeros(n, dtype=np.int64)
+        heap = [
+            (-float(scores[u, c]), u, int(c), 0)
+            for u in range(len(user_ids)) for c in top[u]
+            if scores[u, c] > min_compatibility
+        ]
+        heapq.heapify(heap)
+
+        assigned = np.zeros(len(user_ids), dtype=bool)
+        touched = set()
+        while heap:
+            _, u, c, version = heapq.heappop(heap)
+            if assigned[u] or sizes[c] >= self.max_community_size:
                 continue
 
-            # Uyumluluk skorunu hesapla
-            compatibility = self._calculate_community_compatibility(user_id, community['members'])
+            if version != versions[c]:
+                # Topluluk bu skor hesaplandıktan sonra değişti; güncel skorla kuyruğa geri koy
+                score = float(self._sums[c] @ queries[u]) / self._counts[c] if self._counts[c] else 0.0
+                if score > min_compatibility:
+                    heapq.heappush(heap, (-score, u, c, int(versions[c])))
+                continue
 
-            if compatibility > best_score:
-                best_score = compatibility
-                best_community_id = community['id']
+            self.communities[c]['members'].append(user_ids[u])
+            self._add_member_vector(c, user_ids[u])
+            assignments[user_ids[u]] = self.communities[c]['id']
+            sizes[c] += 1
+            versions[c] += 1
+            assigned[u] = True
+            touched.add(c)
+
+        for c in touched:
+            self.communities[c]['compatibility'] = self._group_compatibility(c)
+
+        return np.flatnonzero(~assigned)
+
+    def _open_communities(self, user_ids: List[str], vectors: np.ndarray, queries: np.ndarray,
+                          pending: np.ndarray, min_compatibility: float, assignments: Dict[str, str]):
+        """Yerleşemeyen kullanıcılardan tohum + en benzer komşular ile yeni topluluklar kurar."""
+        engine = self.similarity_engine
+        fill = max(self.max_community_size, self.min_community_size) - 1
+
+        pool = np.asarray(pending, dtype=np.intp)
+        while pool.size:
+            seed, rest = pool[0], pool[1:]
+            take = np.empty(0, dtype=np.intp)
+            if rest.size and fill > 0:
+                sims = vectors[rest] @ queries[seed]
+                take = engine._top_k_indices(sims, fill)
+                matched = take[sims[take] > min_compatibility]
+                # Eşik altında kalsa da topluluk min_community_size'a tamamlanır
+                take = matched if matched.size + 1 >= self.min_community_size else take[:self.min_community_size - 1]
+
+            community_id = self._create_new_community(user_ids[seed])
+            assignments[user_ids[seed]] = community_id
+            idx = self._community_index[community_id]
+            for member in rest[take]:
+                self.communities[idx]['members'].append(user_ids[member])
+                self._add_member_vector(idx, user_ids[member])
+                assignments[user_ids[member]] = community_id
+
+            community = self.communities[idx]
+            community['compatibility'] = self._group_compatibility(idx)
+            community['category'] = self._detect_community_category(community['members'])
+            pool = np.delete(rest, take)
+
+    def total_compatibility(self) -> Dict[str, float]:
+        """Tüm üyelerin kendi topluluklarına ortalama benzerliklerinin toplamı (= sum n_c * uyum_c)."""
+        sizes = np.array([len(c['members']) for c in self.communities], dtype=np.float64)
+        compat = np.array([c['compatibility'] if len(c['members']) > 1 else 0.0 for c in self.communities])
+        total = float(sizes @ compat) if len(sizes) else 0.0
+        return {
+            "total_compatibility": total,
+            "mean_compatibility": float(total / sizes.sum()) if sizes.sum() else 0.0,
+            "n_communities": len(self.communities),
+            "undersized_communities": int(np.sum(sizes < self.min_community_size))
+        }
+
+    def compare_with_sequential(self, users: List[Tuple[str, Dict[str, Any]]], **bulk_kwargs) -> Dict[str, Any]:
+        """
+        Aynı kullanıcıları mevcut durumun iki kopyasına sıralı (assign_user_to_community) ve toplu
+        modla atar; toplam uyum ve süreleri raporlar. Bu nesnenin toplulukları değişmez,
+        kullanıcılar yalnızca similarity engine'e eklenir.
+        """
+        def clone() -> 'CommunityAssigner':
+            other = CommunityAssigner(self.similarity_engine, self.min_community_size, self.max_community_size)
+            other.communities = copy.deepcopy(self.communities)
+            other.rebuild_community_vectors()
+            return other
+
+        sequential, bulk = clone(), clone()
+
+        start = time.perf_counter()
+        for uid, data in users:
+            sequential.assign_user_to_community(uid, data)
+        sequential_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bulk.assign_users_bulk(users, **bulk_kwargs)
+        bulk_time = time.perf_counter() - start
+
+        return {
+            "n_users": len(users),
+            "sequential": {"seconds": sequential_time, **sequential.total_compatibility()},
+            "bulk": {"seconds": bulk_time, **bulk.total_compatibility()},
+            "speedup": sequential_time / bulk_time if bulk_time > 0 else None
+        }
+
+    def _find_best_community(self, user_id: str, min_compatibility: float = 0.6) -> str:
+        """Kullanıcı için en uygun topluluğu bul (tüm topluluklar tek seferde skorlanır)"""
+        if not self.communities:
+            return None
+
+        scores = self._community_scores(user_id)
+
+        # Dolu topluluklar aday değildir
+        sizes = np.fromiter((len(c['members']) for c in self.communities), dtype=np.int32, count=len(scores))
+        scores[sizes >= self.max_community_size] = -np.inf
 
-        return best_community_id
+        best = int(np.argmax(scores))
+        return self.communities[best]['id'] if scores[best] > min_compatibility else None
 
     def _calculate_community_compatibility(self, user_id: str, community_members: List[str]) -> float:
-        """Kullanıcı ile topluluk arasındaki uyumluluğu hesapla"""
+        """Kullanıcı ile (kayıtlı olması gerekmeyen) bir üye listesi arasındaki ortalama benzerlik"""
         if not community_members:
             return 1.0
 
-        total_similarity = 0.0
-        valid_pairs = 0
+        engine = self.similarity_engine
+        row = engine._id_to_row.get(user_id)
+        rows = [engine._id_to_row[m] for m in community_members if m != user_id and m in engine._id_to_row]
+        if row is None or not rows:
+            return 0.0
 
-        for member_id in community_members:
-            if member_id != user_id:
-                similarity = self.similarity_engine.calculate_similarity(user_id, member_id)
-                total_similarity += similarity
-                valid_pairs += 1
-
-        return total_similarity / valid_pairs if valid_pairs > 0 else 0.0
+        return float(np.mean(engine._cosine_scores(row, np.array(rows, dtype=np.intp))))
 
     def _create_new_community(self, user_id: str) -> str:
         """Yeni topluluk oluştur"""
@@ -86,17 +432,25 @@ class CommunityAssigner:
         }
 
         self.communities.append(new_community)
+        idx = len(self.communities) - 1
+        self._community_index[community_id] = idx
+        if self.similarity_engine.dimension is not None:
+            self._ensure_vectors(len(self.communities), self.similarity_engine.dimension)
+            self._add_member_vector(idx, user_id)
         return community_id
 
     def _add_user_to_community(self, user_id: str, community_id: str):
-        """Kullanıcıyı topluluğa ekle"""
-        for community in self.communities:
-            if community['id'] == community_id:
-                community['members'].append(user_id)
+        """Kullanıcıyı topluluğa ekle; toplamlar ve uyumluluk O(boyut) güncellenir"""
+        idx = self._community_index.get(community_id)
+        if idx is None:
+            return
+
+        community = self.communities[idx]
+        community['members'].append(user_id)
+        self._add_member_vector(idx, user_id)
 
-                # Uyumluluk skorunu güncelle
-                community['compatibility'] = self.similarity_engine.calculate_group_compatibility(community['members'])
-                break
+        # Uyumluluk skorunu güncelle
+        community['compatibility'] = self._group_compatibility(idx)
 
     def _detect_community_category(self, member_ids: List[str]) -> str:
         """Topluluk kategorisini tespit et"""
@@ -106,9 +460,8 @@ class CommunityAssigner:
         # Üyelerin hobilerine göre kategori belirle
         all_hobbies = []
         for user_id in member_ids:
-            user_data = self.similarity_engine.user_data.get(user_id, {})
-            hobbies = user_data.get('hobbies', [])
-            all_hobbies.extend(hobbies)
+            metadata = self.similarity_engine.user_metadata.get(user_id, {})
+            all_hobbies.extend(metadata.get('interests', []))
 
         # En yaygın hobi kategorisini bul
         category_scores = {
@@ -146,24 +499,25 @@ class CommunityAssigner:
         # En yüksek skorlu kategoriyi döndür
         return max(category_scores.items(), key=lambda x: x[1])[0]
 
+    @read_locked
     def get_community_recommendations(self, user_id: str, top_k: int = 3) -> List[Dict[str, Any]]:
         """Kullanıcı için topluluk önerileri oluştur"""
         try:
             recommendations = []
+            scores = self._community_scores(user_id)
+            joined = set(self._memberships.get(user_id, []))
 
-            for community in self.communities:
-                if user_id in community['members']:
+            for idx in np.flatnonzero(scores > 0.5):  # Minimum uyumluluk eşiği
+                if idx in joined:
                     continue  # Zaten üye olduğu toplulukları atla
 
-                compatibility = self._calculate_community_compatibility(user_id, community['members'])
-
-                if compatibility > 0.5:  # Minimum uyumluluk eşiği
-                    recommendations.append({
-                        "community_id": community['id'],
-                        "compatibility_score": compatibility,
-                        "member_count": len(community['members']),
-                        "category": community.get('category', 'general')
-                    })
+                community = self.communities[idx]
+                recommendations.append({
+                    "community_id": community['id'],
+                    "compatibility_score": float(scores[idx]),
+                    "member_count": len(community['members']),
+                    "category": community.get('category', 'general')
+                })
 
             # Uyumluluk skoruna göre sırala
             recommendations.sort(key=lambda x: x['compatibility_score'], reverse=True)
@@ -173,6 +527,7 @@ class CommunityAssigner:
             logger.error(f"Topluluk önerisi hatası: {str(e)}")
             return []
 
+    @write_locked
     def optimize_communities(self):
         """Toplulukları optimize et (periodik olarak çalıştırılabilir)"""
         try:
@@ -211,11 +566,24 @@ class CommunityAssigner:
                         self._assign_small_cluster_user(member, new_communities)
 
             self.communities = new_communities
+            self.rebuild_community_vectors()
             logger.info(f"Topluluklar optimize edildi: {len(self.communities)} topluluk")
 
         except Exception as e:
             logger.error(f"Topluluk optimizasyon hatası: {str(e)}")
 
+    def optimize_communities_incremental(self, time_budget: Optional[float] = None,
+                                         apply: bool = True) -> Dict[str, Any]:
+        """
+        optimize_communities'in periyodik çalışmaya uygun hali: toplulukları yeniden kurmak yerine
+        warm-start MiniBatchKMeans ile yalnızca üye taşımalarını üretir (bkz. CommunityOptimizer).
+        """
+        try:
+            return self.optimizer.run(time_budget=time_budget, apply=apply)
+        except Exception as e:
+            logger.error(f"Artımlı topluluk optimizasyon hatası: {str(e)}")
+            return {"success": False, "error": str(e)}
+
     def _assign_small_cluster_user(self, user_id: str, communities: List[Dict[str, Any]]):
         """Küçük kümedeki kullanıcıyı uygun topluluğa ata"""
         best_community = None
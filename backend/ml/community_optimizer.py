@@ -0,0 +1,176 @@
+import numpy as np
+import logging
+import time
+from typing import List, Dict, Any, Optional, Tuple
+from sklearn.cluster import MiniBatchKMeans
+
+logger = logging.getLogger(__name__)
+
+
+class CommunityOptimizer:
+    """
+    CommunityAssigner için artımlı (warm-start) topluluk optimizasyonu.
+
+    Her topluluk bir küme merkezidir; MiniBatchKMeans bir önceki çalıştırmanın merkezleriyle
+    (yoksa topluluk ortalamalarıyla) başlatılır ve üye embedding'leri batch'ler halinde akıtılır.
+    Topluluklar yeniden kurulmaz: yalnızca daha uyumlu bir topluluğa geçmesi gereken üyeler
+    (taşımalar) üretilir. Süre bütçesi dolunca durur, sonraki çalıştırma kaldığı yerden devam eder.
+    """
+
+    def __init__(self, assigner, batch_size: int = 1024, random_state: int = 42):
+        self.assigner = assigner
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self._centroids: Dict[str, np.ndarray] = {}  # community_id -> son merkez
+        self._cursor = 0  # bir sonraki çalıştırmanın başlayacağı üye pozisyonu
+
+    def _initial_centroids(self) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Üyesi olan toplulukların satırları ve başlangıç merkezleri (önceki merkez > üye ortalaması)."""
+        assigner = self.assigner
+        n = len(assigner.communities)
+        if n == 0 or assigner._sums is None:
+            return np.empty(0, dtype=np.intp), None
+
+        rows = np.flatnonzero(assigner._counts[:n] > 0)
+        centroids = assigner._sums[rows] / assigner._counts[rows, None]
+        for pos, idx in enumerate(rows):
+            previous = self._centroids.get(assigner.communities[idx]['id'])
+            if previous is not None and previous.shape == centroids[pos].shape:
+                centroids[pos] = previous
+        return rows, centroids
+
+    def _members(self) -> List[str]:
+        """Üye kullanıcı id'leri; cursor'dan itibaren döndürülmüş sırada."""
+        engine = self.assigner.similarity_engine
+        members = [
+            uid for uid, idxs in self.assigner._memberships.items()
+            if idxs and engine.has_user(uid)
+        ]
+        if members:
+            self._cursor %= len(members)
+            members = members[self._cursor:] + members[:self._cursor]
+        return members
+
+    def run(self, time_budget: Optional[float] = None, apply: bool = True,
+            min_gain: float = 0.0) -> Dict[str, Any]:
+        """
+        Bir optimizasyon turu çalıştırır.
+        time_budget: saniye cinsinden üst sınır (None = tüm üyeler).
+        apply: True ise taşımalar assigner'a uygulanır, False ise yalnızca raporlanır.
+        min_gain: taşıma için hedef toplulukta gereken minimum ortalama benzerlik artışı.
+
+        Motor kilidi tur boyunca değil batch başına alınır (apply=True ise yazma, değilse
+        okuma): batch'ler arasında güncellemeler ve istekler ilerleyebilir. Bu yüzden her
+        batch'te üyelik, satır ve topluluk boyutları kilit altında yeniden okunur.
+        """
+        start = time.perf_counter()
+        deadline = start + time_budget if time_budget else None
+        assigner = self.assigner
+        engine = assigner.similarity_engine
+
+        with engine.lock.read():
+            communities = assigner.communities
+            rows, centroids = self._initial_centroids()
+            members = self._members()
+            weight_vector = engine.weight_vector()
+        if len(rows) < 2:
+            return {"success": False, "message": "Optimize edilecek yeterli topluluk yok"}
+
+        batch_size = max(self.batch_size, len(rows))  # ilk batch en az küme sayısı kadar olmalı
+        kmeans = MiniBatchKMeans(n_clusters=len(rows), init=centroids, n_init=1,
+                                 batch_size=batch_size, random_state=self.random_state)
+        batch_lock = engine.lock.write if apply else engine.lock.read
+
+        moves: List[Dict[str, Any]] = []
+        processed = 0
+        stale = False
+        for offset in range(0, len(members), batch_size):
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+
+            batch = members[offset:offset + batch_size]
+            with batch_lock():
+                stale = assigner.communities is not communities or assigner._sums is None
+                if stale:
+                    break  # topluluklar yeniden kuruldu: satırlar geçersiz, sonraki tur baştan başlar
+                self._score_batch(kmeans, rows, batch, weight_vector, min_gain, apply, moves)
+            processed += len(batch)
+
+        if stale:
+            self._centroids, self._cursor = {}, 0
+        else:
+            if processed:
+                self._centroids = {
+                    communities[idx]['id']: kmeans.cluster_centers_[pos].astype(np.float32)
+                    for pos, idx in enumerate(rows)
+                }
+            self._cursor += processed
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Artımlı topluluk optimizasyonu: {processed}/{len(members)} üye, "
+                    f"{len(moves)} taşıma, {elapsed:.2f}s")
+        return {
+            "success": True,
+            "moves": moves,
+            "n_moves": len(moves),
+            "processed": processed,
+            "n_members": len(members),
+            "complete": processed == len(members),
+            "applied": apply,
+            "seconds": elapsed
+        }
+
+    def _score_batch(self, kmeans: MiniBatchKMeans, rows: np.ndarray, batch: List[str],
+                     weight_vector: np.ndarray, min_gain: float, apply: bool,
+                     moves: List[Dict[str, Any]]):
+        """Bir batch'i kümelemeye besler ve taşımaları üretir; motor kilidi altında çağrılır."""
+        assigner = self.assigner
+        engine = assigner.similarity_engine
+
+        # Tur başındaki listeden bu yana silinen ya da topluluğu kalmayan üyeler atlanır
+        current_rows, vectors = [], []
+        for uid in batch:
+            row = engine.row_of(uid)
+            memberships = assigner._memberships.get(uid)
+            if row is None or not memberships:
+                current_rows.append(None)
+                continue
+            current_rows.append(memberships[0])
+            vectors.append(engine.row_vector(row))
+        if not vectors:
+            return
+
+        vectors = np.array(vectors)
+        kmeans.partial_fit(vectors)
+        targets = rows[kmeans.predict(vectors)]
+        members = [(uid, current) for uid, current in zip(batch, current_rows) if current is not None]
+
+        sizes = np.fromiter((len(c['members']) for c in assigner.communities), dtype=np.int32,
+                            count=len(assigner.communities))
+        for (uid, current), target, vector in zip(members, targets, vectors):
+            if target == current or sizes[target] >= assigner.max_community_size \
+                    or sizes[current] <= assigner.min_community_size or not assigner._counts[target]:
+                continue
+
+            # Merkez önerisi, gerçek ortalama benzerliği artırıyorsa uygulanır
+            query = vector * weight_vector
+            own = float(vector @ query)
+            current_count = assigner._counts[current] - 1
+            current_score = 0.0
+            if current_count > 0:
+                current_score = (float(assigner._sums[current] @ query) - own) / current_count
+            target_score = float(assigner._sums[target] @ query) / assigner._counts[target]
+            if target_score - current_score <= min_gain:
+                continue
+
+            move = {
+                "user_id": uid,
+                "from": assigner.communities[current]['id'],
+                "to": assigner.communities[target]['id'],
+                "gain": target_score - current_score
+            }
+            moves.append(move)
+            if apply:
+                assigner.move_user(uid, move["from"], move["to"])
+                sizes[current] -= 1
+                sizes[target] += 1
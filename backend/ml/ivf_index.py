@@ -0,0 +1,161 @@
+import numpy as np
+import logging
+from typing import List, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    """
+    ClusteringModel merkezleri üzerine kurulu Inverted-File (IVF) yaklaşık en yakın komşu indeksi.
+
+    Her kullanıcı satırı en yakın n_assign merkezin listesine yazılır; sorgu sırasında
+    yalnızca sorguya en yakın nprobe listedeki satırlar aday olarak döner. Adayların
+    kesin skorlaması SimilarityEngine tarafından yapılır. Yeni kullanıcılar yeniden
+    eğitim gerekmeden mevcut merkezlere atanır.
+    """
+
+    INITIAL_LIST_CAPACITY = 16
+
+    def __init__(self, centroids: np.ndarray, nprobe: int = 4, n_assign: int = 1):
+        # Kopya: build() merkezleri yerinde normalize eder, kümeleme modelinin dizisi değişmemeli
+        self.centroids = np.array(centroids, dtype=np.float32, order='C', copy=True)
+        if self.centroids.ndim != 2 or len(self.centroids) == 0:
+            raise ValueError("IVF indeksi için en az bir merkez gereklidir")
+
+        self.n_lists = self.centroids.shape[0]
+        self.nprobe = max(1, min(int(nprobe), self.n_lists))
+        self.n_assign = max(1, min(int(n_assign), self.n_lists))
+        self._centroid_sq = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+        # Liste başına büyüyebilen satır dizisi + doluluk sayacı
+        self._lists: List[np.ndarray] = [
+            np.empty(self.INITIAL_LIST_CAPACITY, dtype=np.intp) for _ in range(self.n_lists)
+        ]
+        self._sizes = np.zeros(self.n_lists, dtype=np.intp)
+        # satır -> [(liste, pozisyon)] ; O(1) swap-remove için
+        self._positions: Dict[int, List[List[int]]] = {}
+
+    @classmethod
+    def from_clustering_model(cls, clustering_model, nprobe: int = 4, n_assign: int = 1) -> 'IVFIndex':
+        """Eğitilmiş ClusteringModel'in cluster_centers_ değerlerinden indeks oluşturur."""
+        if not clustering_model.is_trained or clustering_model.cluster_centers_ is None:
+            raise ValueError("Kümeleme modeli eğitilmemiş, önce train() metodunu çağırın")
+        return cls(clustering_model.cluster_centers_, nprobe=nprobe, n_assign=n_assign)
+
+    @property
+    def dimension(self) -> int:
+        return self.centroids.shape[1]
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    # --------------------------------------------------
+    # ASSIGNMENT
+    # --------------------------------------------------
+
+    def _nearest_lists(self, vectors: np.ndarray, n: int) -> np.ndarray:
+        """Her vektör için en yakın n merkezin indeksleri (öklid, yakından uzağa)."""
+        vectors = np.atleast_2d(vectors)
+        # ||c||^2 - 2 c.x ; ||x||^2 sıralamayı değiştirmez
+        dists = self._centroid_sq[None, :] - 2.0 * (vectors @ self.centroids.T)
+        if n >= self.n_lists:
+            return np.argsort(dists, axis=1)
+        part = np.argpartition(dists, n - 1, axis=1)[:, :n]
+        order = np.argsort(np.take_along_axis(dists, part, axis=1), axis=1)
+        return np.take_along_axis(part, order, axis=1)
+
+    def _append(self, list_id: int, row: int):
+        size = self._sizes[list_id]
+        rows = self._lists[list_id]
+        if size >= len(rows):
+            grown = np.empty(len(rows) * 2, dtype=np.intp)
+            grown[:size] = rows[:size]
+            self._lists[list_id] = rows = grown
+        rows[size] = row
+        self._sizes[list_id] = size + 1
+        self._positions.setdefault(row, []).append([list_id, size])
+
+    def add(self, row: int, vector: np.ndarray, list_ids: Optional[Sequence[int]] = None):
+        """Satırı en yakın merkez(ler)in listesine ekler; satır zaten varsa yeniden atar."""
+        if row in self._positions:
+            self.remove(row)
+        if list_ids is None:
+            list_ids = self._nearest_lists(vector, self.n_assign)[0]
+        for list_id in list_ids:
+            self._append(int(list_id), row)
+
+    def add_batch(self, rows: np.ndarray, vectors: np.ndarray, block_size: int = 4096):
+        """Çok sayıda satırı blok halinde (tek GEMM / blok) atar."""
+        for start in range(0, len(rows), block_size):
+            block_rows = rows[start:start + block_size]
+            assignments = self._nearest_lists(vectors[start:start + block_size], self.n_assign)
+            for row, list_ids in zip(block_rows, assignments):
+                self.add(int(row), None, list_ids=list_ids)
+
+    def remove(self, row: int) -> bool:
+        """Satırı tüm listelerden O(1) swap-remove ile çıkarır."""
+        entries = self._positions.pop(row, None)
+        if entries is None:
+            return False
+
+        for list_id, pos in entries:
+            last = self._sizes[list_id] - 1
+            rows = self._lists[list_id]
+            moved = int(rows[last])
+            rows[pos] = moved
+            self._sizes[list_id] = last
+            if moved != row:
+                for entry in self._positions[moved]:
+                    if entry[0] == list_id and entry[1] == last:
+                        entry[1] = pos
+                        break
+        return True
+
+    def build(self, engine, user_ids: Optional[List[str]] = None, labels: Optional[np.ndarray] = None):
+        """
+        Motordaki tüm kullanıcıları indekse yerleştirir.
+        user_ids + labels (ClusteringModel.labels_) verilirse ve n_assign == 1 ise
+        bu kullanıcıların atamaları yeniden hesaplanmadan kullanılır.
+        """
+        if engine.dimension is not None and engine.dimension != self.dimension:
+            raise ValueError(f"Merkez boyutu uyumsuz: {self.dimension} != {engine.dimension}")
+
+        # Motor satırları blok bazında normalize saklar; merkezler aynı uzaya taşınır (idempotent)
+        engine._normalize_blocks(self.centroids)
+        self._centroid_sq = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+        self._lists = [np.empty(self.INITIAL_LIST_CAPACITY, dtype=np.intp) for _ in range(self.n_lists)]
+        self._sizes[:] = 0
+        self._positions = {}
+
+        known_rows = set()
+        if user_ids is not None and labels is not None and self.n_assign == 1:
+            for uid, label in zip(user_ids, labels):
+                row = engine._id_to_row.get(uid)
+                if row is not None and 0 <= label < self.n_lists:
+                    self._append(int(label), row)
+                    known_rows.add(row)
+
+        rows = np.array([row for row in engine._id_to_row.values() if row not in known_rows], dtype=np.intp)
+        if len(rows):
+            self.add_batch(rows, engine._matrix[rows])
+
+        logger.info(f"IVF indeksi oluşturuldu: {self.n_lists} liste, {len(self)} kullanıcı")
+
+    # --------------------------------------------------
+    # QUERY
+    # --------------------------------------------------
+
+    def candidate_rows(self, vector: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Sorguya en yakın nprobe listedeki satırları döndürür."""
+        nprobe = max(1, min(int(nprobe or self.nprobe), self.n_lists))
+        probed = self._nearest_lists(vector, nprobe)[0]
+        chunks = [self._lists[label][:self._sizes[label]] for label in probed]
+        if not chunks:
+            return np.empty(0, dtype=np.intp)
+        rows = np.concatenate(chunks)
+        return np.unique(rows) if self.n_assign > 1 else rows
+
+    def list_sizes(self) -> Dict[int, int]:
+        return {i: int(size) for i, size in enumerate(self._sizes)}
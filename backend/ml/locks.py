@@ -0,0 +1,92 @@
+import functools
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """
+    Çok okuyucu / tek yazıcı kilidi.
+
+    Okuyucular birbirini beklemez; yazıcı tüm okuyucuların çıkmasını bekler ve bekleyen
+    yazıcı varken yeni okuyucu alınmaz (yazıcı açlığı olmaz). Aynı thread okumayı ve yazmayı
+    iç içe alabilir; yazıcı kilidi tutan thread okuma da alabilir (okumadan yazmaya yükseltme yoktur).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None  # yazıcı thread'in kimliği
+        self._writer_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()  # thread başına iç içe okuma sayısı
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        depth = getattr(self._local, 'reads', 0)
+        if depth or self._writer == me:
+            # İç içe okuma veya yazıcının kendi okuması: kilit zaten tutuluyor
+            self._local.reads = depth + 1
+            try:
+                yield
+            finally:
+                self._local.reads -= 1
+            return
+
+        with self._cond:
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        self._local.reads = 1
+        try:
+            yield
+        finally:
+            self._local.reads = 0
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+            else:
+                if getattr(self._local, 'reads', 0):
+                    raise RuntimeError("Okuma kilidi yazma kilidine yükseltilemez")
+                self._waiting_writers += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._waiting_writers -= 1
+                self._writer = me
+                self._writer_depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if self._writer_depth == 0:
+                    self._writer = None
+                    self._cond.notify_all()
+
+
+def read_locked(method):
+    """Metodu nesnenin `lock` (ReadWriteLock) okuma kilidi altında çalıştırır."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock.read():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def write_locked(method):
+    """Metodu nesnenin `lock` (ReadWriteLock) yazma kilidi altında çalıştırır."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock.write():
+            return method(self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,137 @@
+import numpy as np
+import logging
+from typing import List, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LSHIndex:
+    """
+    Random-hyperplane (SimHash) LSH indeksi - eğitim gerektirmeyen yaklaşık arama.
+
+    Her tablo n_bits rastgele hiperdüzlem kullanır; bir vektörün imzası hangi tarafta
+    kaldığını gösteren bitlerin uint64 olarak paketlenmiş halidir. Aynı kovaya düşen
+    satırlar aday olur, kesin kosinüs sıralaması SimilarityEngine'de yapılır.
+    KMeans eğitmek için yeterli kullanıcısı olmayan kurulumlar içindir.
+    """
+
+    MAX_BITS = 64
+
+    def __init__(self, n_tables: int = 8, n_bits: int = 12, dimension: Optional[int] = None,
+                 random_state: int = 42):
+        if not 1 <= n_bits <= self.MAX_BITS:
+            raise ValueError(f"n_bits 1 ile {self.MAX_BITS} arasında olmalıdır")
+        if n_tables < 1:
+            raise ValueError("En az bir hash tablosu gereklidir")
+
+        self.n_tables = int(n_tables)
+        self.n_bits = int(n_bits)
+        self.random_state = random_state
+
+        self._planes: Optional[np.ndarray] = None  # (n_tables * n_bits, dim)
+        self._bit_weights = np.left_shift(np.uint64(1), np.arange(self.n_bits, dtype=np.uint64))
+        # tablo -> kova imzası -> satırlar
+        self._tables: List[Dict[int, Set[int]]] = [{} for _ in range(self.n_tables)]
+        # satır -> tablo başına imza ; O(1) silme için
+        self._signatures: Dict[int, Tuple[int, ...]] = {}
+
+        if dimension is not None:
+            self._init_planes(dimension)
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return None if self._planes is None else self._planes.shape[1]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _init_planes(self, dimension: int):
+        rng = np.random.default_rng(self.random_state)
+        self._planes = rng.standard_normal((self.n_tables * self.n_bits, dimension)).astype(np.float32)
+
+    # --------------------------------------------------
+    # HASHING
+    # --------------------------------------------------
+
+    def signatures(self, vectors: np.ndarray) -> np.ndarray:
+        """Vektörlerin tablo başına paketlenmiş imzaları: (n, n_tables) uint64."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self._planes is None:
+            self._init_planes(vectors.shape[1])
+
+        bits = (vectors @ self._planes.T) > 0
+        bits = bits.reshape(len(vectors), self.n_tables, self.n_bits).astype(np.uint64)
+        return (bits * self._bit_weights).sum(axis=2, dtype=np.uint64)
+
+    def add(self, row: int, vector: np.ndarray, signature: Optional[np.ndarray] = None):
+        """Satırı her tablodaki kovasına ekler (O(n_tables)); satır zaten varsa yeniden hash'ler."""
+        if row in self._signatures:
+            self.remove(row)
+        if signature is None:
+            signature = self.signatures(vector)[0]
+
+        keys = tuple(int(key) for key in signature)
+        for table, key in zip(self._tables, keys):
+            table.setdefault(key, set()).add(row)
+        self._signatures[row] = keys
+
+    def add_batch(self, rows: np.ndarray, vectors: np.ndarray, block_size: int = 4096):
+        """Çok sayıda satırı blok halinde hash'ler (blok başına tek projeksiyon GEMM'i)."""
+        for start in range(0, len(rows), block_size):
+            block_rows = rows[start:start + block_size]
+            for row, signature in zip(block_rows, self.signatures(vectors[start:start + block_size])):
+                self.add(int(row), None, signature=signature)
+
+    def remove(self, row: int) -> bool:
+        """Satırı tüm tablolardan çıkarır (O(n_tables))."""
+        keys = self._signatures.pop(row, None)
+        if keys is None:
+            return False
+
+        for table, key in zip(self._tables, keys):
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(row)
+                if not bucket:
+                    del table[key]
+        return True
+
+    def build(self, engine, user_ids: Optional[List[str]] = None, labels: Optional[np.ndarray] = None,
+              block_size: int = 4096):
+        """Motordaki tüm kullanıcıları hash'ler. user_ids/labels IVF ile ortak arayüz için kabul edilir."""
+        if self._planes is not None and engine.dimension is not None and engine.dimension != self.dimension:
+            raise ValueError(f"Hiperdüzlem boyutu uyumsuz: {self.dimension} != {engine.dimension}")
+
+        self._tables = [{} for _ in range(self.n_tables)]
+        self._signatures = {}
+
+        rows = np.fromiter(engine._id_to_row.values(), dtype=np.intp, count=engine.user_count)
+        if len(rows):
+            self.add_batch(rows, engine._matrix[rows], block_size=block_size)
+
+        logger.info(f"LSH indeksi oluşturuldu: {self.n_tables} tablo x {self.n_bits} bit, {len(self)} kullanıcı")
+
+    # --------------------------------------------------
+    # QUERY
+    # --------------------------------------------------
+
+    def candidate_rows(self, vector: np.ndarray) -> np.ndarray:
+        """Sorgu ile en az bir tabloda aynı kovayı paylaşan satırlar."""
+        if self._planes is None:
+            return np.empty(0, dtype=np.intp)
+
+        signature = self.signatures(vector)[0]
+        candidates: Set[int] = set()
+        for table, key in zip(self._tables, signature):
+            bucket = table.get(int(key))
+            if bucket:
+                candidates.update(bucket)
+        return np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+
+    def bucket_stats(self) -> Dict[str, float]:
+        sizes = [len(bucket) for table in self._tables for bucket in table.values()]
+        return {
+            "n_buckets": len(sizes),
+            "mean_bucket_size": float(np.mean(sizes)) if sizes else 0.0,
+            "max_bucket_size": int(max(sizes)) if sizes else 0
+        }
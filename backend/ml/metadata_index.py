@@ -0,0 +1,204 @@
+import numpy as np
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataIndex:
+    """
+    SimilarityEngine satırları için sütunsal metadata deposu.
+
+    Kategorik alanlar (bölüm, üniversite) satır başına int32 kod olarak, sayısal alanlar
+    (sınıf) float32 olarak tutulur. Filtreler bu sütunlar üzerinde tek vektörize
+    karşılaştırmayla satır maskesine dönüşür; kullanıcı başına sözlük araması yapılmaz.
+    """
+
+    CATEGORICAL_FIELDS = ("department", "university")
+    NUMERIC_FIELDS = ("year",)
+    UNKNOWN = -1
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self):
+        self._vocab: Dict[str, Dict[str, int]] = {field: {} for field in self.CATEGORICAL_FIELDS}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._allocate(self.INITIAL_CAPACITY)
+
+    def _allocate(self, capacity: int):
+        old = self._columns
+        self._columns = {field: np.full(capacity, self.UNKNOWN, dtype=np.int32) for field in self.CATEGORICAL_FIELDS}
+        self._columns.update({field: np.full(capacity, np.nan, dtype=np.float32) for field in self.NUMERIC_FIELDS})
+        for field, column in old.items():
+            self._columns[field][:len(column)] = column
+
+    @property
+    def capacity(self) -> int:
+        return len(self._columns[self.CATEGORICAL_FIELDS[0]])
+
+    def _ensure_capacity(self, size: int):
+        if size > self.capacity:
+            self._allocate(max(size, self.capacity * 2))
+
+    def code_for(self, field: str, value: Any, create: bool = False) -> int:
+        """Kategorik değerin kodu; bilinmiyorsa UNKNOWN (create=True ise yeni kod atar)."""
+        if value is None:
+            return self.UNKNOWN
+        vocab = self._vocab[field]
+        code = vocab.get(str(value))
+        if code is None and create:
+            code = vocab[str(value)] = len(vocab)
+        return self.UNKNOWN if code is None else code
+
+    @staticmethod
+    def _to_number(value: Any) -> float:
+        try:
+            return float(value) if value is not None else np.nan
+        except (TypeError, ValueError):
+            return np.nan
+
+    def set(self, row: int, metadata: Dict[str, Any]):
+        self._ensure_capacity(row + 1)
+        for field in self.CATEGORICAL_FIELDS:
+            self._columns[field][row] = self.code_for(field, metadata.get(field), create=True)
+        for field in self.NUMERIC_FIELDS:
+            self._columns[field][row] = self._to_number(metadata.get(field))
+
+    def set_many(self, rows: np.ndarray, metadata: List[Dict[str, Any]]):
+        if len(rows) == 0:
+            return
+        self._ensure_capacity(int(np.max(rows)) + 1)
+        for field in self.CATEGORICAL_FIELDS:
+            self._columns[field][rows] = [self.code_for(field, m.get(field), create=True) for m in metadata]
+        for field in self.NUMERIC_FIELDS:
+            self._columns[field][rows] = [self._to_number(m.get(field)) for m in metadata]
+
+    def remove(self, row: int):
+        if row < self.capacity:
+            for field in self.CATEGORICAL_FIELDS:
+                self._columns[field][row] = self.UNKNOWN
+            for field in self.NUMERIC_FIELDS:
+                self._columns[field][row] = np.nan
+
+    def build(self, engine):
+        """Motorun user_metadata sözlüğünden sütunları yeniden oluşturur (yükleme sonrası)."""
+        self._vocab = {field: {} for field in self.CATEGORICAL_FIELDS}
+        self._columns = {}
+        self._allocate(max(self.INITIAL_CAPACITY, engine._n_rows))
+
+        user_ids = [uid for uid in engine._id_to_row if uid in engine.user_metadata]
+        rows = np.array([engine._id_to_row[uid] for uid in user_ids], dtype=np.intp)
+        self.set_many(rows, [engine.user_metadata[uid] for uid in user_ids])
+
+    def column(self, field: str, n: int) -> np.ndarray:
+        """Alanın ilk n satırlık görünümü (kopyasız)."""
+        self._ensure_capacity(n)
+        return self._columns[field][:n]
+
+
+# --------------------------------------------------
+# FILTERS
+# --------------------------------------------------
+
+class MetadataFilter(ABC):
+    """
+    Satır maskesi üreten filtre. & (VE), | (VEYA) ve ~ (DEĞİL) ile birleştirilebilir:
+        (SameAs('department') & YearRange(2, 4)) | SameAs('university')
+    """
+
+    @abstractmethod
+    def mask(self, engine, query_row: int) -> np.ndarray:
+        """İlk engine._n_rows satır için bool maske (True = aday)."""
+
+    def __and__(self, other: 'MetadataFilter') -> 'MetadataFilter':
+        return AllOf(self, other)
+
+    def __or__(self, other: 'MetadataFilter') -> 'MetadataFilter':
+        return AnyOf(self, other)
+
+    def __invert__(self) -> 'MetadataFilter':
+        return Not(self)
+
+
+class SameAs(MetadataFilter):
+    """Sorgu kullanıcısıyla aynı kategorik değere sahip satırlar (ör. aynı bölüm)."""
+
+    def __init__(self, field: str):
+        self.field = field
+
+    def mask(self, engine, query_row: int) -> np.ndarray:
+        column = engine.metadata_index.column(self.field, engine._n_rows)
+        return column == column[query_row]
+
+
+class Equals(MetadataFilter):
+    """Kategorik alanı verilen değerlerden biri olan satırlar."""
+
+    def __init__(self, field: str, values: Any):
+        self.field = field
+        self.values = [values] if isinstance(values, str) or not isinstance(values, Iterable) else list(values)
+
+    def mask(self, engine, query_row: int) -> np.ndarray:
+        index = engine.metadata_index
+        codes = [index.code_for(self.field, value) for value in self.values]
+        codes = [code for code in codes if code != index.UNKNOWN]
+        return np.isin(index.column(self.field, engine._n_rows), codes)
+
+
+class YearRange(MetadataFilter):
+    """Sınıfı [low, high] aralığında olan satırlar; sınırlardan biri None ise açık uçlu."""
+
+    def __init__(self, low: Optional[float] = None, high: Optional[float] = None, field: str = "year"):
+        self.low, self.high, self.field = low, high, field
+
+    def mask(self, engine, query_row: int) -> np.ndarray:
+        column = engine.metadata_index.column(self.field, engine._n_rows)
+        mask = ~np.isnan(column)
+        if self.low is not None:
+            mask &= column >= self.low
+        if self.high is not None:
+            mask &= column <= self.high
+        return mask
+
+
+class Exclude(MetadataFilter):
+    """Verilen kullanıcıları dışarıda bırakır (ör. topluluğun mevcut üyeleri)."""
+
+    def __init__(self, user_ids: Iterable[str]):
+        self.user_ids = [str(uid) for uid in user_ids]
+
+    def mask(self, engine, query_row: int) -> np.ndarray:
+        mask = np.ones(engine._n_rows, dtype=bool)
+        rows = [engine._id_to_row[uid] for uid in self.user_ids if uid in engine._id_to_row]
+        mask[rows] = False
+        return mask
+
+
+class AllOf(MetadataFilter):
+    def __init__(self, *filters: MetadataFilter):
+        self.filters = filters
+
+    def mask(self, engine, query_row: int) -> np.ndarray:
+        mask = np.ones(engine._n_rows, dtype=bool)
+        for f in self.filters:
+            mask &= f.mask(engine, query_row)
+        return mask
+
+
+class AnyOf(MetadataFilter):
+    def __init__(self, *filters: MetadataFilter):
+        self.filters = filters
+
+    def mask(self, engine, query_row: int) -> np.ndarray:
+        mask = np.zeros(engine._n_rows, dtype=bool)
+        for f in self.filters:
+            mask |= f.mask(engine, query_row)
+        return mask
+
+
+class Not(MetadataFilter):
+    def __init__(self, inner: MetadataFilter):
+        self.inner = inner
+
+    def mask(self, engine, query_row: int) -> np.ndarray:
+        return ~self.inner.mask(engine, query_row)
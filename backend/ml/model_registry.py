@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from typing import List, Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class ModelBundle:
+    """Birlikte eğitilmiş ve birlikte servis edilen model seti (tek sürüm)."""
+
+    def __init__(self, version: str, preprocessor, similarity_engine, community_assigner=None,
+                 clustering_model=None, metadata: Optional[Dict[str, Any]] = None):
+        self.version = version
+        self.preprocessor = preprocessor
+        self.similarity_engine = similarity_engine
+        self.community_assigner = community_assigner
+        self.clustering_model = clustering_model
+        self.metadata = metadata or {}
+        self.created_at = time.time()
+        self.activated_at: Optional[float] = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "created_at": self.created_at,
+            "activated_at": self.activated_at,
+            "n_users": getattr(self.similarity_engine, 'user_count', None),
+            "feature_version": getattr(self.preprocessor, 'feature_version', None),
+            **self.metadata
+        }
+
+
+class ModelRegistry:
+    """
+    Sürümlü model kayıt defteri: aktif set tek bir referanstır.
+
+    Yeni set arka plan thread'inde kurulur ve hazır olunca referans tek atamayla değiştirilir
+    (CPython'da atomik). İstekler başta `registry.active` ile seti bir kez alır; devam eden
+    istekler eski sürümle tamamlanır. Önceki sürümler geri dönüş için saklanır.
+    """
+
+    def __init__(self, max_history: int = 2):
+        self.max_history = max_history
+        self._active: Optional[ModelBundle] = None
+        self._history: List[ModelBundle] = []  # en yenisi sonda
+        self._lock = threading.Lock()  # yalnızca yazıcılar (publish/rollback) arasında
+        self._build_thread: Optional[threading.Thread] = None
+        self._counter = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def active(self) -> Optional[ModelBundle]:
+        return self._active
+
+    @property
+    def is_building(self) -> bool:
+        return self._build_thread is not None and self._build_thread.is_alive()
+
+    def _make_version(self) -> str:
+        self._counter += 1
+        return f"v{self._counter}-{time.strftime('%Y%m%d%H%M%S')}"
+
+    def next_version(self) -> str:
+        with self._lock:
+            return self._make_version()
+
+    def publish(self, bundle: ModelBundle) -> ModelBundle:
+        """Seti aktif yapar; önceki aktif set geçmişe alınır."""
+        with self._lock:
+            previous = self._active
+            bundle.activated_at = time.time()
+            self._active = bundle
+            if previous is not None:
+                self._history.append(previous)
+                del self._history[:-self.max_history]
+        logger.info(f"Model seti aktif: {bundle.version}"
+                    + (f" (önceki: {previous.version})" if previous is not None else ""))
+        return bundle
+
+    def rollback(self, version: Optional[str] = None) -> bool:
+        """Geçmişteki bir sürüme (varsayılan: bir önceki) döner; mevcut aktif set geçmişe alınır."""
+        with self._lock:
+            candidates = [b for b in self._history if version is None or b.version == version]
+            if not candidates:
+                logger.warning(f"Geri dönülecek model sürümü yok: {version}")
+                return False
+
+            target = candidates[-1]
+            self._history.remove(target)
+            if self._active is not None:
+                self._history.append(self._active)
+                del self._history[:-self.max_history]
+            target.activated_at = time.time()
+            self._active = target
+
+        logger.info(f"Model sürümü geri alındı: {target.version}")
+        return True
+
+    def build_async(self, builder: Callable[[str], ModelBundle],
+                    on_published: Optional[Callable[[ModelBundle], None]] = None,
+                    catch_up: Optional[Callable[[ModelBundle], None]] = None,
+                    publish_lock=None) -> bool:
+        """
+        builder(version) ile yeni seti arka planda kurar ve hazır olunca yayınlar.
+        catch_up(bundle), kurulum sürerken eski sete yapılan güncellemeleri yeni sete uygular:
+        önce kilitsiz (biriken iş), sonra publish_lock altında yayından hemen önce bir kez daha
+        çağrılır. Güncellemeler aynı kilidi tuttuğundan yayın anına kadar gelen hiçbir
+        güncelleme kaybolmaz. Zaten bir kurulum sürüyorsa False döner.
+        """
+        with self._lock:
+            if self._build_thread is not None and self._build_thread.is_alive():
+                return False
+            version = self._make_version()
+
+            def run():
+                try:
+                    bundle = builder(version)
+                    if catch_up is not None:
+                        catch_up(bundle)
+                    with publish_lock if publish_lock is not None else nullcontext():
+                        if catch_up is not None:
+                            catch_up(bundle)
+                        self.publish(bundle)
+                    self.last_error = None
+                    if on_published is not None:
+                        on_published(bundle)
+                except Exception as e:
+                    self.last_error = str(e)
+                    logger.error(f"Model seti kurulum hatası ({version}): {str(e)}")
+
+            self._build_thread = threading.Thread(target=run, name=f"model-build-{version}", daemon=True)
+            self._build_thread.start()
+            return True
+
+    def status(self) -> Dict[str, Any]:
+        active = self._active
+        return {
+            "active_version": active.version if active is not None else None,
+            "active": active.describe() if active is not None else None,
+            "history": [b.version for b in self._history],
+            "building": self.is_building,
+            "last_error": self.last_error
+        }
+
+
+# Global registry instance
+model_registry = ModelRegistry()
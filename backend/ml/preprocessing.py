@@ -1,14 +1,101 @@
 import numpy as np
 import logging
 import os
+import json
+import hashlib
 import joblib
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from sklearn.preprocessing import StandardScaler
 from sklearn.feature_extraction.text import TfidfVectorizer
 
 logger = logging.getLogger(__name__)
 
 
+class IncrementalHobbyEncoder:
+    """
+    Sözlüğü kararlı, artımlı güncellenebilen TF-IDF hobi kodlayıcısı.
+
+    Bir terim bir kez bir sütuna atandığında o sütunda kalır; yeni terimler boş
+    sütunlara yerleşir (max_features dolana kadar). Belge frekansları sayaç olarak
+    tutulduğundan yeni kullanıcılar tüm korpusu yeniden işlemeden eklenebilir.
+    IDF formülü TfidfVectorizer(smooth_idf=True) ile aynıdır.
+    """
+
+    def __init__(self, max_features: int = 50):
+        self.max_features = max_features
+        self.vocabulary_: Dict[str, int] = {}
+        self.doc_freq = np.zeros(max_features, dtype=np.int64)
+        self.n_docs = 0
+        self._analyzer = TfidfVectorizer(lowercase=True).build_analyzer()
+
+    @property
+    def idf_(self) -> np.ndarray:
+        return np.log((1 + self.n_docs) / (1 + self.doc_freq)) + 1.0
+
+    def _terms(self, hobbies_list: List[str]) -> List[str]:
+        return self._analyzer(" ".join(hobbies_list or []))
+
+    def partial_fit(self, all_hobbies: List[List[str]]) -> bool:
+        """Belge frekanslarını günceller; sözlük büyüdüyse True döner."""
+        vocabulary_grew = False
+        for hobbies in all_hobbies:
+            terms = set(self._terms(hobbies))
+            if not terms:
+                continue
+            self.n_docs += 1
+            # Sıralı: yeni terimlerin sütunları süreçler arasında (PYTHONHASHSEED'den bağımsız) aynı olur
+            for term in sorted(terms):
+                idx = self.vocabulary_.get(term)
+                if idx is None:
+                    if len(self.vocabulary_) >= self.max_features:
+                        continue  # Sözlük dolu: yeni terim yok sayılır
+                    idx = len(self.vocabulary_)
+                    self.vocabulary_[term] = idx
+                    vocabulary_grew = True
+                self.doc_freq[idx] += 1
+        return vocabulary_grew
+
+    def document_terms(self, hobbies: List[str]) -> Tuple[bool, Tuple[int, ...]]:
+        """Belgenin n_docs'a sayılıp sayılmadığı ve frekansına katıldığı sütunlar (bkz. forget)."""
+        terms = set(self._terms(hobbies))
+        return bool(terms), tuple(sorted(self.vocabulary_[t] for t in terms if t in self.vocabulary_))
+
+    def forget(self, counted: bool, indices: Tuple[int, ...]):
+        """partial_fit ile katılmış bir belgenin frekans katkısını geri alır (sözlük küçülmez)."""
+        if counted:
+            self.n_docs = max(0, self.n_docs - 1)
+        if indices:
+            idx = np.asarray(indices, dtype=np.intp)
+            self.doc_freq[idx] = np.maximum(self.doc_freq[idx] - 1, 0)
+
+    def fit(self, all_hobbies: List[List[str]]) -> 'IncrementalHobbyEncoder':
+        self.vocabulary_ = {}
+        self.doc_freq[:] = 0
+        self.n_docs = 0
+        self.partial_fit(all_hobbies)
+        return self
+
+    def transform(self, hobbies_list: List[str]) -> np.ndarray:
+        return self.transform_many([hobbies_list])[0]
+
+    def transform_many(self, all_hobbies: List[List[str]]) -> np.ndarray:
+        """Tüm kullanıcıların TF-IDF matrisini tek geçişte üretir: (n, max_features)."""
+        rows, cols = [], []
+        for i, hobbies in enumerate(all_hobbies):
+            for term in self._terms(hobbies):
+                idx = self.vocabulary_.get(term)
+                if idx is not None:
+                    rows.append(i)
+                    cols.append(idx)
+
+        matrix = np.zeros((len(all_hobbies), self.max_features))
+        np.add.at(matrix, (rows, cols), 1.0)
+        matrix *= self.idf_
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
 class DataPreprocessor:
     """
     Kullanıcı verilerini embedding'e çeviren production-ready preprocessor.
@@ -21,9 +108,15 @@ class DataPreprocessor:
         "leader", "supporter", "specialist"
     ]
 
-    ADDITIONAL_DIM = 2  # university + department
+    # Boyut -> sütun indeksi (list.index yerine O(1) arama)
+    PERSONALITY_INDEX = {dim: i for i, dim in enumerate(PERSONALITY_DIMENSIONS)}
+
+    # Üniversite ve bölüm alan başına ACADEMIC_BUCKETS kovalı one-hot ile kodlanır (hashing trick)
+    ACADEMIC_FIELDS = ("university", "department")
+    ACADEMIC_BUCKETS = 16
+    ADDITIONAL_DIM = len(ACADEMIC_FIELDS) * ACADEMIC_BUCKETS
 
-    def __init__(self, max_hobby_features: int = 50):
+    def __init__(self, max_hobby_features: int = 50, incremental: bool = False):
         self.hobbies_vectorizer = TfidfVectorizer(
             max_features=max_hobby_features,
             lowercase=True
@@ -31,35 +124,64 @@ class DataPreprocessor:
         self.scaler = StandardScaler()
         self.max_hobby_features = max_hobby_features
 
+        # Artımlı mod: sözlüğü kararlı hobi kodlayıcı + running mean/variance
+        self.incremental = incremental
+        self.hobby_encoder = IncrementalHobbyEncoder(max_hobby_features) if incremental else None
+
         self.vectorizer_fitted = False
         self.scaler_fitted = False
 
+        # Embedding uzayı her değiştiğinde (tam fit, sözlük büyümesi) artar;
+        # eski sürümle üretilmiş embedding'ler bununla tespit edilir
+        self.feature_version = 0
+
+        # İstatistiklere (belge frekansları, scaler) katılmış kullanıcılar:
+        # user_id -> (girdi parmak izi, belge sayıldı mı, hobi sütunları). Aynı içerik ikinci kez
+        # sayılmaz; içerik değişince eski hobi katkısı düşülüp yenisi katılır
+        self.fitted_users: Dict[str, Tuple[int, bool, Tuple[int, ...]]] = {}
+
     # --------------------------------------------------
     # PERSONALITY
     # --------------------------------------------------
 
     def preprocess_personality(self, personality_data) -> np.ndarray:
-        vector = np.zeros(len(self.PERSONALITY_DIMENSIONS))
-
-        if isinstance(personality_data, str):
-            for dim in personality_data.split("_"):
-                if dim in self.PERSONALITY_DIMENSIONS:
-                    idx = self.PERSONALITY_DIMENSIONS.index(dim)
-                    vector[idx] = 1.0
-
-        elif isinstance(personality_data, dict):
-            for key, value in personality_data.items():
-                if key in self.PERSONALITY_DIMENSIONS:
-                    idx = self.PERSONALITY_DIMENSIONS.index(key)
-                    vector[idx] = float(value)
-
-        return vector
+        return self.personality_matrix([personality_data])[0]
+
+    def personality_matrix(self, personalities: List) -> np.ndarray:
+        """Kişilik bloğunu tüm kullanıcılar için tek seferde doldurur: (n, 12)."""
+        rows, cols, values = [], [], []
+
+        for i, personality_data in enumerate(personalities):
+            if isinstance(personality_data, str):
+                for dim in personality_data.split("_"):
+                    idx = self.PERSONALITY_INDEX.get(dim)
+                    if idx is not None:
+                        rows.append(i)
+                        cols.append(idx)
+                        values.append(1.0)
+
+            elif isinstance(personality_data, dict):
+                for key, value in personality_data.items():
+                    idx = self.PERSONALITY_INDEX.get(key)
+                    if idx is not None:
+                        rows.append(i)
+                        cols.append(idx)
+                        values.append(float(value))
+
+        matrix = np.zeros((len(personalities), len(self.PERSONALITY_DIMENSIONS)))
+        matrix[rows, cols] = values
+        return matrix
 
     # --------------------------------------------------
     # HOBBIES
     # --------------------------------------------------
 
     def fit_hobbies(self, all_hobbies: List[List[str]]):
+        if self.incremental:
+            self.hobby_encoder.fit(all_hobbies)
+            self.vectorizer_fitted = self.hobby_encoder.n_docs > 0
+            return
+
         corpus = [" ".join(h) for h in all_hobbies if h]
         if corpus:
             self.hobbies_vectorizer.fit(corpus)
@@ -67,97 +189,269 @@ class DataPreprocessor:
             logger.info("Hobby vectorizer fitted.")
 
     def transform_hobbies(self, hobbies_list: List[str]) -> np.ndarray:
-        if not self.vectorizer_fitted:
-            return np.zeros(self.max_hobby_features)
-
-        text = " ".join(hobbies_list or [])
-        vector = self.hobbies_vectorizer.transform([text])
-        return vector.toarray().flatten()
+        return self.hobbies_matrix([hobbies_list])[0]
+
+    def hobbies_matrix(self, all_hobbies: List[List[str]]) -> np.ndarray:
+        """
+        Hobi bloğunu tüm korpus için tek sparse transform ile üretir: (n, max_hobby_features).
+        Sözlük max_hobby_features'tan küçükse kalan sütunlar sıfırdır; böylece embedding
+        boyutu her zaman embedding_size ile aynıdır.
+        """
+        matrix = np.zeros((len(all_hobbies), self.max_hobby_features))
+        if not self.vectorizer_fitted or not all_hobbies:
+            return matrix
+
+        if self.incremental:
+            return self.hobby_encoder.transform_many(all_hobbies)
+
+        corpus = [" ".join(hobbies or []) for hobbies in all_hobbies]
+        sparse = self.hobbies_vectorizer.transform(corpus)
+        matrix[:, :sparse.shape[1]] = sparse.toarray()
+        return matrix
 
     # --------------------------------------------------
     # ADDITIONAL FEATURES
     # --------------------------------------------------
 
-    def _stable_hash(self, value: Optional[str], mod: int = 100) -> float:
+    @staticmethod
+    def _digest(value: str, digest_size: int = 8) -> int:
+        """Süreçten bağımsız (PYTHONHASHSEED'den etkilenmeyen) tamsayı özet."""
+        return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=digest_size).digest(), "little")
+
+    @classmethod
+    def _academic_bucket(cls, field: str, value: Optional[str]) -> Optional[int]:
+        """
+        Değerin alanı içindeki kova sütunu (eksik değer için None). Kova değerin özetinden
+        hesaplanır: sözlük tutulmaz, her süreçte ve yeniden başlatmada aynıdır. Farklı değerler
+        ayrı sütunlara düştüğünden kodlar arasında sahte bir yakınlık oluşmaz (yalnızca
+        kova çakışmaları aynı sayılır).
+        """
         if not value:
-            return 0.0
-        return (abs(hash(value)) % mod) / mod
+            return None
+        offset = cls.ACADEMIC_FIELDS.index(field) * cls.ACADEMIC_BUCKETS
+        return offset + cls._digest(f"{field}:{str(value).strip().lower()}") % cls.ACADEMIC_BUCKETS
 
     def encode_additional(self, university, department):
-        return np.array([
-            self._stable_hash(university),
-            self._stable_hash(department)
-        ])
+        return self.additional_matrix([university], [department])[0]
+
+    def additional_matrix(self, universities: List[Optional[str]], departments: List[Optional[str]]) -> np.ndarray:
+        matrix = np.zeros((len(universities), self.ADDITIONAL_DIM))
+        for i, values in enumerate(zip(universities, departments)):
+            for field, value in zip(self.ACADEMIC_FIELDS, values):
+                bucket = self._academic_bucket(field, value)
+                if bucket is not None:
+                    matrix[i, bucket] = 1.0
+        return matrix
 
     # --------------------------------------------------
     # EMBEDDING
     # --------------------------------------------------
 
-    def create_embedding(self, personality, hobbies, university=None, department=None):
+    def create_raw_embedding(self, personality, hobbies, university=None, department=None):
+        """Ölçeklenmemiş embedding (scaler istatistikleri bunun üzerinden tutulur)."""
         personality_vec = self.preprocess_personality(personality)
         hobbies_vec = self.transform_hobbies(hobbies)
         additional_vec = self.encode_additional(university, department)
 
-        embedding = np.concatenate([
+        return np.concatenate([
             personality_vec,
             hobbies_vec,
             additional_vec
         ])
 
+    def create_embedding(self, personality, hobbies, university=None, department=None):
+        embedding = self.create_raw_embedding(personality, hobbies, university, department)
+
         if self.scaler_fitted:
             embedding = self.scaler.transform([embedding])[0]
 
         return embedding
 
+    def input_fingerprint(self, user: Dict) -> int:
+        """Embedding'e giren alanların feature_version'dan bağımsız parmak izi (partial_fit tekrar kontrolü)."""
+        payload = json.dumps([
+            user.get("personality_type"),
+            sorted(str(h) for h in (user.get("hobbies") or [])),
+            user.get("university"),
+            user.get("department")
+        ], sort_keys=True, ensure_ascii=False, default=str)
+        return self._digest(payload) or 1
+
+    def content_fingerprint(self, user: Dict) -> int:
+        """
+        Embedding'e giren alanların ve feature_version'ın 64-bit parmak izi.
+        Aynı girdi her süreçte aynı değeri verir; önbellekler embedding'i yeniden
+        hesaplamadan geçerliliğini kontrol edebilir.
+        """
+        payload = json.dumps([
+            self.feature_version,
+            user.get("personality_type"),
+            sorted(str(h) for h in (user.get("hobbies") or [])),
+            user.get("university"),
+            user.get("department")
+        ], sort_keys=True, ensure_ascii=False, default=str)
+        return self._digest(payload) or 1  # 0 "parmak izi yok" anlamında ayrılmıştır
+
+    def create_raw_embeddings(self, users_data: List[Dict]) -> np.ndarray:
+        """Ölçeklenmemiş embedding matrisi: her blok tüm kullanıcılar için tek seferde üretilir."""
+        return np.hstack([
+            self.personality_matrix([u.get("personality_type") for u in users_data]),
+            self.hobbies_matrix([u.get("hobbies", []) for u in users_data]),
+            self.additional_matrix(
+                [u.get("university") for u in users_data],
+                [u.get("department") for u in users_data]
+            )
+        ])
+
+    def create_embeddings(self, users_data: List[Dict]) -> np.ndarray:
+        """
+        Toplu embedding üretimi (ör. yeni bir üniversitenin binlerce kullanıcısı).
+        Ölçekleme tüm matrise tek scaler.transform çağrısıyla uygulanır.
+        """
+        embeddings = self.create_raw_embeddings(users_data)
+
+        if self.scaler_fitted and len(embeddings):
+            embeddings = self.scaler.transform(embeddings)
+
+        return embeddings
+
     # --------------------------------------------------
     # FIT
     # --------------------------------------------------
 
+    @staticmethod
+    def _user_key(user: Dict) -> Optional[str]:
+        user_id = user.get("id", user.get("user_id"))
+        return None if user_id is None else str(user_id)
+
+    def _fit_record(self, user: Dict) -> Tuple[int, bool, Tuple[int, ...]]:
+        counted, indices = False, ()
+        if self.incremental:
+            counted, indices = self.hobby_encoder.document_terms(user.get("hobbies", []))
+        return self.input_fingerprint(user), counted, indices
+
     def fit(self, users_data: List[Dict]):
         logger.info("Preprocessor fitting başladı...")
-
         all_hobbies = [u.get("hobbies", []) for u in users_data]
         self.fit_hobbies(all_hobbies)
-
-        embeddings = []
-
+        self.fitted_users = {}
         for user in users_data:
-            emb = self.create_embedding(
-                user.get("personality_type"),
-                user.get("hobbies", []),
-                user.get("university"),
-                user.get("department")
-            )
-            embeddings.append(emb)
+            key = self._user_key(user)
+            if key is not None:
+                self.fitted_users[key] = self._fit_record(user)
+
+        # Scaler ham (ölçeklenmemiş) embedding'ler üzerinde fit edilir
+        self.scaler_fitted = False
+        embeddings = self.create_raw_embeddings(users_data)
 
-        if embeddings:
+        if len(embeddings):
             self.scaler.fit(embeddings)
             self.scaler_fitted = True
             logger.info(f"Scaler {len(embeddings)} kullanıcı ile fit edildi.")
 
+        self.feature_version += 1
+
+    def partial_fit(self, users_data: List[Dict]):
+        """
+        Yeni kullanıcıları tam yeniden fit yapmadan istatistiklere katar:
+        scaler için StandardScaler.partial_fit (running mean/variance), artımlı modda
+        hobi belge frekansları. Kullanıcı başına maliyet O(d)'dir.
+        Tekrar kontrolü (user_id, girdi parmak izi) ile yapılır: aynı içerikle tekrar verilen
+        kullanıcı istatistikleri değiştirmez. İçeriği değişmiş kullanıcının (ör. hobi testini
+        yeniden çözen) eski hobi frekans katkısı geri alınır ve yeni verisi katılır. Scaler
+        örnek bazlı durum tutmadığından eski örnek running mean/variance'tan çıkarılamaz;
+        değişen profil orada yeni bir örnek olarak sayılır.
+        """
+        new_users, replaced, batch_ids = [], [], set()
+        for user in users_data:
+            key = self._user_key(user)
+            if key is not None:
+                if key in batch_ids:
+                    continue
+                batch_ids.add(key)
+                previous = self.fitted_users.get(key)
+                if previous is not None:
+                    if previous[0] == self.input_fingerprint(user):
+                        continue
+                    replaced.append(previous)
+            new_users.append(user)
+        users_data = new_users
+        if not users_data:
+            return
+
+        if not self.vectorizer_fitted and not self.incremental:
+            # Sabit sözlük yoksa artımlı güncelleme yapılamaz: tam fit'e düş
+            self.fit(users_data)
+            return
+
+        if self.incremental:
+            for _, counted, indices in replaced:
+                self.hobby_encoder.forget(counted, indices)
+            if self.hobby_encoder.partial_fit([u.get("hobbies", []) for u in users_data]):
+                self.feature_version += 1
+            self.vectorizer_fitted = self.hobby_encoder.n_docs > 0
+
+        self.scaler.partial_fit(self.create_raw_embeddings(users_data))
+        self.scaler_fitted = True
+        for user in users_data:
+            key = self._user_key(user)
+            if key is not None:
+                self.fitted_users[key] = self._fit_record(user)
+
+    def fold_in_user(self, user: Dict) -> np.ndarray:
+        """Tek kullanıcıyı istatistiklere katar ve güncel ölçekli embedding'ini döndürür."""
+        self.partial_fit([user])
+        return self.create_embedding(
+            user.get("personality_type"),
+            user.get("hobbies", []),
+            user.get("university"),
+            user.get("department")
+        )
+
     # --------------------------------------------------
     # SAVE / LOAD
     # --------------------------------------------------
 
     def save(self, path: str):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
+        """Preprocessor'ı kaydeder; geçici dosyaya yazılıp atomik olarak yerine konur."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
 
+        tmp_path = f"{path}.tmp.{os.getpid()}"
         joblib.dump({
             "vectorizer": self.hobbies_vectorizer,
             "scaler": self.scaler,
             "vectorizer_fitted": self.vectorizer_fitted,
             "scaler_fitted": self.scaler_fitted,
-        }, path)
+            "incremental": self.incremental,
+            "hobby_encoder": self.hobby_encoder,
+            "feature_version": self.feature_version,
+            "fitted_users": self.fitted_users,
+            "embedding_size": self.embedding_size,
+        }, tmp_path)
+        os.replace(tmp_path, path)
 
         logger.info(f"Preprocessor kaydedildi: {path}")
 
     def load(self, path: str):
         data = joblib.load(path)
+        if data.get("embedding_size") != self.embedding_size:
+            # Eski akademik kodlama (2 sütun) veya farklı max_hobby_features ile kaydedilmiş
+            raise ValueError(
+                f"Preprocessor embedding boyutu uyumsuz: {data.get('embedding_size')} != {self.embedding_size}"
+            )
 
         self.hobbies_vectorizer = data["vectorizer"]
         self.scaler = data["scaler"]
         self.vectorizer_fitted = data["vectorizer_fitted"]
         self.scaler_fitted = data["scaler_fitted"]
+        self.incremental = data.get("incremental", False)
+        self.hobby_encoder = data.get("hobby_encoder")
+        self.feature_version = data.get("feature_version", 0)
+        # Eski kayıtlar yalnızca id tutar: parmak izi 0 hiçbir içerikle eşleşmez, ilk
+        # güncellemede kullanıcı (eski katkısı bilinmeden) yeniden katılır
+        self.fitted_users = data.get("fitted_users") or {
+            user_id: (0, False, ()) for user_id in data.get("fitted_ids", ())
+        }
 
         logger.info(f"Preprocessor yüklendi: {path}")
 
@@ -165,6 +459,17 @@ class DataPreprocessor:
     # INFO
     # --------------------------------------------------
 
+    @property
+    def feature_blocks(self) -> Dict[str, slice]:
+        """Embedding içindeki blokların konumları (SimilarityEngine blok-ağırlıklı skorlama için)."""
+        personality_end = len(self.PERSONALITY_DIMENSIONS)
+        hobbies_end = personality_end + self.max_hobby_features
+        return {
+            "personality": slice(0, personality_end),
+            "hobbies": slice(personality_end, hobbies_end),
+            "academic": slice(hobbies_end, hobbies_end + self.ADDITIONAL_DIM)
+        }
+
     @property
     def embedding_size(self):
         return (
@@ -0,0 +1,182 @@
+import numpy as np
+import logging
+import time
+from typing import Dict, Any, Optional
+from sklearn.cluster import KMeans
+
+logger = logging.getLogger(__name__)
+
+
+class ScalarQuantizer:
+    """
+    Boyut başına int8 skaler kuantizasyon (4x bellek kazancı).
+    Her boyut kendi [min, max] aralığında 256 seviyeye bölünür.
+    """
+
+    code_dtype = np.int8
+
+    def __init__(self):
+        self.offset: Optional[np.ndarray] = None  # boyut başına min
+        self.scale: Optional[np.ndarray] = None  # boyut başına adım
+        self.is_fitted = False
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return None if self.offset is None else len(self.offset)
+
+    @property
+    def code_size(self) -> int:
+        return self.dimension or 0
+
+    def fit(self, vectors: np.ndarray) -> 'ScalarQuantizer':
+        vectors = np.asarray(vectors, dtype=np.float32)
+        lo, hi = vectors.min(axis=0), vectors.max(axis=0)
+        self.offset = lo
+        self.scale = np.where(hi > lo, (hi - lo) / 255.0, 1.0).astype(np.float32)
+        self.is_fitted = True
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        levels = np.rint((vectors - self.offset) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return (codes.astype(np.float32) + 128.0) * self.scale + self.offset
+
+    def inner_products(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """q . decode(c) = (q*s) . c + 128 * sum(q*s) + q . offset ; açılmış matris oluşturmaz."""
+        query = np.asarray(query, dtype=np.float32)
+        qs = query * self.scale
+        return codes @ qs + (128.0 * qs.sum() + float(query @ self.offset))
+
+
+class ProductQuantizer:
+    """
+    Product quantization (PQ): vektör m alt uzaya bölünür, her alt uzay 256 merkezli
+    KMeans ile tek bayta kodlanır (float32'ye göre 4*d/m kat kazanç).
+    Skorlama asimetrik mesafe hesabı (ADC) ile yapılır: sorgu float kalır,
+    alt uzay başına 256'lık iç çarpım tablosu bir kez hesaplanıp kodlarla toplanır.
+    """
+
+    code_dtype = np.uint8
+    N_CENTROIDS = 256
+
+    def __init__(self, n_subspaces: int = 8, max_train_samples: int = 50000, random_state: int = 42):
+        self.n_subspaces = int(n_subspaces)
+        self.max_train_samples = max_train_samples
+        self.random_state = random_state
+        self.codebooks: Optional[np.ndarray] = None  # (m, n_centroids, sub_dim)
+        self._dimension: Optional[int] = None
+        self.is_fitted = False
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return self._dimension
+
+    @property
+    def code_size(self) -> int:
+        return self.n_subspaces
+
+    @property
+    def sub_dim(self) -> int:
+        return -(-self._dimension // self.n_subspaces)
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, d) -> (m, n, sub_dim); d, m'nin katı değilse sıfırla doldurulur."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        padded_dim = self.sub_dim * self.n_subspaces
+        if vectors.shape[1] < padded_dim:
+            vectors = np.pad(vectors, ((0, 0), (0, padded_dim - vectors.shape[1])))
+        return vectors.reshape(len(vectors), self.n_subspaces, self.sub_dim).transpose(1, 0, 2)
+
+    def fit(self, vectors: np.ndarray) -> 'ProductQuantizer':
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self._dimension = vectors.shape[1]
+        self.n_subspaces = max(1, min(self.n_subspaces, self._dimension))
+
+        if len(vectors) > self.max_train_samples:
+            rng = np.random.default_rng(self.random_state)
+            vectors = vectors[rng.choice(len(vectors), self.max_train_samples, replace=False)]
+
+        # Az örnekte 256'dan az merkez kullanılır; kodlar yine tek bayttır
+        n_centroids = min(self.N_CENTROIDS, len(vectors))
+        self.codebooks = np.zeros((self.n_subspaces, n_centroids, self.sub_dim), dtype=np.float32)
+        for m, sub_vectors in enumerate(self._split(vectors)):
+            kmeans = KMeans(n_clusters=n_centroids, n_init=1, random_state=self.random_state)
+            kmeans.fit(sub_vectors)
+            self.codebooks[m] = kmeans.cluster_centers_
+
+        self.is_fitted = True
+        logger.info(f"PQ eğitildi: {self.n_subspaces} alt uzay x {n_centroids} merkez")
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        subs = self._split(vectors)
+        codes = np.empty((subs.shape[1], self.n_subspaces), dtype=np.uint8)
+        for m in range(self.n_subspaces):
+            book = self.codebooks[m]
+            book_sq = np.einsum('ij,ij->i', book, book)
+            codes[:, m] = np.argmin(book_sq[None, :] - 2.0 * (subs[m] @ book.T), axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = self.codebooks[np.arange(self.n_subspaces), codes]  # (n, m, sub_dim)
+        return parts.reshape(len(codes), -1)[:, :self._dimension]
+
+    def inner_products(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """ADC: alt uzay başına (256,) iç çarpım tablosu + kod indeksleriyle toplama."""
+        q_subs = self._split(query)[:, 0, :]  # (m, sub_dim)
+        lut = np.einsum('mkd,md->mk', self.codebooks, q_subs)  # (m, n_centroids)
+        return lut[np.arange(self.n_subspaces), codes].sum(axis=1)
+
+
+def create_quantizer(kind: str, **kwargs):
+    """'int8' veya 'pq' için kuantizer oluşturur."""
+    if kind == 'int8':
+        return ScalarQuantizer()
+    if kind == 'pq':
+        return ProductQuantizer(**kwargs)
+    raise ValueError(f"Bilinmeyen kuantizasyon türü: {kind}")
+
+
+def evaluate_quantization(engine, sample_size: int = 200, top_k: int = 10,
+                          random_state: int = 42) -> Dict[str, Any]:
+    """
+    Motorun bağlı kuantizeri için bellek ve recall@k raporu üretir.
+    Referans, aynı sorguların float32 tam aramasıdır.
+    """
+    if engine.quantizer is None:
+        return {"success": False, "message": "Kuantizer bağlı değil"}
+
+    user_ids = list(engine._id_to_row.keys())
+    rng = np.random.default_rng(random_state)
+    sample = []
+    if user_ids:
+        sample = [str(uid) for uid in rng.choice(user_ids, min(sample_size, len(user_ids)), replace=False)]
+
+    recalls = []
+    exact_time = quantized_time = 0.0
+    for uid in sample:
+        start = time.perf_counter()
+        exact = {r['user_id'] for r in engine.find_similar_users(uid, top_k, quantized=False)}
+        exact_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        approx = {r['user_id'] for r in engine.find_similar_users(uid, top_k)}
+        quantized_time += time.perf_counter() - start
+
+        if exact:
+            recalls.append(len(exact & approx) / len(exact))
+
+    n_queries = max(len(sample), 1)
+    return {
+        "success": True,
+        "quantizer": type(engine.quantizer).__name__,
+        "rerank": engine.rerank,
+        **engine.memory_footprint(),
+        f"recall_at_{top_k}": float(np.mean(recalls)) if recalls else 0.0,
+        "exact_ms_per_query": 1000 * exact_time / n_queries,
+        "quantized_ms_per_query": 1000 * quantized_time / n_queries,
+        "n_queries": len(sample)
+    }
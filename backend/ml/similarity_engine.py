@@ -1,113 +1,791 @@
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.cluster import KMeans
 import logging
 import os
+import json
+import time
 import pickle
-from typing import List, Dict, Any, Optional
+import tempfile
+from typing import List, Dict, Any, Optional, Tuple
+from backend.ml.metadata_index import MetadataIndex, MetadataFilter, SameAs
+from backend.ml.locks import ReadWriteLock, read_locked, write_locked
 
 logger = logging.getLogger(__name__)
 
 
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Son eksende en yüksek top_k skorun indekslerini azalan sırada döndürür.
+    Tam argsort yerine argpartition (O(n)) + yalnızca k elemanın sıralanması.
+    """
+    n = scores.shape[-1]
+    k = min(top_k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.intp)
+
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(n), scores.shape).copy()
+
+    part_scores = np.take_along_axis(scores, part, axis=-1)
+    order = np.argsort(-part_scores, axis=-1, kind='stable')
+    return np.take_along_axis(part, order, axis=-1)
+
+
 class SimilarityEngine:
     """
     FriendZone Gelişmiş Kullanıcı Benzerlik ve Eşleştirme Motoru.
     Vektörize edilmiş işlemler ve ağırlıklı benzerlik skorlaması içerir.
+
+    Embedding'ler tek bir bitişik (contiguous) float32 matriste tutulur:
+    her kullanıcı bir satırdır, user_id -> satır eşlemesi sözlükte saklanır,
+    silinen kullanıcıların satırları free-list üzerinden tekrar kullanılır.
+    Satırlar blok bazında (kişilik, hobi, akademik) L2 normalize saklanır; ağırlıklı
+    benzerlik blok iç çarpımlarının ağırlıklı toplamıdır.
+
+    Satır düzenini değiştiren işlemler `lock` yazma kilidi, aramalar okuma kilidi altında
+    çalışır; arka plan yenilemeleri canlı motoru isteklerle eşzamanlı güncelleyebilir.
+    Embedding üretimi kilit dışında yapılır, kilit yalnızca satırlar yazılırken tutulur.
     """
 
-    def __init__(self, preprocessor, weights: Optional[Dict[str, float]] = None):
+    INITIAL_CAPACITY = 1024
+    GROWTH_FACTOR = 2
+
+    # Disk formatı (pickle'sız, mmap ile açılabilir)
+    FORMAT_VERSION = 2  # 2: dizi dosyaları kayıt nesli ile adlandırılır, header adları listeler
+    HEADER_FILE = "header.json"
+    MATRIX_FILE = "embeddings.npy"
+    NORMS_FILE = "norms.npy"
+    VALID_FILE = "valid.npy"
+    VERSIONS_FILE = "versions.npy"
+    FINGERPRINTS_FILE = "fingerprints.npy"
+    IDS_FILE = "ids.npy"
+    METADATA_FILE = "metadata.json"
+    STATE_FILES = (MATRIX_FILE, NORMS_FILE, VALID_FILE, VERSIONS_FILE, FINGERPRINTS_FILE, IDS_FILE, METADATA_FILE)
+
+    def __init__(self, preprocessor, weights: Optional[Dict[str, float]] = None,
+                 initial_capacity: int = INITIAL_CAPACITY):
         self.preprocessor = preprocessor
-        # user_id -> np.array (embedding)
-        self.user_embeddings = {}
+        self.initial_capacity = max(1, int(initial_capacity))
+
+        # Satır = kullanıcı. Boyut ilk embedding ile belirlenir.
+        self._matrix: Optional[np.ndarray] = None  # (capacity, dim) float32
+        self._norms: Optional[np.ndarray] = None  # (capacity,) saklanan satırların L2 normları
+        self._valid: Optional[np.ndarray] = None  # (capacity,) dolu satır maskesi
+        self._versions: Optional[np.ndarray] = None  # (capacity,) satırın üretildiği feature_version
+        self._fingerprints: Optional[np.ndarray] = None  # (capacity,) girdi içeriğinin uint64 parmak izi
+        self._row_ids: List[Optional[str]] = []  # satır -> user_id (None = boş)
+        self._id_to_row: Dict[str, int] = {}  # user_id -> satır
+        self._free_rows: List[int] = []  # silinmiş, tekrar kullanılabilir satırlar
+        self._n_rows = 0  # şimdiye kadar kullanılan en yüksek satır sayısı
+        self.lock = ReadWriteLock()
+
         # user_id -> meta_data (fakülte, hobi vb. hızlı erişim için)
         self.user_metadata = {}
+        # Aynı metadata'nın satır bazlı sütunsal kodları (vektörize filtreleme için)
+        self.metadata_index = MetadataIndex()
+
+        # Opsiyonel yaklaşık arama indeksi (IVFIndex, LSHIndex); satır ekleme/silmede güncel tutulur
+        self.ann_index = None
+
+        # Opsiyonel kuantize depolama (ScalarQuantizer / ProductQuantizer); satır başına kod
+        self.quantizer = None
+        self._codes: Optional[np.ndarray] = None  # (capacity, code_size)
+        self.rerank = True
+        self.rerank_factor = 4
+        # rerank=False ile kuantize modda float matris diskteki bir memmap'e taşınır (bkz. _spill_matrix)
+        self._spill_dir: Optional[str] = None
+        self._spill_path: Optional[str] = None
 
-        # Özellik ağırlıklandırması (Gelecekte ince ayar yapabilmen için)
+        # Blok ağırlıkları (preprocessor.feature_blocks ile eşleşir); sorgu başına ezilebilir
         self.weights = weights or {
             'personality': 0.4,
             'hobbies': 0.4,
             'academic': 0.2
         }
 
+    # --------------------------------------------------
+    # MATRIX LAYOUT
+    # --------------------------------------------------
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._matrix is None else self._matrix.shape[0]
+
+    @property
+    def user_count(self) -> int:
+        return len(self._id_to_row)
+
+    @property
+    def user_embeddings(self) -> Dict[str, np.ndarray]:
+        """Geriye uyumluluk için user_id -> embedding görünümü (kopya değil, matris satırları)."""
+        if self._matrix is None:
+            return {}
+        return {uid: self._matrix[row] for uid, row in self._id_to_row.items()}
+
+    def has_user(self, user_id: str) -> bool:
+        return user_id in self._id_to_row
+
+    @read_locked
+    def get_embedding(self, user_id: str) -> Optional[np.ndarray]:
+        """Saklanan (blok bazında normalize edilmiş) embedding'in kopyası (satır yeniden kullanılabilir)."""
+        row = self._id_to_row.get(user_id)
+        return None if row is None else np.array(self._matrix[row])
+
+    # Satır düzeyinde erişim (aday üretimi, toplu işler). Dönen satır numaraları yalnızca
+    # aynı `lock.read()` bloğu içinde geçerlidir: silinen satırlar yeniden kullanılabilir.
+
+    @property
+    def n_rows(self) -> int:
+        """Kullanılmış satır sayısı (boş satırlar dahil); satır maskeleri bu uzunluktadır."""
+        return self._n_rows
+
+    def row_of(self, user_id: str) -> Optional[int]:
+        return self._id_to_row.get(user_id)
+
+    def user_id_at(self, row: int) -> Optional[str]:
+        return self._row_ids[row]
+
+    def user_ids_at(self, rows: np.ndarray) -> List[str]:
+        return [self._row_ids[row] for row in rows]
+
+    def valid_mask(self) -> np.ndarray:
+        """İlk n_rows satır için dolu satır maskesi (salt okunur kullanılmalı)."""
+        if self._valid is None:
+            return np.zeros(0, dtype=bool)
+        return self._valid[:self._n_rows]
+
+    def row_vector(self, row: int) -> np.ndarray:
+        """Satırın saklanan (blok normalize) vektörü; kopya değildir."""
+        return self._matrix[row]
+
+    def score_rows(self, row: int, rows: Optional[np.ndarray] = None,
+                   weights: Optional[Dict[str, float]] = None, quantized: bool = False) -> np.ndarray:
+        """
+        Satırın verilen satırlarla (None = tüm satırlar) blok-ağırlıklı skorları.
+        quantized=True ve kuantizer bağlıysa kodlardan yaklaşık skor hesaplanır.
+        """
+        if quantized and self.quantizer is not None:
+            return self._quantized_scores(row, rows, weights)
+        return self._cosine_scores(row, rows, weights)
+
+    def weight_vector(self, weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Blok ağırlıklarının boyut başına açılmış hali (toplamı 1)."""
+        return self._weight_vector(weights)
+
+    @read_locked
+    def valid_snapshot(self) -> Tuple[List[str], np.ndarray]:
+        """Tüm kullanıcıların id'leri ve embedding matrisinin tutarlı bir kopyası (satır sırasıyla)."""
+        if self._matrix is None:
+            return [], np.empty((0, 0), dtype=np.float32)
+        rows = np.flatnonzero(self._valid[:self._n_rows])
+        return [self._row_ids[row] for row in rows], np.array(self._matrix[rows], dtype=np.float32)
+
+    def _allocate(self, dim: int, capacity: int):
+        self._matrix = self._new_matrix(capacity, dim)
+        self._norms = np.zeros(capacity, dtype=np.float32)
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._versions = np.zeros(capacity, dtype=np.int32)
+        self._fingerprints = np.zeros(capacity, dtype=np.uint64)
+        if self.quantizer is not None:
+            self._codes = np.zeros((capacity, self.quantizer.code_size), dtype=self.quantizer.code_dtype)
+
+    def _new_matrix(self, capacity: int, dim: int) -> np.ndarray:
+        """Boş float32 matris; taşma modunda bellekte değil, geçici dosyaya eşlenmiş memmap."""
+        if self._spill_dir is None:
+            return np.zeros((capacity, dim), dtype=np.float32)
+        fd, path = tempfile.mkstemp(prefix="engine_matrix_", suffix=".npy", dir=self._spill_dir)
+        os.close(fd)
+        matrix = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(capacity, dim))
+        self._release_spill_file()
+        try:
+            # POSIX'te eşleme dosya silindikten sonra da geçerlidir; motor bırakılınca alan geri döner
+            os.remove(path)
+        except OSError:
+            self._spill_path = path  # (Windows) sonraki büyütmede / detach'te silinir
+        return matrix
+
+    def _release_spill_file(self):
+        if self._spill_path is not None:
+            try:
+                os.remove(self._spill_path)
+            except OSError as e:
+                logger.warning(f"Taşma dosyası silinemedi ({self._spill_path}): {e}")
+            self._spill_path = None
+
+    def _grow(self, min_capacity: int):
+        """Matrisi amortize O(1) ekleme için katlayarak büyütür."""
+        new_capacity = max(min_capacity, self.capacity * self.GROWTH_FACTOR)
+        old_matrix, old_norms, old_valid, old_codes = self._matrix, self._norms, self._valid, self._codes
+        old_versions, old_fingerprints = self._versions, self._fingerprints
+        self._allocate(old_matrix.shape[1], new_capacity)
+        self._matrix[:self._n_rows] = old_matrix[:self._n_rows]
+        self._norms[:self._n_rows] = old_norms[:self._n_rows]
+        self._valid[:self._n_rows] = old_valid[:self._n_rows]
+        self._versions[:self._n_rows] = old_versions[:self._n_rows]
+        self._fingerprints[:self._n_rows] = old_fingerprints[:self._n_rows]
+        if old_codes is not None:
+            self._codes[:self._n_rows] = old_codes[:self._n_rows]
+        logger.debug(f"Embedding matrisi büyütüldü: {new_capacity} satır")
+
+    def _acquire_row(self) -> int:
+        if self._free_rows:
+            return self._free_rows.pop()
+        if self._n_rows >= self.capacity:
+            self._grow(self._n_rows + 1)
+        row = self._n_rows
+        self._n_rows += 1
+        self._row_ids.append(None)
+        return row
+
+    def _store_embedding(self, user_id: str, embedding: np.ndarray, fingerprint: int = 0) -> int:
+        """Embedding'i blok bazında normalize edip kullanıcının satırına yazar (yoksa yeni satır ayırır)."""
+        vector = np.array(embedding, dtype=np.float32).ravel()
+
+        if self._matrix is None:
+            self._allocate(vector.shape[0], self.initial_capacity)
+        elif vector.shape[0] != self.dimension:
+            raise ValueError(f"Embedding boyutu uyumsuz: {vector.shape[0]} != {self.dimension}")
+        self._ensure_writable()
+        self._normalize_blocks(vector[None, :])
+
+        row = self._id_to_row.get(user_id)
+        if row is None:
+            row = self._acquire_row()
+            self._id_to_row[user_id] = row
+            self._row_ids[row] = user_id
+
+        self._matrix[row] = vector
+        self._norms[row] = np.linalg.norm(vector)
+        self._valid[row] = True
+        self._versions[row] = self._feature_version()
+        self._fingerprints[row] = fingerprint
+
+        if self.quantizer is not None:
+            self._codes[row] = self.quantizer.encode(vector)[0]
+        if self.ann_index is not None:
+            self.ann_index.add(row, vector)
+        return row
+
+    def _store_embeddings(self, user_ids: List[str], embeddings: np.ndarray,
+                          fingerprints: Optional[List[int]] = None) -> np.ndarray:
+        """Toplu yazma: satırlar ayrılır, matris/norm/kod blokları tek seferde doldurulur."""
+        embeddings = np.array(embeddings, dtype=np.float32)
+        if self._matrix is None:
+            self._allocate(embeddings.shape[1], max(self.initial_capacity, len(user_ids)))
+        elif embeddings.shape[1] != self.dimension:
+            raise ValueError(f"Embedding boyutu uyumsuz: {embeddings.shape[1]} != {self.dimension}")
+        self._ensure_writable()
+        self._normalize_blocks(embeddings)
+
+        new_count = sum(1 for uid in set(user_ids) if uid not in self._id_to_row)
+        needed = self._n_rows + max(0, new_count - len(self._free_rows))
+        if needed > self.capacity:
+            self._grow(needed)
+
+        rows = np.empty(len(user_ids), dtype=np.intp)
+        for i, uid in enumerate(user_ids):
+            row = self._id_to_row.get(uid)
+            if row is None:
+                row = self._acquire_row()
+                self._id_to_row[uid] = row
+                self._row_ids[row] = uid
+            rows[i] = row
+
+        self._matrix[rows] = embeddings
+        self._norms[rows] = np.linalg.norm(embeddings, axis=1)
+        self._valid[rows] = True
+        self._versions[rows] = self._feature_version()
+        self._fingerprints[rows] = 0 if fingerprints is None else np.array(fingerprints, dtype=np.uint64)
+
+        if self.quantizer is not None:
+            self._encode_rows(rows)
+        if self.ann_index is not None:
+            self.ann_index.add_batch(rows, embeddings)
+        return rows
+
+    def add_users(self, users: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Kullanıcıları toplu olarak indeksler (ör. yeni üniversite onboarding'i).
+        Embedding'ler preprocessor.create_embeddings ile tek vektörize geçişte üretilir.
+        """
+        if not users:
+            return 0
+        try:
+            user_ids = [uid for uid, _ in users]
+            users_data = [data for _, data in users]
+            embeddings = self.preprocessor.create_embeddings(users_data)
+            fingerprints = [self._fingerprint(data) for data in users_data]
+            metadata = [self._build_metadata(data) for data in users_data]
+
+            with self.lock.write():
+                rows = self._store_embeddings(user_ids, embeddings, fingerprints)
+                self.user_metadata.update(zip(user_ids, metadata))
+                self.metadata_index.set_many(rows, metadata)
+            logger.info(f"{len(users)} kullanıcı toplu olarak indekslendi")
+            return len(users)
+        except Exception as e:
+            logger.error(f"Toplu kullanıcı ekleme hatası: {str(e)}")
+            return 0
+
+    @staticmethod
+    def _build_metadata(user_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'department': user_data.get('department'),
+            'university': user_data.get('university'),
+            'year': user_data.get('year'),
+            'interests': user_data.get('hobbies', [])
+        }
+
+    def _feature_version(self) -> int:
+        return int(getattr(self.preprocessor, 'feature_version', 0) or 0)
+
+    def _fingerprint(self, user_data: Dict[str, Any]) -> int:
+        fingerprint = getattr(self.preprocessor, 'content_fingerprint', None)
+        return fingerprint(user_data) if fingerprint is not None else 0
+
+    @read_locked
+    def get_fingerprint(self, user_id: str) -> Optional[int]:
+        row = self._id_to_row.get(user_id)
+        return None if row is None else int(self._fingerprints[row])
+
+    def is_embedding_current(self, user_id: str, user_data: Dict[str, Any]) -> bool:
+        """Saklanan embedding, kullanıcının güncel verisi ve feature sürümüyle mi üretildi?"""
+        stored = self.get_fingerprint(user_id)
+        return stored is not None and stored != 0 and stored == self._fingerprint(user_data)
+
+    @read_locked
+    def stale_user_ids(self) -> List[str]:
+        """Preprocessor'ın güncel feature_version'ından eski embedding'e sahip kullanıcılar."""
+        if self._matrix is None:
+            return []
+        n = self._n_rows
+        stale_rows = np.flatnonzero(self._valid[:n] & (self._versions[:n] < self._feature_version()))
+        return [self._row_ids[row] for row in stale_rows]
+
     def add_user(self, user_id: str, user_data: Dict[str, Any]):
         """Kullanıcıyı sisteme dahil eder ve embedding üretir."""
         try:
             # Preprocessor'dan gelen ham vektör
-            embedding = self.preprocessor.create_user_embedding(
-                personality_type=user_data.get('personality_type'),
-                hobbies=user_data.get('hobbies', []),
+            embedding = self.preprocessor.create_embedding(
+                user_data.get('personality_type'),
+                user_data.get('hobbies', []),
                 university=user_data.get('university'),
                 department=user_data.get('department')
             )
 
             if embedding is not None:
-                # Ensure it's a float32 numpy array for performance
-                self.user_embeddings[user_id] = np.array(embedding, dtype=np.float32)
-                self.user_metadata[user_id] = {
-                    'department': user_data.get('department'),
-                    'university': user_data.get('university'),
-                    'interests': user_data.get('hobbies', [])
-                }
+                fingerprint = self._fingerprint(user_data)
+                with self.lock.write():
+                    row = self._store_embedding(user_id, embedding, fingerprint)
+                    self.user_metadata[user_id] = self._build_metadata(user_data)
+                    self.metadata_index.set(row, self.user_metadata[user_id])
                 logger.info(f"Kullanıcı başarıyla indekslendi: {user_id}")
         except Exception as e:
             logger.error(f"Kullanıcı eklenirken hata (ID: {user_id}): {str(e)}")
 
-    def find_similar_users(self, user_id: str, top_k: int = 5, filter_same_dept: bool = False) -> List[Dict[str, Any]]:
+    @write_locked
+    def remove_user(self, user_id: str) -> bool:
+        """Kullanıcıyı motordan çıkarır, satırını free-list'e bırakır."""
+        row = self._id_to_row.pop(user_id, None)
+        if row is None:
+            return False
+
+        self._ensure_writable()
+        if self.ann_index is not None:
+            self.ann_index.remove(row)
+
+        self._matrix[row] = 0.0
+        self._norms[row] = 0.0
+        self._valid[row] = False
+        self._fingerprints[row] = 0
+        if self._codes is not None:
+            self._codes[row] = 0
+        self._row_ids[row] = None
+        self._free_rows.append(row)
+        self.user_metadata.pop(user_id, None)
+        self.metadata_index.remove(row)
+        return True
+
+    @write_locked
+    def attach_index(self, index, user_ids: Optional[List[str]] = None, labels: Optional[np.ndarray] = None):
+        """
+        Yaklaşık arama indeksini mevcut kullanıcılarla doldurup motora bağlar.
+        Sonraki add_user / remove_user çağrıları indeksi yeniden eğitim gerekmeden günceller.
+        """
+        index.build(self, user_ids=user_ids, labels=labels)
+        self.ann_index = index
+
+    @write_locked
+    def detach_index(self):
+        self.ann_index = None
+
+    @write_locked
+    def attach_quantizer(self, quantizer, rerank: bool = True, rerank_factor: int = 4,
+                         spill_dir: Optional[str] = None):
+        """
+        Kuantize depolama modunu açar: her satırın kodu float satırla senkron tutulur ve
+        aramalar kodlar üzerinden skorlanır. rerank=True ise en iyi top_k * rerank_factor
+        aday float vektörlerle kesin olarak yeniden sıralanır.
+        rerank=False ise float matris bellekte tutulmaz: spill_dir'deki (varsayılan sistem geçici
+        dizini) bir memmap'e taşınır ve yalnızca sorgu satırı / kesin skor gerektiren çağrılarda
+        sayfa sayfa okunur; bellekte kalan kodlardır.
+        """
+        rows = np.flatnonzero(self._valid[:self._n_rows]) if self._matrix is not None else np.empty(0, np.intp)
+        if not quantizer.is_fitted:
+            if rows.size == 0:
+                raise ValueError("Kuantizer eğitimi için kullanıcı yok")
+            quantizer.fit(self._matrix[rows])
+
+        self.quantizer = quantizer
+        self.rerank = rerank
+        self.rerank_factor = max(1, int(rerank_factor))
+        if self._matrix is not None:
+            self._codes = np.zeros((self.capacity, quantizer.code_size), dtype=quantizer.code_dtype)
+            self._encode_rows(rows)
+        if not rerank:
+            self._spill_matrix(spill_dir or tempfile.gettempdir())
+
+    @write_locked
+    def detach_quantizer(self):
+        self.quantizer = None
+        self._codes = None
+        self._unspill_matrix()
+
+    def _spill_matrix(self, directory: str):
+        """Float matrisi diskteki memmap'e taşır; sonraki büyütmeler de aynı dizinde yapılır."""
+        self._spill_dir = directory
+        if self._matrix is None:
+            return
+        matrix = self._new_matrix(*self._matrix.shape)
+        matrix[:self._n_rows] = self._matrix[:self._n_rows]
+        self._matrix = matrix
+        logger.info(f"Float matris memmap'e taşındı ({directory}), bellekte yalnızca kodlar tutuluyor")
+
+    def _unspill_matrix(self):
+        """Taşınmış float matrisi belleğe geri alır."""
+        if self._spill_dir is None:
+            return
+        self._spill_dir = None
+        if self._matrix is not None:
+            self._matrix = np.array(self._matrix, dtype=np.float32)
+        self._release_spill_file()
+
+    def _encode_rows(self, rows: np.ndarray, block_size: int = 4096):
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            self._codes[block] = self.quantizer.encode(self._matrix[block])
+
+    @read_locked
+    def memory_footprint(self) -> Dict[str, Any]:
+        """
+        Embedding depolamasının bayt cinsinden boyutu. float_bytes tam float32 matrisin taban
+        boyutudur; resident_bytes süreç belleğinde gerçekten tutulanlardır (matris memmap ise
+        dahil edilmez; sayfaları OS cache'indedir). compression_ratio = float_bytes / resident_bytes.
+        """
+        n = self._n_rows
+        float_bytes = 0 if self._matrix is None else n * self._matrix.shape[1] * self._matrix.itemsize
+        code_bytes = 0 if self._codes is None else n * self._codes.shape[1] * self._codes.itemsize
+        matrix_mapped = isinstance(self._matrix, np.memmap)
+        row_state_bytes = sum(
+            n * array.itemsize for array in (self._norms, self._valid, self._versions, self._fingerprints)
+            if array is not None
+        )
+        resident_bytes = (0 if matrix_mapped else float_bytes) + code_bytes + row_state_bytes
+        return {
+            "n_users": self.user_count,
+            "float_bytes": int(float_bytes),
+            "code_bytes": int(code_bytes),
+            "row_state_bytes": int(row_state_bytes),
+            "resident_bytes": int(resident_bytes),
+            "matrix_storage": "mmap" if matrix_mapped else "memory",
+            "compression_ratio": float(float_bytes / resident_bytes) if resident_bytes else 1.0
+        }
+
+    # --------------------------------------------------
+    # FEATURE BLOCKS
+    # --------------------------------------------------
+
+    def _feature_blocks(self, dim: int) -> List[Tuple[str, slice]]:
+        """Embedding blokları; preprocessor bilgi vermezse (veya boyut uymazsa) tek blok."""
+        blocks = getattr(self.preprocessor, 'feature_blocks', None)
+        if blocks and max(block.stop for block in blocks.values()) == dim:
+            return list(blocks.items())
+        return [('all', slice(0, dim))]
+
+    def _normalize_blocks(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, dim) matrisin her bloğunu yerinde L2 normalize eder; sıfır bloklar sıfır kalır."""
+        for _, block in self._feature_blocks(vectors.shape[1]):
+            part = vectors[:, block]
+            norms = np.linalg.norm(part, axis=1, keepdims=True)
+            np.divide(part, norms, out=part, where=norms > 0)
+        return vectors
+
+    def _weight_vector(self, weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """
+        Blok ağırlıklarını boyut başına bir vektöre açar (toplamı 1 olacak şekilde).
+        weights verilirse motorun varsayılan ağırlıklarının üzerine yazılır.
+        """
+        weights = {**self.weights, **(weights or {})}
+        blocks = self._feature_blocks(self.dimension)
+        vector = np.empty(self.dimension, dtype=np.float32)
+        for name, block in blocks:
+            vector[block] = weights.get(name, 1.0)
+        total = sum(weights.get(name, 1.0) for name, _ in blocks)
+        return vector / total if total > 0 else vector
+
+    def _renormalize_rows(self):
+        """Blok normalizasyonu öncesinde kaydedilmiş satırları güncel düzene çevirir."""
+        if self._matrix is None or self._n_rows == 0:
+            return
+        self._ensure_writable()
+        n = self._n_rows
+        self._normalize_blocks(self._matrix[:n])
+        self._norms[:n] = np.linalg.norm(self._matrix[:n], axis=1)
+        if self.quantizer is not None:
+            self._encode_rows(np.flatnonzero(self._valid[:n]))
+        if self.ann_index is not None:
+            self.ann_index.build(self)
+
+    # --------------------------------------------------
+    # SCORING
+    # --------------------------------------------------
+
+    def _cosine_scores(self, row: int, rows: Optional[np.ndarray] = None,
+                       weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """
+        Bir satırın diğer satırlarla blok-ağırlıklı kosinüs benzerliği: sum_b w_b * (q_b . x_b).
+        Bloklar normalize saklandığından ağırlıklar sorguya katlanır ve skor tek
+        matris-vektör çarpımıdır. rows verilmezse tüm satırlar ([:n] görünümü, kopyasız) skorlanır.
+        """
+        if rows is None:
+            rows = slice(0, self._n_rows)
+        return self._matrix[rows] @ (self._matrix[row] * self._weight_vector(weights))
+
+    def _quantized_scores(self, row: int, rows: Optional[np.ndarray] = None,
+                          weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Kodlar üzerinden yaklaşık blok-ağırlıklı kosinüs (iç çarpım sorguda doğrusaldır)."""
+        if rows is None:
+            rows = slice(0, self._n_rows)
+        query = self._matrix[row] * self._weight_vector(weights)
+        return self.quantizer.inner_products(query, self._codes[rows]).astype(np.float32)
+
+    def _cosine_scores_block(self, rows: np.ndarray, weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Bir satır bloğunun tüm satırlarla blok-ağırlıklı kosinüs benzerliği (tek GEMM)."""
+        return (self._matrix[rows] * self._weight_vector(weights)) @ self._matrix[:self._n_rows].T
+
+    _top_k_indices = staticmethod(top_k_indices)
+
+    def _format_results(self, scores: np.ndarray, indices: np.ndarray,
+                        rows: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        results = []
+        for idx in indices:
+            score = scores[idx]
+            if not np.isfinite(score):
+                break  # Maskelenmiş (aday olmayan) satırlara ulaşıldı
+            uid = self._row_ids[idx if rows is None else rows[idx]]
+            results.append({
+                'user_id': uid,
+                'similarity_score': round(float(score), 4),
+                'metadata': self.user_metadata[uid]
+            })
+        return results
+
+    def _filter_mask(self, row: int, filter_same_dept: bool = False,
+                     filters: Optional[MetadataFilter] = None) -> Optional[np.ndarray]:
+        """Filtreleri ilk _n_rows satır için tek bir bool maskeye çevirir (filtre yoksa None)."""
+        if filter_same_dept:
+            filters = SameAs('department') if filters is None else SameAs('department') & filters
+        return None if filters is None else filters.mask(self, row)
+
+    @read_locked
+    def find_similar_users(self, user_id: str, top_k: int = 5, filter_same_dept: bool = False,
+                           approximate: bool = False, quantized: Optional[bool] = None,
+                           weights: Optional[Dict[str, float]] = None,
+                           filters: Optional[MetadataFilter] = None) -> List[Dict[str, Any]]:
         """
         Vektörize edilmiş hızlı benzerlik arama.
         filter_same_dept: Sadece aynı bölümdeki kişileri getirmek için opsiyonel filtre.
+        filters: metadata_index filtreleri (SameAs, Equals, YearRange, Exclude; & / | ile birleşir).
+        approximate: Bağlı bir ANN indeksi varsa yalnızca onun adaylarını kesin skorla.
+        quantized: Kodlar üzerinden skorla (None = kuantizer bağlıysa evet).
+        weights: Bu sorgu için blok ağırlıkları (ör. {'hobbies': 0.7}); yeniden embedding gerektirmez.
         """
         try:
-            if user_id not in self.user_embeddings or len(self.user_embeddings) < 2:
+            row = self._id_to_row.get(user_id)
+            if row is None or self.user_count < 2:
                 return []
 
-            target_vec = self.user_embeddings[user_id].reshape(1, -1)
+            rows = None
+            if approximate and self.ann_index is not None:
+                rows = self.ann_index.candidate_rows(self._matrix[row])
+                if rows.size == 0:
+                    return []
 
-            # Tüm kullanıcıları ve embeddingleri listeye dök (Vektörizasyon için)
-            all_ids = []
-            all_vecs = []
+            # Metadata filtresi skorlamadan önce maske olarak uygulanır;
+            # seçici filtrelerde yalnızca eşleşen satırlar skorlanır
+            mask = self._filter_mask(row, filter_same_dept, filters)
+            if mask is not None:
+                if rows is not None:
+                    rows = rows[mask[rows]]
+                elif np.count_nonzero(mask) * 2 < self._n_rows:
+                    rows = np.flatnonzero(mask)
+                if rows is not None and rows.size == 0:
+                    return []
 
-            for uid, vec in self.user_embeddings.items():
-                if uid == user_id: continue
+            use_codes = self.quantizer is not None and quantized is not False
 
-                # Opsiyonel Filtreleme: Aynı bölüm kısıtı varsa kontrol et
-                if filter_same_dept and self.user_metadata[uid]['department'] != self.user_metadata[user_id][
-                    'department']:
-                    continue
+            # Tek matris-vektör çarpımı; tam aramada matrisin kopyası alınmaz
+            if use_codes:
+                scores = self._quantized_scores(row, rows, weights)
+            else:
+                scores = self._cosine_scores(row, rows, weights)
 
-                all_ids.append(uid)
-                all_vecs.append(vec)
+            # Aday olmayan satırlar -inf ile maskelenir
+            if rows is None:
+                scores[~self._valid[:self._n_rows]] = -np.inf
+                if mask is not None:
+                    scores[~mask] = -np.inf
+                scores[row] = -np.inf
+            else:
+                scores[~self._valid[rows] | (rows == row)] = -np.inf
 
-            if not all_vecs: return []
+            if use_codes and self.rerank:
+                return self._rerank(row, scores, rows, top_k, weights)
 
-            # Tek tek dönmek yerine matris çarpımı yapıyoruz (Çok daha hızlı)
-            similarity_matrix = cosine_similarity(target_vec, np.array(all_vecs))
-            scores = similarity_matrix[0]
+            # En yüksek skorlu top_k satırı al
+            return self._format_results(scores, self._top_k_indices(scores, top_k), rows)
+        except Exception as e:
+            logger.error(f"Arama hatası: {str(e)}")
+            return []
 
-            # En yüksek skorlu top_k indeksi al
-            top_indices = np.argsort(scores)[::-1][:top_k]
+    def _rerank(self, row: int, scores: np.ndarray, rows: Optional[np.ndarray], top_k: int,
+                weights: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """Kuantize skorlarla seçilen kısa listeyi float vektörlerle kesin olarak yeniden sıralar."""
+        shortlist = self._top_k_indices(scores, top_k * self.rerank_factor)
+        shortlist = shortlist[np.isfinite(scores[shortlist])]
+        shortlist_rows = shortlist if rows is None else rows[shortlist]
 
-            results = []
-            for idx in top_indices:
-                uid = all_ids[idx]
-                results.append({
-                    'user_id': uid,
-                    'similarity_score': round(float(scores[idx]), 4),
-                    'metadata': self.user_metadata[uid]
-                })
+        exact = self._cosine_scores(row, shortlist_rows, weights)
+        return self._format_results(exact, self._top_k_indices(exact, top_k), shortlist_rows)
+
+    @read_locked
+    def find_similar_users_batch(self, user_ids: List[str], top_k: int = 5, block_size: int = 256,
+                                 weights: Optional[Dict[str, float]] = None,
+                                 filters: Optional[MetadataFilter] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Çok kullanıcılı toplu benzerlik arama (ör. gece çalışan "tanıyor olabileceğin kişiler" işi).
+        Sorgular block_size'lık bloklar halinde tek GEMM ile skorlanır; bellek kullanımı
+        block_size x kullanıcı sayısı ile sınırlıdır. Her kullanıcı için find_similar_users
+        ile aynı formatta sonuç listesi döner.
+        """
+        results: Dict[str, List[Dict[str, Any]]] = {uid: [] for uid in user_ids}
+        try:
+            if self.user_count < 2:
+                return results
+
+            known = [uid for uid in results if uid in self._id_to_row]
+            invalid = ~self._valid[:self._n_rows]
+            block_size = max(1, int(block_size))
+
+            for start in range(0, len(known), block_size):
+                block_ids = known[start:start + block_size]
+                rows = np.fromiter((self._id_to_row[uid] for uid in block_ids), dtype=np.intp,
+                                   count=len(block_ids))
+
+                scores = self._cosine_scores_block(rows, weights)
+                scores[:, invalid] = -np.inf
+                scores[np.arange(len(rows)), rows] = -np.inf
+                if filters is not None:
+                    for i, row in enumerate(rows):
+                        scores[i, ~filters.mask(self, row)] = -np.inf
+
+                top = self._top_k_indices(scores, top_k)
+                for i, uid in enumerate(block_ids):
+                    results[uid] = self._format_results(scores[i], top[i])
 
             return results
         except Exception as e:
-            logger.error(f"Arama hatası: {str(e)}")
-            return []
+            logger.error(f"Toplu arama hatası: {str(e)}")
+            return results
+
+    # --------------------------------------------------
+    # PAIR / GROUP SCORES
+    # --------------------------------------------------
+
+    @read_locked
+    def similarities_above(self, user_id: str, min_score: float,
+                           weights: Optional[Dict[str, float]] = None) -> Tuple[List[str], np.ndarray]:
+        """
+        Kullanıcının tüm kullanıcılarla skorları tek matris-vektör çarpımıyla hesaplanır;
+        eşik (ve kendisi/silinmiş satırlar) maske olarak uygulanır. Dönüş: (user_id'ler, skorlar).
+        """
+        row = self._id_to_row.get(user_id)
+        if row is None:
+            return [], np.empty(0, dtype=np.float32)
+
+        scores = self._cosine_scores(row, weights=weights)
+        keep = self._valid[:self._n_rows] & (scores > min_score)
+        keep[row] = False
+        rows = np.flatnonzero(keep)
+        return [self._row_ids[r] for r in rows], scores[rows]
+
+    @read_locked
+    def calculate_similarity(self, user_a: str, user_b: str,
+                             weights: Optional[Dict[str, float]] = None) -> float:
+        """İki kullanıcı arasındaki blok-ağırlıklı kosinüs benzerliği (biri yoksa 0)."""
+        row_a, row_b = self._id_to_row.get(user_a), self._id_to_row.get(user_b)
+        if row_a is None or row_b is None:
+            return 0.0
+        return float(self._matrix[row_a] @ (self._matrix[row_b] * self._weight_vector(weights)))
+
+    def group_compatibility_from_sums(self, vector_sum: np.ndarray, square_sum: np.ndarray, size: int,
+                                      weights: Optional[Dict[str, float]] = None) -> float:
+        """
+        Üye vektörlerinin toplamı S ve kare toplamı Q'dan ortalama ikili benzerlik:
+        sum_{i != j} x_i.W.x_j = S.W.S - W.Q  =>  ortalama = (S.W.S - W.Q) / (n (n - 1)).
+        Üye sayısından bağımsız olarak O(boyut) maliyetlidir.
+        """
+        if size < 2:
+            return 1.0
+        w = self._weight_vector(weights)
+        pair_total = float(vector_sum @ (vector_sum * w)) - float(w @ square_sum)
+        return pair_total / (size * (size - 1))
+
+    @read_locked
+    def calculate_group_compatibility(self, user_ids: List[str],
+                                      weights: Optional[Dict[str, float]] = None) -> float:
+        """Grup içi ortalama ikili benzerlik; tek geçişte toplamlar üzerinden (O(n), ikili döngü yok)."""
+        rows = [self._id_to_row[uid] for uid in dict.fromkeys(user_ids) if uid in self._id_to_row]
+        if len(rows) < 2:
+            return 1.0
+        members = self._matrix[rows]
+        return self.group_compatibility_from_sums(
+            members.sum(axis=0), np.einsum('ij,ij->j', members, members), len(rows), weights
+        )
 
+    def find_user_clusters(self, n_clusters: int = 5) -> Dict[str, int]:
+        """user_id -> küme etiketi (get_batch_recommendations'ın ters eşlemesi)."""
+        return {
+            uid: label
+            for label, members in self.get_batch_recommendations(n_clusters).items()
+            for uid in members
+        }
+
+    @read_locked
     def get_batch_recommendations(self, n_clusters: int = 5) -> Dict[int, List[str]]:
         """Kullanıcıları kümelere ayırarak 'topluluk' önerileri oluşturur."""
-        if len(self.user_embeddings) < n_clusters:
-            return {0: list(self.user_embeddings.keys())}
+        if self.user_count < n_clusters:
+            return {0: list(self._id_to_row.keys())}
 
-        uids = list(self.user_embeddings.keys())
-        matrix = np.array([self.user_embeddings[uid] for uid in uids])
+        rows = np.flatnonzero(self._valid[:self._n_rows])
+        uids = [self._row_ids[row] for row in rows]
+        matrix = self._matrix[rows]
 
         kmeans = KMeans(n_clusters=n_clusters, n_init='auto', random_state=42)
         labels = kmeans.fit_predict(matrix)
@@ -118,26 +796,244 @@ class SimilarityEngine:
 
         return clusters
 
+    # --------------------------------------------------
+    # PERSISTENCE
+    # --------------------------------------------------
+
+    @read_locked
     def save_state(self, directory: str = "models/engine_data"):
-        """Sistemin son durumunu (embeddings + metadata) diske kaydeder."""
+        """
+        Sistemin son durumunu pickle kullanmadan diske kaydeder:
+        header.json (sürüm, boyut, dtype, preprocessor sürümü, dosya adları), embeddings.npy
+        (ham matris), norms.npy, valid.npy, ids.npy (sabit genişlikli id tablosu) ve metadata.json.
+        Dizi dosyaları her kayıtta yeni bir nesil etiketiyle (embeddings.<nesil>.npy) yazılır ve
+        mevcut dosyaların üzerine yazılmaz; kaydı geçerli kılan tek adım header'ın atomik
+        değişimidir. Yarıda kalan bir kayıt eski header'ı ve onun dosyalarını olduğu gibi bırakır.
+        Değişimden sonra bir önceki nesil (onu okumakta olan yükleyiciler için) tutulur, daha
+        eskileri silinir.
+        """
         try:
             os.makedirs(directory, exist_ok=True)
-            with open(f"{directory}/embeddings.pkl", "wb") as f:
-                pickle.dump(self.user_embeddings, f)
-            with open(f"{directory}/metadata.pkl", "wb") as f:
-                pickle.dump(self.user_metadata, f)
+            previous = self._read_header(directory)
+            generation = f"{time.time_ns():x}{os.getpid():x}"
+            files = {name: self._generation_file(name, generation) for name in self.STATE_FILES}
+            n = self._n_rows
+            dim = self.dimension or 0
+
+            matrix = self._matrix[:n] if self._matrix is not None else np.zeros((0, dim), dtype=np.float32)
+            norms = self._norms[:n] if self._norms is not None else np.zeros(0, dtype=np.float32)
+            valid = self._valid[:n] if self._valid is not None else np.zeros(0, dtype=bool)
+            versions = self._versions[:n] if self._versions is not None else np.zeros(0, dtype=np.int32)
+            fingerprints = self._fingerprints[:n] if self._fingerprints is not None else np.zeros(0, dtype=np.uint64)
+            ids = np.array([uid or '' for uid in self._row_ids[:n]], dtype=str)
+
+            self._atomic_save_npy(os.path.join(directory, files[self.MATRIX_FILE]), matrix)
+            self._atomic_save_npy(os.path.join(directory, files[self.NORMS_FILE]), norms)
+            self._atomic_save_npy(os.path.join(directory, files[self.VALID_FILE]), valid)
+            self._atomic_save_npy(os.path.join(directory, files[self.VERSIONS_FILE]), versions)
+            self._atomic_save_npy(os.path.join(directory, files[self.FINGERPRINTS_FILE]), fingerprints)
+            self._atomic_save_npy(os.path.join(directory, files[self.IDS_FILE]), ids)
+            self._atomic_write_json(os.path.join(directory, files[self.METADATA_FILE]), self.user_metadata)
+
+            header = {
+                "format_version": self.FORMAT_VERSION,
+                "dimension": dim,
+                "dtype": str(matrix.dtype),
+                "n_rows": n,
+                "n_users": self.user_count,
+                "preprocessor_version": getattr(self.preprocessor, 'feature_version', None),
+                "block_normalized": True,
+                "saved_at": time.time(),
+                "generation": generation,
+                "files": files
+            }
+            self._atomic_write_json(os.path.join(directory, self.HEADER_FILE), header)
+            self._prune_generations(directory, keep={generation, (previous or {}).get("generation")})
             logger.info("Motor durumu başarıyla kaydedildi.")
         except Exception as e:
             logger.error(f"Kaydetme hatası: {e}")
 
-    def load_state(self, directory: str = "models/engine_data"):
-        """Diskteki verileri sisteme geri yükler."""
+    @write_locked
+    def load_state(self, directory: str = "models/engine_data", mmap: bool = True):
+        """
+        Diskteki verileri sisteme geri yükler. mmap=True ise matris np.load(mmap_mode='r')
+        ile açılır: worker'lar sayfaları OS cache üzerinden paylaşır, ilk yazmada matris
+        belleğe kopyalanır. Eski pickle formatı da okunabilir.
+        """
         try:
-            if os.path.exists(f"{directory}/embeddings.pkl"):
-                with open(f"{directory}/embeddings.pkl", "rb") as f:
-                    self.user_embeddings = pickle.load(f)
-                with open(f"{directory}/metadata.pkl", "rb") as f:
-                    self.user_metadata = pickle.load(f)
+            header_path = os.path.join(directory, self.HEADER_FILE)
+            if os.path.exists(header_path):
+                self._load_binary_state(directory, mmap)
                 logger.info("Motor durumu geri yüklendi.")
+            elif os.path.exists(f"{directory}/embeddings.pkl"):
+                self._load_legacy_state(directory)
+                logger.info("Motor durumu eski formattan geri yüklendi.")
         except Exception as e:
-            logger.error(f"Yükleme hatası: {e}")
\ No newline at end of file
+            logger.error(f"Yükleme hatası: {e}")
+
+    def _load_binary_state(self, directory: str, mmap: bool):
+        header = self._read_header(directory)
+        # Sürüm 1 header'ları dosya adlarını listelemez; sabit adlar kullanılır
+        files = header.get("files") or {}
+
+        def path(name: str) -> str:
+            return os.path.join(directory, files.get(name, name))
+
+        if header.get("format_version", 0) > self.FORMAT_VERSION:
+            raise ValueError(f"Desteklenmeyen format sürümü: {header.get('format_version')}")
+
+        expected_version = getattr(self.preprocessor, 'feature_version', None)
+        if header.get("preprocessor_version") != expected_version:
+            logger.warning(
+                f"Preprocessor sürümü farklı (disk: {header.get('preprocessor_version')}, "
+                f"aktif: {expected_version}); embedding'ler eskimiş olabilir"
+            )
+
+        matrix = np.load(path(self.MATRIX_FILE), mmap_mode='r' if mmap else None, allow_pickle=False)
+        norms = np.load(path(self.NORMS_FILE), allow_pickle=False)
+        valid = np.load(path(self.VALID_FILE), allow_pickle=False)
+        ids = np.load(path(self.IDS_FILE), allow_pickle=False)
+        versions = self._load_optional_npy(path(self.VERSIONS_FILE))
+        fingerprints = self._load_optional_npy(path(self.FINGERPRINTS_FILE))
+
+        n = header["n_rows"]
+        if matrix.shape != (n, header["dimension"]) or len(ids) != n or len(valid) != n:
+            raise ValueError("Motor durumu header ile tutarsız")
+
+        with open(path(self.METADATA_FILE), "r", encoding="utf-8") as f:
+            self.user_metadata = json.load(f)
+
+        row_ids = [str(uid) if ok else None for uid, ok in zip(ids, valid)]
+        self._restore_layout(matrix, valid, row_ids, norms=norms, versions=versions,
+                             fingerprints=fingerprints, shared=mmap)
+        if not header.get("block_normalized"):
+            self._renormalize_rows()
+
+    def _load_legacy_state(self, directory: str):
+        with open(f"{directory}/embeddings.pkl", "rb") as f:
+            state = pickle.load(f)
+        with open(f"{directory}/metadata.pkl", "rb") as f:
+            self.user_metadata = pickle.load(f)
+
+        # Eski (pickle) format: user_id -> embedding sözlüğü
+        self._restore_from_dict(state)
+
+    def _read_header(self, directory: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(directory, self.HEADER_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _generation_file(name: str, generation: str) -> str:
+        base, ext = os.path.splitext(name)
+        return f"{base}.{generation}{ext}"
+
+    def _prune_generations(self, directory: str, keep: set):
+        """
+        keep dışındaki nesillerin dosyalarını siler. None nesli sürüm 1'in sabit adlı dosyalarıdır
+        (önceki header sürüm 1 ise bir kayıt daha tutulur). Geçici (.tmp.) dosyalara dokunulmaz.
+        """
+        for filename in os.listdir(directory):
+            for name in self.STATE_FILES:
+                base, ext = os.path.splitext(name)
+                if filename == name:
+                    generation = None
+                elif filename.startswith(f"{base}.") and filename.endswith(ext) and ".tmp." not in filename:
+                    generation = filename[len(base) + 1:-len(ext)]
+                    if not generation or "." in generation:
+                        continue
+                else:
+                    continue
+                if generation not in keep:
+                    try:
+                        os.remove(os.path.join(directory, filename))
+                    except OSError as e:
+                        logger.warning(f"Eski motor dosyası silinemedi ({filename}): {e}")
+                break
+
+    @staticmethod
+    def _load_optional_npy(path: str) -> Optional[np.ndarray]:
+        return np.load(path, allow_pickle=False) if os.path.exists(path) else None
+
+    @staticmethod
+    def _atomic_save_npy(path: str, array: np.ndarray):
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(array), allow_pickle=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _atomic_write_json(path: str, data: Any):
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _reset_layout(self):
+        self._matrix = self._norms = self._valid = self._codes = self._versions = None
+        self._fingerprints = None
+        self._row_ids, self._id_to_row, self._free_rows = [], {}, []
+        self._n_rows = 0
+
+    def _restore_layout(self, matrix, valid, row_ids, norms=None, versions=None, fingerprints=None,
+                        shared: bool = False):
+        """
+        Kaydedilmiş satır düzenini geri kurar. shared=True ise matris (salt okunur mmap)
+        kopyalanmadan kullanılır; ilk değişiklikte _ensure_writable belleğe alır.
+        """
+        self._reset_layout()
+        if matrix is None or len(row_ids) == 0:
+            return
+
+        n = len(row_ids)
+        if shared:
+            self._matrix = matrix
+            self._valid = np.array(valid, dtype=bool)
+            if norms is None:
+                norms = np.linalg.norm(matrix, axis=1)
+            self._norms = np.array(norms, dtype=np.float32)
+            self._versions = np.zeros(n, dtype=np.int32)
+            self._fingerprints = np.zeros(n, dtype=np.uint64)
+            if self.quantizer is not None:
+                self._codes = np.zeros((n, self.quantizer.code_size), dtype=self.quantizer.code_dtype)
+        else:
+            self._allocate(matrix.shape[1], max(n, self.initial_capacity))
+            self._matrix[:n] = matrix
+            self._valid[:n] = valid
+            self._norms[:n] = norms if norms is not None else np.linalg.norm(self._matrix[:n], axis=1)
+
+        if versions is not None:
+            self._versions[:n] = versions
+        if fingerprints is not None:
+            self._fingerprints[:n] = fingerprints
+
+        self._row_ids = list(row_ids)
+        self._id_to_row = {uid: row for row, uid in enumerate(row_ids) if uid is not None}
+        self._free_rows = [row for row, uid in enumerate(row_ids) if uid is None]
+        self._n_rows = n
+
+        if self.quantizer is not None:
+            self._encode_rows(np.flatnonzero(self._valid[:n]))
+        if self.ann_index is not None:
+            self.ann_index.build(self)
+        self.metadata_index.build(self)
+
+    def _ensure_writable(self):
+        """Salt okunur (mmap) matrisi ilk yazmadan önce belleğe kopyalar."""
+        if self._matrix is not None and not self._matrix.flags.writeable:
+            self._grow(self.capacity + 1)
+
+    def _restore_from_dict(self, embeddings: Dict[str, np.ndarray]):
+        self._reset_layout()
+        index, self.ann_index = self.ann_index, None
+        for uid, vec in embeddings.items():
+            self._store_embedding(uid, vec)
+        if index is not None:
+            self.attach_index(index)
+        self.metadata_index.build(self)
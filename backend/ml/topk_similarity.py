@@ -0,0 +1,55 @@
+import numpy as np
+import logging
+from typing import Iterator, Tuple
+from backend.ml.similarity_engine import top_k_indices
+
+logger = logging.getLogger(__name__)
+
+# Worker başına blok bellek sınırı (skor bloğu ve top-k seçiminin geçicileri dahil)
+DEFAULT_BLOCK_MEMORY_BYTES = 64 * 1024 * 1024
+
+# Skor başına tepe bellek: float32 skor (4) + top_k_indices içinde negatif kopya (4)
+# + argpartition indeksleri (intp, 8)
+BYTES_PER_SCORE = 16
+
+
+def block_size_for(n_users: int, memory_bytes: int = DEFAULT_BLOCK_MEMORY_BYTES,
+                   max_block: int = 4096) -> int:
+    """Blok başına tepe bellek (blok_boyu x n_users x BYTES_PER_SCORE) memory_bytes'ı aşmayacak sorgu blok boyu."""
+    return int(max(1, min(max_block, memory_bytes // max(1, BYTES_PER_SCORE * n_users))))
+
+
+def iter_blocks(n_users: int, block_size: int, start_block: int = 0) -> Iterator[Tuple[int, int, int]]:
+    """(blok_no, başlangıç, bitiş) üçlüleri."""
+    n_blocks = (n_users + block_size - 1) // block_size
+    for block in range(start_block, n_blocks):
+        yield block, block * block_size, min(n_users, (block + 1) * block_size)
+
+
+def topk_block(matrix_path: str, weights: np.ndarray, start: int, stop: int, k: int,
+               min_score: float = 0.0) -> Tuple[int, np.ndarray, np.ndarray]:
+    """
+    Sorgu bloğu [start, stop) x tüm korpus skorlarını hesaplayıp satır başına top-k döner.
+    Süreç havuzu worker'ında çalışır: korpus mmap ile açılır (kopyalanmaz), bellek tek skor
+    bloğu ve seçim geçicileriyle sınırlıdır (bkz. BYTES_PER_SCORE). Kendisi ve min_score altı
+    -1 indeksle işaretlenir. Dönüş: (start, indices (b, k) int32, scores (b, k) float32),
+    skorlar azalan sırada.
+    """
+    corpus = np.load(matrix_path, mmap_mode='r')
+    queries = np.asarray(corpus[start:stop], dtype=np.float32) * weights
+    scores = queries @ corpus.T  # (b, n), doğrudan satır düzeninde
+
+    n = scores.shape[1]
+    rows = np.arange(stop - start)
+    scores[rows, rows + start] = -np.inf  # kendisi (yerinde maske)
+
+    k = min(k, n - 1)
+    if k <= 0:
+        return start, np.full((stop - start, 0), -1, dtype=np.int32), np.empty((stop - start, 0), dtype=np.float32)
+
+    top = top_k_indices(scores, k)
+    top_scores = np.take_along_axis(scores, top, axis=1).astype(np.float32)
+    top = top.astype(np.int32)
+
+    top[top_scores < min_score] = -1
+    return start, top, top_scores
@@ -4,7 +4,7 @@ from backend.models.user_model import User
 from backend.models.community_model import Community, CommunityMember
 from backend.models.chat_room_model import ChatRoom, ChatUserStatus
 from backend.models.chat_model import ChatMessage
-from backend.models.similarity_model import UserSimilarity
+from backend.models.similarity_model import UserSimilarity, SimilarityGeneration
 
 # Test modelleri (eğer varsa)
 try:
@@ -21,6 +21,7 @@ __all__ = [
     'ChatUserStatus',
     'ChatMessage',
     'UserSimilarity',
+    'SimilarityGeneration',
 ]
 
 if PersonalityTestResult:
@@ -1,14 +1,61 @@
 from backend.app import db
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import tuple_
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
+class SimilarityGeneration(db.Model):
+    """similarity_type başına okuyucuların gördüğü aktif benzerlik nesli"""
+
+    __tablename__ = 'similarity_generations'
+
+    similarity_type = db.Column(db.String(20), primary_key=True)
+    active_generation = db.Column(db.Integer, nullable=False, default=0)
+    activated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def active(cls, similarity_type='overall'):
+        """Aktif nesil (kayıt yoksa 0)"""
+        row = cls.query.get(similarity_type)
+        return row.active_generation if row else 0
+
+    @classmethod
+    def active_subquery(cls, similarity_type):
+        """Okuma sorgularında kullanılacak aktif nesil ifadesi (kayıt yoksa 0)"""
+        return db.func.coalesce(
+            db.session.query(cls.active_generation)
+            .filter(cls.similarity_type == similarity_type)
+            .scalar_subquery(),
+            0
+        )
+
+    @classmethod
+    def activate(cls, similarity_type, generation):
+        """Nesli tek satırlık güncellemeyle aktif yapar; commit çağırana aittir."""
+        row = cls.query.get(similarity_type)
+        if row is None:
+            row = cls(similarity_type=similarity_type, active_generation=generation)
+            db.session.add(row)
+        else:
+            row.active_generation = generation
+        row.activated_at = datetime.utcnow()
+        return row
+
+
 class UserSimilarity(db.Model):
     """Kullanıcı benzerlik modeli"""
 
     __tablename__ = 'user_similarities'
+    __table_args__ = (
+        # Toplu upsert (INSERT ... ON CONFLICT) için çakışma hedefi
+        db.UniqueConstraint('user_id', 'similar_user_id', 'similarity_type', 'generation',
+                            name='uq_user_similarity_pair'),
+        # Kullanıcı bazlı temizlikte OR yerine iki indeksli geçiş yapılır
+        db.Index('ix_user_similarities_similar_user_id', 'similar_user_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -19,18 +66,20 @@ class UserSimilarity(db.Model):
     similarity_type = db.Column(db.String(20), default='overall')  # overall, personality, hobbies
 
     # Sistem bilgileri
-    calculated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    calculated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # süre dolumu taraması
     is_active = db.Column(db.Boolean, default=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)  # bkz. SimilarityGeneration
 
     # İlişkiler
     user = db.relationship('User', foreign_keys=[user_id], back_populates='similarities')
     similar_user = db.relationship('User', foreign_keys=[similar_user_id])
 
-    def __init__(self, user_id, similar_user_id, similarity_score, similarity_type='overall'):
+    def __init__(self, user_id, similar_user_id, similarity_score, similarity_type='overall', generation=0):
         self.user_id = user_id
         self.similar_user_id = similar_user_id
         self.similarity_score = similarity_score
         self.similarity_type = similarity_type
+        self.generation = generation
 
     def to_dict(self):
         """Benzerlik bilgilerini dictionary formatında döndür"""
@@ -42,6 +91,7 @@ class UserSimilarity(db.Model):
             'similarity_type': self.similarity_type,
             'calculated_at': self.calculated_at.isoformat() if self.calculated_at else None,
             'is_active': self.is_active,
+            'generation': self.generation,
             'similar_user': self.similar_user.to_dict() if self.similar_user else None
         }
 
@@ -49,10 +99,12 @@ class UserSimilarity(db.Model):
     def update_similarity(cls, user_id, similar_user_id, similarity_score, similarity_type='overall'):
         """Benzerlik skorunu güncelle veya oluştur"""
         # Mevcut benzerlik kaydını bul
+        generation = SimilarityGeneration.active(similarity_type)
         similarity = cls.query.filter_by(
             user_id=user_id,
             similar_user_id=similar_user_id,
-            similarity_type=similarity_type
+            similarity_type=similarity_type,
+            generation=generation
         ).first()
 
         if similarity:
@@ -65,7 +117,8 @@ class UserSimilarity(db.Model):
                 user_id=user_id,
                 similar_user_id=similar_user_id,
                 similarity_score=similarity_score,
-                similarity_type=similarity_type
+                similarity_type=similarity_type,
+                generation=generation
             )
             db.session.add(similarity)
 
@@ -78,6 +131,49 @@ class UserSimilarity(db.Model):
             logger.error(f"Benzerlik güncelleme hatası: {str(e)}")
             return None
 
+    @classmethod
+    def bulk_upsert(cls, records, chunk_size=5000):
+        """
+        Benzerlik kayıtlarını toplu yazar (executemany). PostgreSQL/SQLite'ta INSERT ... ON CONFLICT,
+        diğerlerinde aynı anahtarlar silinip yeniden eklenir. Commit çağırana aittir (tek transaction).
+        records: user_id, similar_user_id, similarity_score, similarity_type, generation, calculated_at,
+        is_active anahtarlı dict listesi.
+        """
+        if not records:
+            return 0
+
+        table = cls.__table__
+        dialect = db.session.get_bind().dialect.name
+        stmt = None
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['user_id', 'similar_user_id', 'similarity_type', 'generation'],
+                set_={
+                    'similarity_score': stmt.excluded.similarity_score,
+                    'calculated_at': stmt.excluded.calculated_at,
+                    'is_active': stmt.excluded.is_active
+                }
+            )
+
+        for offset in range(0, len(records), chunk_size):
+            chunk = records[offset:offset + chunk_size]
+            if stmt is not None:
+                db.session.execute(stmt, chunk)
+            else:
+                keys = [(r['user_id'], r['similar_user_id'], r['similarity_type'], r['generation']) for r in chunk]
+                db.session.execute(table.delete().where(
+                    tuple_(table.c.user_id, table.c.similar_user_id, table.c.similarity_type,
+                           table.c.generation).in_(keys)
+                ))
+                db.session.execute(table.insert(), chunk)
+
+        return len(records)
+
     @classmethod
     def get_similar_users(cls, user_id, similarity_type='overall', limit=10, min_score=0.5):
         """Kullanıcının benzer kullanıcılarını getir"""
@@ -85,71 +181,134 @@ class UserSimilarity(db.Model):
             cls.user_id == user_id,
             cls.similarity_type == similarity_type,
             cls.similarity_score >= min_score,
-            cls.is_active == True
+            cls.is_active == True,
+            cls.generation == SimilarityGeneration.active_subquery(similarity_type)
         ).order_by(cls.similarity_score.desc()).limit(limit).all()
 
         return similarities
 
     @classmethod
-    def calculate_and_store_similarities(cls, user_id, ml_engine):
-        """ML motoru kullanarak benzerlikleri hesapla ve sakla"""
+    def calculate_and_store_similarities(cls, user_id, ml_engine, similarity_type='overall',
+                                         min_score=0.3, weights=None):
+        """
+        ML motoru kullanarak benzerlikleri hesapla ve sakla.
+        Kullanıcı tüm embedding matrisine karşı tek vektör işlemiyle skorlanır, eşik maske olarak
+        uygulanır; eşiği geçen kayıtlar tek transaction'da toplu upsert edilir, eşiğin altına
+        düşen eski kayıtlar aynı transaction'da silinir. Yazılan kayıtları (dict) döndürür.
+        """
         from backend.models.user_model import User
 
         user = User.query.get(user_id)
         if not user or not user.is_test_completed:
             return []
 
-        # Tüm testi tamamlamış kullanıcıları getir
-        all_users = User.get_users_with_test_results()
-
-        similarities = []
-        for other_user in all_users:
-            if other_user.id == user_id:
-                continue
+        # Motorda yoksa veya verisi değiştiyse yalnızca bu kullanıcı yeniden embed edilir
+        key = str(user_id)
+        user_dict = user.to_dict()
+        if not ml_engine.is_embedding_current(key, user_dict):
+            ml_engine.add_user(key, user_dict)
 
-            # Benzerlik skorunu hesapla
-            similarity_score = ml_engine.calculate_similarity(
-                user.to_dict(),
-                other_user.to_dict()
-            )
+        similar_ids, scores = ml_engine.similarities_above(key, min_score, weights=weights)
 
-            if similarity_score > 0.3:  # Minimum eşik
-                # Benzerlik kaydını oluştur/güncelle
-                similarity = cls.update_similarity(
-                    user_id,
-                    other_user.id,
-                    similarity_score
-                )
+        calculated_at = datetime.utcnow()
+        generation = SimilarityGeneration.active(similarity_type)
+        records = [
+            {
+                'user_id': user_id,
+                'similar_user_id': int(similar_id),
+                'similarity_score': score,
+                'similarity_type': similarity_type,
+                'generation': generation,
+                'calculated_at': calculated_at,
+                'is_active': True
+            }
+            for similar_id, score in zip(similar_ids, scores.tolist())
+        ]
 
-                if similarity:
-                    similarities.append(similarity)
+        try:
+            cls.bulk_upsert(records)
+            cls.query.filter(
+                cls.user_id == user_id,
+                cls.similarity_type == similarity_type,
+                cls.generation == generation,
+                cls.calculated_at < calculated_at
+            ).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Benzerlik kaydetme hatası: {str(e)}")
+            return []
 
-        logger.info(f"{user_id} için {len(similarities)} benzerlik kaydı oluşturuldu")
-        return similarities
+        logger.info(f"{user_id} için {len(records)} benzerlik kaydı oluşturuldu")
+        return records
 
     @classmethod
-    def clear_old_similarities(cls, user_id=None, days_old=7):
-        """Eski benzerlik kayıtlarını temizle"""
-        from datetime import timedelta
+    def delete_in_chunks(cls, *criteria, chunk_size=5000, pause=0.05, max_chunks=None):
+        """
+        Koşula uyan kayıtları sınırlı birincil anahtar parçalarıyla siler: her parça indeksli bir
+        SELECT id ... LIMIT ile seçilir, id IN (...) ile silinir ve ayrı commit edilir. Parçalar
+        arasında beklenir; kilitler kısa sürer ve diğer yazıcılar araya girebilir.
+        """
+        deleted_count = 0
+        chunks = 0
+        last_id = 0
+        while max_chunks is None or chunks < max_chunks:
+            ids = [row.id for row in cls.query.with_entities(cls.id)
+                   .filter(cls.id > last_id, *criteria)
+                   .order_by(cls.id).limit(chunk_size).all()]
+            if not ids:
+                break
+
+            try:
+                cls.query.filter(cls.id.in_(ids)).delete(synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Parçalı benzerlik silme hatası: {str(e)}")
+                break
+
+            deleted_count += len(ids)
+            chunks += 1
+            last_id = ids[-1]
+            if len(ids) < chunk_size:
+                break
+            if pause:
+                time.sleep(pause)
+
+        return deleted_count
 
+    @classmethod
+    def clear_old_similarities(cls, user_id=None, days_old=7, chunk_size=5000, pause=0.05, max_chunks=None):
+        """
+        Eski benzerlik kayıtlarını temizle.
+        calculated_at indeksi üzerinden parçalı silinir; user_id verilirse OR yerine
+        user_id ve similar_user_id için iki ayrı indeksli geçiş yapılır.
+        """
         cutoff_date = datetime.utcnow() - timedelta(days=days_old)
+        old = cls.calculated_at < cutoff_date
 
-        query = cls.query.filter(cls.calculated_at < cutoff_date)
         if user_id:
-            query = query.filter(
-                (cls.user_id == user_id) | (cls.similar_user_id == user_id)
-            )
+            passes = [(old, cls.user_id == user_id), (old, cls.similar_user_id == user_id)]
+        else:
+            passes = [(old,)]
 
-        deleted_count = query.delete()
+        deleted_count = sum(
+            cls.delete_in_chunks(*criteria, chunk_size=chunk_size, pause=pause, max_chunks=max_chunks)
+            for criteria in passes
+        )
+        logger.info(f"{deleted_count} eski benzerlik kaydı silindi")
+        return deleted_count
 
-        try:
-            db.session.commit()
-            logger.info(f"{deleted_count} eski benzerlik kaydı silindi")
-            return deleted_count
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Eski benzerlikleri temizleme hatası: {str(e)}")
-            return 0
+    @classmethod
+    def drop_inactive_generations(cls, similarity_type, chunk_size=5000, pause=0.05):
+        """Aktif olmayan nesillerin kayıtlarını parçalı siler (nesil değişiminden sonra)."""
+        active = SimilarityGeneration.active(similarity_type)
+        deleted_count = cls.delete_in_chunks(
+            cls.similarity_type == similarity_type, cls.generation != active,
+            chunk_size=chunk_size, pause=pause
+        )
+        logger.info(f"{similarity_type}: {deleted_count} eski nesil benzerlik kaydı silindi")
+        return deleted_count
 
     def __repr__(self):
         return f'<UserSimilarity {self.user_id}-{self.similar_user_id}: {self.similarity_score}>'
\ No newline at end of file
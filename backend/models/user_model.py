@@ -203,5 +203,10 @@ class User(db.Model):
         """Email ile kullanıcı bul"""
         return cls.query.filter_by(email=email.lower().strip()).first()
 
+    @classmethod
+    def get_users_with_test_results(cls):
+        """Testi tamamlamış aktif kullanıcılar (ML modellerinin eğitim kümesi)"""
+        return cls.query.filter_by(is_test_completed=True, is_active=True).all()
+
     def __repr__(self):
         return f"<User {self.id} | {self.email}>"
\ No newline at end of file
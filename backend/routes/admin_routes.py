@@ -743,6 +743,68 @@ def backup_database():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+# ==================================================
+# ML Model Yönetimi
+# ==================================================
+
+@admin_bp.route('/api/ml/models')
+@admin_required
+def ml_model_status():
+    """Aktif model sürümü, geçmiş sürümler ve kurulum durumu"""
+    try:
+        from backend.services.recommendation_service import recommendation_service
+        return jsonify({'success': True, 'models': recommendation_service.registry.status()})
+
+    except Exception as e:
+        logger.error(f"Model durumu hatası: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@admin_bp.route('/api/ml/models/reload', methods=['POST'])
+@admin_required
+def reload_ml_models():
+    """Modelleri arka planda yeniden kur; hazır olunca yeni sürüm devreye alınır"""
+    try:
+        from backend.services.recommendation_service import recommendation_service
+        if not recommendation_service.reload_models_async():
+            return jsonify({
+                'success': False,
+                'message': 'Zaten bir model kurulumu sürüyor'
+            }), 409
+
+        logger.info("Model yeniden kurulumu başlatıldı (admin)")
+        return jsonify({
+            'success': True,
+            'message': 'Model kurulumu başlatıldı',
+            'models': recommendation_service.registry.status()
+        }), 202
+
+    except Exception as e:
+        logger.error(f"Model yeniden kurulum hatası: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@admin_bp.route('/api/ml/models/rollback', methods=['POST'])
+@admin_required
+def rollback_ml_models():
+    """Bir önceki (veya gövdede verilen 'version') model sürümüne geri dön"""
+    try:
+        from backend.services.recommendation_service import recommendation_service
+        version = (request.get_json(silent=True) or {}).get('version')
+        if not recommendation_service.rollback_models(version):
+            return jsonify({
+                'success': False,
+                'message': 'Geri dönülecek model sürümü bulunamadı'
+            }), 404
+
+        logger.info(f"Model sürümü geri alındı (admin): {version or 'önceki'}")
+        return jsonify({'success': True, 'models': recommendation_service.registry.status()})
+
+    except Exception as e:
+        logger.error(f"Model geri alma hatası: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 # ==================================================
 # Export İşlemleri
 # ==================================================
@@ -7,6 +7,7 @@ import hashlib
 import jwt
 import datetime
 from backend.utils.helpers import success_response, error_response
+from backend.services.embedding_refresh_service import embedding_refresh_queue
 import logging
 
 logger = logging.getLogger(__name__)
@@ -178,12 +179,18 @@ def update_profile():
 
         updatable_fields = ['name', 'university', 'department', 'year']
 
+        changed = False
         for field in updatable_fields:
             if field in data:
+                changed = changed or getattr(user, field) != data[field]
                 setattr(user, field, data[field])
 
         db.session.commit()
 
+        # Üniversite/bölüm/yıl embedding ve filtre metadata'sına girer: arka planda yenile
+        if changed:
+            embedding_refresh_queue.enqueue(user.id)
+
         print(f"✅ Profil güncellendi: {user.email}")
 
         return success_response({
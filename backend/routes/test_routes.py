@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from backend.models.user_model import User
 from backend.models.community_model import Community, CommunityMember
 from backend.app import db
+from backend.services.embedding_refresh_service import embedding_refresh_queue
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,6 +19,9 @@ def submit_personality():
             return jsonify({'success': False, 'message': 'Kullanıcı bulunamadı'}), 404
         user.personality_type = personality_type
         db.session.commit()
+
+        # Embedding arka planda yenilenir
+        embedding_refresh_queue.enqueue(user.id)
         return jsonify({'success': True, 'message': 'Kişilik testi kaydedildi'})
     except Exception as e:
         db.session.rollback()
@@ -36,6 +40,9 @@ def submit_hobbies():
         user.is_test_completed = True
         db.session.commit()
 
+        # Yeni kullanıcı arka planda, tam refit olmadan ML modellerine katılır
+        embedding_refresh_queue.enqueue(user.id)
+
         # Otomatik topluluk atama: kullanıcının hobilerine en çok uyan topluluğu bul
         all_communities = Community.query.filter_by(is_active=True).all()
         best_community = None
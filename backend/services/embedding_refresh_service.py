@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from typing import Dict, Any, List, Optional, Callable
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingRefreshQueue:
+    """
+    Süreç içi embedding yenileme kuyruğu.
+
+    Profil/test değişiklikleri isteği bekletmeden kuyruğa yazılır; tek bir worker thread
+    kullanıcıları micro-batch'ler halinde yeniden embed eder. Aynı kullanıcı için tekrar eden
+    istekler birleştirilir (kuyrukta en fazla bir kez bulunur, ilk giriş zamanı korunur).
+    """
+
+    def __init__(self, batch_size: int = 64, batch_delay: float = 0.05):
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay  # ilk işten sonra batch'in dolması için beklenen süre (s)
+        self._pending: Dict[int, float] = {}  # user_id -> ilk kuyruğa giriş zamanı (ekleme sırası korunur)
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._app = None
+        self._listeners: List[Callable[[List[int]], None]] = []
+        self._in_flight = 0  # işlenmekte olan batch'teki kullanıcı sayısı
+
+        self._stats = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "processed": 0,
+            "batches": 0,
+            "errors": 0,
+            "last_batch_size": 0,
+            "last_batch_seconds": 0.0,
+            "last_lag_seconds": 0.0,
+            "max_lag_seconds": 0.0
+        }
+
+    def add_listener(self, callback: Callable[[List[int]], None]):
+        """Her batch sonrası yenilenen user_id listesiyle çağrılır (ör. önbellek invalidasyonu)."""
+        self._listeners.append(callback)
+
+    def enqueue(self, user_id: int, app=None) -> bool:
+        """Kullanıcıyı yenileme kuyruğuna ekler; zaten bekliyorsa birleştirilir (False döner)."""
+        with self._cond:
+            self._stats["enqueued"] += 1
+            if user_id in self._pending:
+                self._stats["coalesced"] += 1
+                return False
+            self._pending[user_id] = time.time()
+            self._ensure_worker(app)
+            self._cond.notify()
+            return True
+
+    def _ensure_worker(self, app=None):
+        """Worker thread'ini ilk kullanımda (ve fork sonrası) başlatır. _cond altında çağrılır."""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._app = app or self._app or current_app._get_current_object()
+        self._worker = threading.Thread(target=self._run, name="embedding-refresh", daemon=True)
+        self._worker.start()
+
+    def _next_batch(self) -> List[int]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+        # Batch'in dolması için kısa süre bekle (birleştirme fırsatı da artar)
+        if self.batch_delay:
+            time.sleep(self.batch_delay)
+
+        with self._cond:
+            batch = list(self._pending.items())[:self.batch_size]
+            for user_id, _ in batch:
+                del self._pending[user_id]
+            self._in_flight = len(batch)
+
+        now = time.time()
+        lag = now - min(enqueued_at for _, enqueued_at in batch)
+        self._stats["last_lag_seconds"] = lag
+        self._stats["max_lag_seconds"] = max(self._stats["max_lag_seconds"], lag)
+        return [user_id for user_id, _ in batch]
+
+    def _run(self):
+        while True:
+            user_ids = self._next_batch()
+            start = time.perf_counter()
+            try:
+                with self._app.app_context():
+                    self._process(user_ids)
+                self._stats["processed"] += len(user_ids)
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error(f"Embedding yenileme hatası: {str(e)}")
+            self._stats["batches"] += 1
+            self._stats["last_batch_size"] = len(user_ids)
+            self._stats["last_batch_seconds"] = time.perf_counter() - start
+            with self._cond:
+                self._in_flight = 0
+
+    def _process(self, user_ids: List[int]):
+        from backend.services.recommendation_service import recommendation_service
+        recommendation_service.refresh_user_embeddings(user_ids)
+
+        for callback in self._listeners:
+            try:
+                callback(user_ids)
+            except Exception as e:
+                logger.error(f"Embedding yenileme dinleyici hatası: {str(e)}")
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Kuyruk boşalıp son batch işlenene kadar bekler (testler ve kapanış için)."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._cond:
+                if not self._pending and not self._in_flight:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Kuyruk derinliği ve gecikme metrikleri."""
+        with self._cond:
+            depth = len(self._pending)
+            oldest = min(self._pending.values()) if self._pending else None
+        return {
+            **self._stats,
+            "depth": depth,
+            "in_flight": self._in_flight,
+            "oldest_pending_seconds": time.time() - oldest if oldest is not None else 0.0,
+            "worker_alive": self._worker is not None and self._worker.is_alive()
+        }
+
+
+# Global queue instance
+embedding_refresh_queue = EmbeddingRefreshQueue()
@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Tuple, Set, Iterable
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[int, str, int, Optional[str]]  # (user_id, kind, limit, model_version)
+
+
+class RecommendationCache:
+    """
+    Kullanıcı başına öneri sonucu önbelleği: (user_id, kind, limit, model_version) anahtarlı,
+    TTL ve LRU sınırlı. Model sürümü değişince tümü, kullanıcının profili/test sonuçları/üyelikleri
+    değişince o kullanıcının kayıtları ve sonucunda bu kullanıcıyı içeren (başka kullanıcılara ait)
+    kayıtlar düşürülür; bunun için kayıtların referans verdiği kullanıcılar ters indekste tutulur.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any, Set[int]]]" = OrderedDict()  # key -> (bitiş, değer, referanslar)
+        self._user_keys: Dict[int, Set[CacheKey]] = {}
+        self._ref_keys: Dict[int, Set[CacheKey]] = {}  # sonuçta geçen kullanıcı -> kayıtlar
+        self._model_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def _unlink(index: Dict[int, Set[CacheKey]], user_id: int, key: CacheKey):
+        keys = index.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[user_id]
+
+    def _drop(self, key: CacheKey):
+        """_lock altında çağrılır."""
+        entry = self._entries.pop(key, None)
+        self._unlink(self._user_keys, key[0], key)
+        if entry is not None:
+            for ref in entry[2]:
+                self._unlink(self._ref_keys, ref, key)
+
+    def _check_version(self, model_version: Optional[str]):
+        """Model sürümü değiştiyse eski sürümün kayıtlarını bırakır. _lock altında çağrılır."""
+        if model_version != self._model_version:
+            if self._entries:
+                logger.info(f"Öneri önbelleği temizlendi: model {self._model_version} -> {model_version}")
+            self._entries.clear()
+            self._user_keys.clear()
+            self._ref_keys.clear()
+            self._model_version = model_version
+
+    def get(self, key: CacheKey) -> Tuple[bool, Any]:
+        with self._lock:
+            self._check_version(key[3])
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return False, None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return True, entry[1]
+
+    def set(self, key: CacheKey, value: Any, refs: Iterable[int] = ()):
+        """refs: sonuçta geçen kullanıcılar; bunlardan biri değişince kayıt da düşürülür."""
+        with self._lock:
+            self._check_version(key[3])
+            if key in self._entries:
+                self._drop(key)
+            refs = set(refs)
+            self._entries[key] = (time.monotonic() + self.ttl, value, refs)
+            self._user_keys.setdefault(key[0], set()).add(key)
+            for ref in refs:
+                self._ref_keys.setdefault(ref, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.stats["evictions"] += 1
+
+    def get_or_compute(self, user_id: int, kind: str, limit: int, model_version: Optional[str],
+                       compute: Callable[[], Any],
+                       refs_of: Optional[Callable[[Any], Iterable[int]]] = None) -> Any:
+        key = (user_id, kind, limit, model_version)
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compute()
+        self.set(key, value, refs_of(value) if refs_of is not None else ())
+        return value
+
+    def invalidate_user(self, user_id: int) -> int:
+        """Kullanıcının kendi kayıtlarını ve sonucunda bu kullanıcıyı içeren kayıtları düşürür."""
+        with self._lock:
+            keys = self._user_keys.get(user_id, set()) | self._ref_keys.get(user_id, set())
+            for key in keys:
+                self._drop(key)
+            if keys:
+                self.stats["invalidations"] += 1
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+            self._ref_keys.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "model_version": self._model_version
+        }
+
+
+_registered_caches: Set[int] = set()
+
+
+def register_invalidation_events(cache: RecommendationCache):
+    """
+    Kullanıcı ve üyelik satırlarındaki her yazımda (hangi route/servisten gelirse gelsin)
+    ilgili kullanıcının önbelleğini düşüren SQLAlchemy olaylarını bağlar.
+    """
+    from sqlalchemy import event
+    from backend.models.user_model import User
+    from backend.models.community_model import CommunityMember
+
+    def on_user_change(mapper, connection, target):
+        cache.invalidate_user(target.id)
+
+    def on_membership_change(mapper, connection, target):
+        cache.invalidate_user(target.user_id)
+
+    if id(cache) in _registered_caches:
+        return
+    _registered_caches.add(id(cache))
+    for model, handler in ((User, on_user_change), (CommunityMember, on_membership_change)):
+        for event_name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, event_name, handler)
+
+
+# Global cache instance
+recommendation_cache = RecommendationCache()
@@ -1,56 +1,315 @@
+import copy
 import logging
-from typing import List, Dict, Any
+import os
+import threading
+from typing import List, Dict, Any, Optional, Set
+from flask import current_app
 from backend.models.user_model import User
-from backend.models.community_model import Community
+from backend.models.community_model import Community, CommunityMember
 from backend.ml.preprocessing import DataPreprocessor
 from backend.ml.similarity_engine import SimilarityEngine
 from backend.ml.community_assigner import CommunityAssigner
+from backend.ml.clustering_model import ClusteringModel
+from backend.ml.ivf_index import IVFIndex
+from backend.ml.model_registry import ModelBundle, model_registry
+from backend.ml.candidate_pipeline import candidate_pipeline
+from backend.services.recommendation_cache import recommendation_cache, register_invalidation_events
+from backend.services.embedding_refresh_service import embedding_refresh_queue
 
 logger = logging.getLogger(__name__)
 
+# Kodlama tablosu (hobi sözlüğü, scaler) süreçler/yeniden başlatmalar arasında aynı kalsın diye kalıcıdır
+PREPROCESSOR_PATH = "backend/ml/models/preprocessor.pkl"
 
-class RecommendationService:
-    """Öneri servisi - ML tabanlı öneriler"""
 
-    def __init__(self):
-        self.preprocessor = DataPreprocessor()
-        self.similarity_engine = SimilarityEngine(self.preprocessor)
-        self.community_assigner = CommunityAssigner(self.similarity_engine)
+class RecommendationService:
+    """
+    Öneri servisi - ML tabanlı öneriler.
+
+    Modeller (preprocessor, similarity engine, topluluk atayıcı, kümeleme) model_registry'de
+    sürümlü bir set olarak tutulur. Her istek aktif seti bir kez alır; yeniden eğitim arka
+    planda yapılıp set atomik olarak değiştirilir, yeniden başlatma gerekmez.
+
+    Sonuçlar model sürümüyle anahtarlanan önbellekte tutulur; kullanıcı/üyelik yazımları ve
+    embedding yenilemeleri ilgili kullanıcının ve sonucunda o kullanıcıyı içeren kayıtları düşürür.
+    """
+
+    CATCH_UP_ROUNDS = 5  # yayından önce kilitsiz telafi turu sınırı (kalanlar kilit altında uygulanır)
+
+    def __init__(self, registry=model_registry, cache=recommendation_cache, pipeline=candidate_pipeline,
+                 preprocessor_path: Optional[str] = PREPROCESSOR_PATH):
+        self.registry = registry
+        self.preprocessor_path = preprocessor_path
+        self.cache = cache
+        self.pipeline = pipeline
+        self._updated_during_build = set()  # kurulum sürerken güncellenen kullanıcılar
+        # Güncellemeler (set seçimi + uygulama) ile yeni setin yayını arasında; bkz. reload_models_async
+        self._update_lock = threading.RLock()
         self._initialize_ml_models()
 
+        register_invalidation_events(cache)
+        embedding_refresh_queue.add_listener(self._invalidate_users)
+
+    def _invalidate_users(self, user_ids: List[int]):
+        """Yeniden embed edilen kullanıcıların önbellek kayıtlarını düşürür."""
+        for user_id in user_ids:
+            self.cache.invalidate_user(user_id)
+
+    def _cached(self, user_id: int, kind: str, limit: int, compute, refs_of=None):
+        models = self.models
+        version = models.version if models is not None else None
+        return self.cache.get_or_compute(user_id, kind, limit, version, compute, refs_of)
+
+    @staticmethod
+    def _referenced_user_ids(results: List[Dict[str, Any]]) -> List[int]:
+        """Benzer kullanıcı sonucundaki kullanıcı id'leri (ML: 'user_id', fallback: 'user'.'id')."""
+        referenced = []
+        for result in results:
+            uid = result.get('user_id')
+            if uid is None:
+                uid = (result.get('user') or {}).get('id')
+            if uid is not None and str(uid).isdigit():
+                referenced.append(int(uid))
+        return referenced
+
+    # Aktif sete kısa yollar (istek içinde tutarlılık için self.models bir kez okunmalı)
+    @property
+    def models(self) -> ModelBundle:
+        return self.registry.active
+
+    @property
+    def preprocessor(self) -> DataPreprocessor:
+        return self.models.preprocessor
+
+    @property
+    def similarity_engine(self) -> SimilarityEngine:
+        return self.models.similarity_engine
+
+    @property
+    def community_assigner(self) -> CommunityAssigner:
+        return self.models.community_assigner
+
     def _initialize_ml_models(self):
         """ML modellerini başlat"""
         try:
-            # Testi tamamlamış kullanıcıları yükle
-            users_with_tests = User.get_users_with_test_results()
+            self.registry.publish(self._build_models(self.registry.next_version()))
+        except Exception as e:
+            logger.error(f"ML model başlatma hatası: {str(e)}")
+            self.registry.publish(self._build_models(self.registry.next_version(), load_users=False))
+
+    def _build_models(self, version: str, load_users: bool = True) -> ModelBundle:
+        """Yeni model setini kurar; aktif seti değiştirmez"""
+        preprocessor = self._load_preprocessor() if load_users else DataPreprocessor(incremental=True)
+        similarity_engine = SimilarityEngine(preprocessor)
+        community_assigner = CommunityAssigner(similarity_engine)
+        clustering_model = None
+
+        # Testi tamamlamış kullanıcıları yükle
+        users_with_tests = User.get_users_with_test_results() if load_users else []
+
+        if users_with_tests:
+            # Sıra sabitlenir: sözlüğe yeni terimlerin eklenme sırası sorgu sırasına bağlı kalmaz
+            user_data = sorted((user.to_dict() for user in users_with_tests), key=lambda u: u['id'])
+
+            # Önce preprocessor'ı eğit, sonra embedding'leri eğitilmiş uzayda üret. Kayıtlı tablo
+            # varsa üzerine katlanır (değişmeyen kullanıcılar atlanır), yoksa sıfırdan eğitilir.
+            if preprocessor.scaler_fitted:
+                preprocessor.partial_fit(user_data)
+            else:
+                preprocessor.fit(user_data)
+            self._save_preprocessor(preprocessor)
+            similarity_engine.add_users([(str(u['id']), u) for u in user_data])
+            clustering_model = self._train_clustering_model(similarity_engine)
+            self._attach_ann_index(similarity_engine, clustering_model)
+
+            logger.info(f"ML modelleri {len(users_with_tests)} kullanıcı ile kuruldu ({version})")
+        else:
+            logger.info(f"ML modelleri kuruldu, henüz kullanıcı yok ({version})")
+
+        # Mevcut topluluklar yeni embedding uzayına taşınır
+        current = self.registry.active
+        if current is not None and current.community_assigner is not None:
+            community_assigner.communities = copy.deepcopy(current.community_assigner.communities)
+            community_assigner.rebuild_community_vectors()
+
+        return ModelBundle(version, preprocessor, similarity_engine, community_assigner, clustering_model,
+                           metadata={"n_training_users": len(users_with_tests)})
+
+    def _load_preprocessor(self) -> DataPreprocessor:
+        """Kayıtlı preprocessor'ı yükler; yoksa ya da uyumsuzsa boş bir tane döner."""
+        preprocessor = DataPreprocessor(incremental=True)
+        if not self.preprocessor_path or not os.path.exists(self.preprocessor_path):
+            return preprocessor
 
-            if users_with_tests:
-                user_data = []
-                for user in users_with_tests:
-                    user_dict = user.to_dict()
-                    user_data.append(user_dict)
-                    self.similarity_engine.add_user(str(user.id), user_dict)
+        try:
+            preprocessor.load(self.preprocessor_path)
+        except Exception as e:
+            logger.warning(f"Kayıtlı preprocessor kullanılamadı, yeniden eğitilecek: {str(e)}")
+            return DataPreprocessor(incremental=True)
 
-                # Preprocessor'ı eğit
-                self.preprocessor.fit(user_data)
+        if not preprocessor.incremental or preprocessor.hobby_encoder is None:
+            logger.warning("Kayıtlı preprocessor artımlı değil, yeniden eğitilecek")
+            return DataPreprocessor(incremental=True)
+        return preprocessor
 
-                logger.info(f"ML modelleri {len(users_with_tests)} kullanıcı ile başlatıldı")
-            else:
-                logger.info("ML modelleri başlatıldı (henüz kullanıcı yok)")
+    def _save_preprocessor(self, preprocessor: DataPreprocessor):
+        if not self.preprocessor_path:
+            return
+        try:
+            preprocessor.save(self.preprocessor_path)
+        except Exception as e:
+            logger.error(f"Preprocessor kaydetme hatası: {str(e)}")
+
+    @staticmethod
+    def _train_clustering_model(similarity_engine: SimilarityEngine, n_clusters: int = 5) -> Optional[ClusteringModel]:
+        if similarity_engine.user_count < n_clusters:
+            return None
+        _, embeddings = similarity_engine.valid_snapshot()
+
+        clustering_model = ClusteringModel(n_clusters=n_clusters)
+        result = clustering_model.train(embeddings)
+        return clustering_model if result.get("success") else None
+
+    @staticmethod
+    def _attach_ann_index(similarity_engine: SimilarityEngine, clustering_model: Optional[ClusteringModel]):
+        """
+        Kümeleme merkezlerinden IVF indeksi kurup motora bağlar (aday üretiminin ANN kaynağı).
+        Kümeleme modeli yoksa (az kullanıcı) indeks bağlanmaz; aday üretimi tüm satırları kullanır.
+        """
+        if clustering_model is None:
+            return
+        try:
+            similarity_engine.attach_index(IVFIndex.from_clustering_model(clustering_model))
+        except Exception as e:
+            logger.error(f"ANN indeksi kurulum hatası: {str(e)}")
+
+    def reload_models_async(self, app=None) -> bool:
+        """
+        Yeni model setini arka plan thread'inde kurar ve hazır olunca atomik olarak devreye alır.
+        Devam eden istekler eski setle tamamlanır. Zaten bir kurulum sürüyorsa False döner.
+
+        Kurulum sırasında eski sete yazılan güncellemeler yeni sete de uygulanır: biriken
+        kullanıcılar önce kilitsiz, yayından hemen önce de _update_lock altında bir kez daha
+        yenilenir. Güncellemeler aynı kilidi tuttuğundan arada gelen güncelleme kaybolmaz.
+        """
+        app = app or current_app._get_current_object()
+        with self._update_lock:
+            self._updated_during_build.clear()
+
+        def build(version: str) -> ModelBundle:
+            with app.app_context():
+                return self._build_models(version)
+
+        def catch_up(bundle: ModelBundle):
+            with app.app_context():
+                for _ in range(self.CATCH_UP_ROUNDS):  # kilit altında ilk turda biter
+                    with self._update_lock:
+                        user_ids = list(self._updated_during_build)
+                        self._updated_during_build.clear()
+                    if not user_ids:
+                        return
+                    self._refresh_models(bundle, user_ids)
+
+        return self.registry.build_async(build, catch_up=catch_up, publish_lock=self._update_lock)
+
+    def rollback_models(self, version: Optional[str] = None) -> bool:
+        """Bir önceki (veya verilen) model sürümüne geri dön"""
+        return self.registry.rollback(version)
+
+    def update_user_embedding(self, user_id: int) -> bool:
+        """Yeni veya güncellenen kullanıcıyı tam yeniden fit yapmadan modele kat"""
+        try:
+            user = User.query.get(user_id)
+            if not user or not user.is_test_completed:
+                return False
+
+            with self._update_lock:
+                if self.registry.is_building:
+                    self._updated_during_build.add(user_id)
+
+                models = self.models
+                user_dict = user.to_dict()
+                models.preprocessor.partial_fit([user_dict])
+                models.similarity_engine.add_user(str(user_id), user_dict)
+                if models.community_assigner is not None:
+                    models.community_assigner.refresh_member(str(user_id))
+            self.cache.invalidate_user(user_id)
+            return True
 
         except Exception as e:
-            logger.error(f"ML model başlatma hatası: {str(e)}")
+            logger.error(f"Kullanıcı embedding güncelleme hatası: {str(e)}")
+            return False
+
+    def refresh_user_embeddings(self, user_ids: List[int]) -> int:
+        """
+        Bir grup kullanıcıyı tek sorgu ve tek vektörize embedding geçişiyle yeniler (arka plan kuyruğu).
+        Verisi değişmemiş kullanıcılar (fingerprint aynı) atlanır; testi tamamlanmamış veya
+        pasif kullanıcılar motordan ve topluluklarından çıkarılır. Yeniden embed edilenlerin
+        topluluk toplamları eski -> yeni farkıyla güncellenir. Yenilenen kullanıcı sayısını döner.
+        """
+        if not user_ids:
+            return 0
+        with self._update_lock:
+            if self.registry.is_building:
+                self._updated_during_build.update(user_ids)
+            return self._refresh_models(self.models, user_ids)
+
+    def _refresh_models(self, models: ModelBundle, user_ids: List[int]) -> int:
+        """refresh_user_embeddings'in verilen model setine uygulanan kısmı (kurulum sonrası telafi için)."""
+        try:
+            engine = models.similarity_engine
+            assigner = models.community_assigner
+            users = {user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()}
+
+            changed = []
+            for user_id in user_ids:
+                user = users.get(user_id)
+                if user is None or not user.is_test_completed or not user.is_active:
+                    with engine.lock.write():
+                        engine.remove_user(str(user_id))
+                        if assigner is not None:
+                            assigner.remove_user(str(user_id))
+                    continue
+                user_dict = user.to_dict()
+                if not engine.is_embedding_current(str(user_id), user_dict):
+                    changed.append((str(user_id), user_dict))
+
+            if changed:
+                models.preprocessor.partial_fit([data for _, data in changed])
+                engine.add_users(changed)
+                if assigner is not None:
+                    for user_id, _ in changed:
+                        assigner.refresh_member(user_id)
+            return len(changed)
+
+        except Exception as e:
+            logger.error(f"Toplu embedding yenileme hatası: {str(e)}")
+            return 0
 
     def get_similar_users(self, user_id: int, limit: int = 5) -> List[Dict[str, Any]]:
-        """Benzer kullanıcıları getir"""
+        """Benzer kullanıcıları getir (önbellekli)"""
+        return self._cached(user_id, 'similar_users', limit,
+                            lambda: self._compute_similar_users(user_id, limit),
+                            self._referenced_user_ids)
+
+    def _compute_similar_users(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
         try:
             user = User.query.get(user_id)
             if not user or not user.is_test_completed:
                 return []
 
-            # ML ile benzer kullanıcıları bul
-            similar_users = self.similarity_engine.find_similar_users(
-                str(user_id), top_k=limit
+            # ML ile benzer kullanıcıları bul: aday üretimi (ANN, topluluk, bölüm) + yeniden sıralama
+            models = self.models
+            if not models.similarity_engine.has_user(str(user_id)):
+                return self._get_fallback_similar_users(user_id, limit)
+
+            # Mevcut bağlantılar (DB'de ortak topluluk üyeleri) önerilmez; ML topluluğundaki
+            # üyeler ise aday kaynağıdır, elenmez
+            exclude_ids = self._connected_user_ids(user_id)
+
+            similar_users = self.pipeline.recommend(
+                models.similarity_engine, models.community_assigner, str(user_id), limit,
+                exclude_ids=exclude_ids, active_filter=self._active_user_ids
             )
 
             return similar_users
@@ -59,32 +318,64 @@ class RecommendationService:
             logger.error(f"Benzer kullanıcı öneri hatası: {str(e)}")
             return self._get_fallback_similar_users(user_id, limit)
 
+    def get_similar_users_batch(self, user_ids: List[int], limit: int = 5) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Birden fazla kullanıcı için benzer kullanıcıları getir (toplu işler için).
+        Her kullanıcı get_similar_users ile aynı yoldan geçer: önbellekte olanlar oradan alınır,
+        kalanlar aday hattı ve iş kurallarıyla (pasif kullanıcılar, mevcut bağlantılar, gösterilmiş
+        öneriler) hesaplanır. Böylece iki yol aynı önbellek anahtarına farklı sonuç yazmaz.
+        """
+        try:
+            return {uid: self.get_similar_users(uid, limit) for uid in user_ids}
+
+        except Exception as e:
+            logger.error(f"Toplu benzer kullanıcı öneri hatası: {str(e)}")
+            return {uid: [] for uid in user_ids}
+
     def get_community_recommendations(self, user_id: int, limit: int = 5) -> List[Dict[str, Any]]:
-        """Topluluk önerileri getir"""
+        """Topluluk önerileri getir (önbellekli)"""
+        return self._cached(user_id, 'communities', limit,
+                            lambda: self._compute_community_recommendations(user_id, limit))
+
+    def _compute_community_recommendations(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
         try:
             user = User.query.get(user_id)
             if not user or not user.is_test_completed:
                 return self._get_fallback_communities(limit)
 
+            # Zaten üye olunan topluluklar elenir; yerlerini doldurmak için fazladan aday istenir
+            joined = {
+                row.community_id for row in CommunityMember.query.with_entities(CommunityMember.community_id)
+                .filter_by(user_id=user_id, is_active=True).all()
+            }
+
             # ML ile topluluk önerileri
-            user_data = user.to_dict()
-            recommendations = self.community_assigner.get_community_recommendations(
-                str(user_id), top_k=limit
+            recommendations = self.models.community_assigner.get_community_recommendations(
+                str(user_id), top_k=limit + len(joined)
             )
 
-            # Önerileri zenginleştir
-            enriched_recommendations = []
+            # Önerileri tek sorguyla zenginleştir
+            scores = {}
             for rec in recommendations:
-                community = Community.query.filter_by(
-                    id=rec['community_id'].replace('community_', '')
-                ).first()
+                community_id = rec['community_id'].replace('community_', '')
+                if community_id.isdigit() and int(community_id) not in joined:
+                    scores.setdefault(int(community_id), rec['compatibility_score'])
+
+            communities = {
+                c.id: c for c in Community.query.filter(
+                    Community.id.in_(list(scores)), Community.is_active == True
+                ).all()
+            } if scores else {}
 
+            enriched_recommendations = []
+            for community_id, score in scores.items():
+                community = communities.get(community_id)
                 if community:
                     enriched_rec = community.to_dict()
-                    enriched_rec['compatibility_score'] = rec['compatibility_score']
+                    enriched_rec['compatibility_score'] = score
                     enriched_recommendations.append(enriched_rec)
 
-            return enriched_recommendations
+            return enriched_recommendations[:limit]
 
         except Exception as e:
             logger.error(f"Topluluk öneri hatası: {str(e)}")
@@ -98,10 +389,11 @@ class RecommendationService:
                 return "community_001"  # Varsayılan topluluk
 
             user_data = user.to_dict()
-            community_id = self.community_assigner.assign_user_to_community(
+            community_id = self.models.community_assigner.assign_user_to_community(
                 str(user_id), user_data
             )
 
+            self.cache.invalidate_user(user_id)
             logger.info(f"Kullanıcı {user_id} topluluğa atandı: {community_id}")
             return community_id
 
@@ -205,25 +497,59 @@ class RecommendationService:
             "Akran öğrenme grupları"
         ]
 
+    @staticmethod
+    def _active_user_ids(user_ids: List[str]) -> Set[str]:
+        """Aday listesinden aktif kullanıcılar (yeniden sıralama iş kuralı; tek sorgu)"""
+        ids = [int(uid) for uid in user_ids if str(uid).isdigit()]
+        if not ids:
+            return set()
+        rows = User.query.with_entities(User.id).filter(User.id.in_(ids), User.is_active == True).all()
+        return {str(row.id) for row in rows}
+
+    @staticmethod
+    def _connected_user_ids(user_id: int) -> Set[str]:
+        """Kullanıcıyla aynı aktif toplulukta üye olanlar (mevcut bağlantılar; tek sorgu)"""
+        joined = CommunityMember.query.with_entities(CommunityMember.community_id) \
+            .filter_by(user_id=user_id, is_active=True).subquery()
+        rows = CommunityMember.query.with_entities(CommunityMember.user_id).filter(
+            CommunityMember.community_id.in_(joined.select()),
+            CommunityMember.is_active == True,
+            CommunityMember.user_id != user_id
+        ).distinct().all()
+        return {str(row.user_id) for row in rows}
+
     def _get_fallback_similar_users(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
         """Fallback benzer kullanıcılar"""
-        # Aynı üniversite/bölümden kullanıcılar
+        # Önce aynı bölüm, sonra aynı üniversite, en son diğer kullanıcılar
         user = User.query.get(user_id)
         if not user:
             return []
 
-        similar_users = User.query.filter(
-            User.id != user_id,
-            User.is_test_completed == True,
-            User.is_active == True
-        ).limit(limit).all()
+        base = (User.id != user_id, User.is_test_completed == True, User.is_active == True)
+        tiers = [
+            ((User.department == user.department, User.university == user.university), 0.75),
+            ((User.university == user.university,), 0.7),
+            ((), 0.6)
+        ]
+
+        similar_users = []
+        seen_ids = set()
+        for criteria, score in tiers:
+            if len(similar_users) >= limit:
+                break
+            query = User.query.filter(*base, *criteria)
+            if seen_ids:
+                query = query.filter(~User.id.in_(seen_ids))
+            for u in query.limit(limit - len(similar_users)).all():
+                seen_ids.add(u.id)
+                similar_users.append((u, score))
 
         return [
             {
                 'user': u.to_dict(),
-                'similarity_score': 0.7  # Varsayılan skor
+                'similarity_score': score  # Varsayılan skor (kademe)
             }
-            for u in similar_users
+            for u, score in similar_users
         ]
 
     def _get_fallback_communities(self, limit: int) -> List[Dict[str, Any]]:
@@ -0,0 +1,248 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+import numpy as np
+from joblib import Parallel, delayed
+from backend.app import db
+from backend.models.similarity_model import UserSimilarity, SimilarityGeneration
+from backend.ml.topk_similarity import topk_block, block_size_for, iter_blocks, DEFAULT_BLOCK_MEMORY_BYTES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_DIR = "backend/ml/models/similarity_job"
+
+# similarity_type -> SimilarityEngine blok ağırlıkları (None = motorun varsayılanı)
+SIMILARITY_TYPE_WEIGHTS = {
+    'overall': None,
+    'personality': {'personality': 1.0, 'hobbies': 0.0, 'academic': 0.0},
+    'hobbies': {'personality': 0.0, 'hobbies': 1.0, 'academic': 0.0}
+}
+
+
+class SimilarityMaterializationJob:
+    """
+    Gece çalışan tüm-çiftler top-k benzerlik işi: user_similarities tablosunu doldurur.
+
+    Motorun embedding matrisi bir anlık görüntü olarak diske yazılır; sorgu blokları
+    (blok x korpus) süreç havuzunda mmap üzerinden hesaplanır, worker belleği tek skor
+    bloğuyla sınırlıdır. Her kullanıcı ve similarity_type için yalnızca top-k tutulur ve
+    sonuçlar büyük transaction'larda toplu upsert edilir. İlerleme her commit'ten sonra
+    checkpoint'e yazılır; yarıda kalan iş aynı anlık görüntüyle kaldığı bloktan devam eder.
+
+    use_generations=True ise sonuçlar yeni bir nesle yazılır ve iş bitince aktif nesil tek
+    satırla değiştirilir; okuyucular yarım dolmuş veya yarım temizlenmiş tablo görmez.
+    """
+
+    MATRIX_FILE = "matrix.npy"
+    STATE_FILE = "state.json"
+
+    def __init__(self, job_dir: str = DEFAULT_JOB_DIR, top_k: int = 20, min_score: float = 0.3,
+                 similarity_types: Optional[List[str]] = None, n_jobs: int = -1,
+                 block_memory_bytes: int = DEFAULT_BLOCK_MEMORY_BYTES, write_batch_rows: int = 50_000,
+                 use_generations: bool = False):
+        self.job_dir = job_dir
+        self.top_k = top_k
+        self.min_score = min_score
+        self.similarity_types = similarity_types or list(SIMILARITY_TYPE_WEIGHTS)
+        self.n_jobs = n_jobs
+        self.block_memory_bytes = block_memory_bytes
+        self.write_batch_rows = write_batch_rows
+        self.use_generations = use_generations
+
+    # ------------------------------------------------------------------
+    # Anlık görüntü ve checkpoint
+    # ------------------------------------------------------------------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.job_dir, name)
+
+    def _load_state(self) -> Optional[Dict[str, Any]]:
+        path = self._path(self.STATE_FILE)
+        if not os.path.exists(path) or not os.path.exists(self._path(self.MATRIX_FILE)):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_state(self, state: Dict[str, Any]):
+        # Yarım yazılmış checkpoint kalmasın: geçici dosyaya yaz, atomik olarak değiştir
+        tmp_path = self._path(self.STATE_FILE + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._path(self.STATE_FILE))
+
+    def _snapshot(self, engine) -> Dict[str, Any]:
+        """Geçerli satırları sıkıştırıp diske yazar ve yeni iş durumunu oluşturur."""
+        os.makedirs(self.job_dir, exist_ok=True)
+        # Satırlar ve id'leri tutarlı bir anda kopyalanır (arka plan yenilemeleri satır taşıyabilir)
+        user_ids, matrix = engine.valid_snapshot()
+        np.save(self._path(self.MATRIX_FILE), np.ascontiguousarray(matrix, dtype=np.float32))
+
+        state = {
+            "started_at": datetime.utcnow().isoformat(),
+            "user_ids": [int(uid) for uid in user_ids],
+            "top_k": self.top_k,
+            "min_score": self.min_score,
+            "block_size": block_size_for(len(user_ids), self.block_memory_bytes),
+            "weights": {
+                t: engine.weight_vector(SIMILARITY_TYPE_WEIGHTS[t]).tolist() for t in self.similarity_types
+            },
+            "progress": {t: 0 for t in self.similarity_types},  # sıradaki blok
+            "use_generations": self.use_generations,
+            "generations": {
+                t: SimilarityGeneration.active(t) + (1 if self.use_generations else 0)
+                for t in self.similarity_types
+            },
+            "rows_written": 0,
+            "seconds": 0.0,
+            "complete": False
+        }
+        self._save_state(state)
+        return state
+
+    # ------------------------------------------------------------------
+    # Çalıştırma
+    # ------------------------------------------------------------------
+
+    def run(self, engine=None, resume: bool = True) -> Dict[str, Any]:
+        """
+        İşi çalıştırır. resume=True ve tamamlanmamış bir checkpoint varsa oradan devam eder
+        (engine gerekmez); aksi halde engine'den yeni anlık görüntü alınır.
+        """
+        start = time.perf_counter()
+        state = self._load_state() if resume else None
+        if state is not None and state.get("complete"):
+            state = None
+        resumed = state is not None
+        if state is None:
+            if engine is None:
+                from backend.services.recommendation_service import recommendation_service
+                engine = recommendation_service.models.similarity_engine
+            if engine.user_count < 2:
+                return {"success": False, "message": "Yeterli kullanıcı yok"}
+            state = self._snapshot(engine)
+
+        user_ids = np.asarray(state["user_ids"], dtype=np.int64)
+        calculated_at = datetime.fromisoformat(state["started_at"])
+        logger.info(f"Benzerlik materyalizasyonu {'devam ediyor' if resumed else 'başladı'}: "
+                    f"{len(user_ids)} kullanıcı, top-{state['top_k']}, blok {state['block_size']}")
+
+        rows_this_run = 0
+        try:
+            with Parallel(n_jobs=self.n_jobs, return_as="generator") as parallel:
+                for similarity_type, next_block in list(state["progress"].items()):
+                    weights = np.asarray(state["weights"][similarity_type], dtype=np.float32)
+                    blocks = list(iter_blocks(len(user_ids), state["block_size"], next_block))
+                    if not blocks:
+                        continue
+
+                    results = parallel(
+                        delayed(topk_block)(self._path(self.MATRIX_FILE), weights, lo, hi,
+                                            state["top_k"], state["min_score"])
+                        for _, lo, hi in blocks
+                    )
+
+                    pending: List[Dict[str, Any]] = []
+                    # Üreteç sonuna kadar tüketilmeli (aynı Parallel bir sonraki tür için yeniden kullanılır)
+                    for position, (lo, indices, scores) in enumerate(results):
+                        block = blocks[position][0]
+                        pending.extend(self._records(user_ids, lo, indices, scores, similarity_type,
+                                                     state["generations"][similarity_type], calculated_at))
+                        if len(pending) >= self.write_batch_rows or block == blocks[-1][0]:
+                            rows_this_run += self._flush(pending, state, similarity_type, block + 1)
+                            pending = []
+        finally:
+            state["seconds"] += time.perf_counter() - start
+            self._save_state(state)
+
+        # Yeni nesil devreye alınır; ardından yeniden yazılmayan (top-k'dan düşen) eski kayıtlar silinir
+        if state.get("use_generations"):
+            self._activate_generations(state["generations"])
+        pruned = self._prune(state, calculated_at)
+        state["complete"] = True
+        self._save_state(state)
+        os.remove(self._path(self.MATRIX_FILE))
+
+        elapsed = time.perf_counter() - start
+        report = {
+            "success": True,
+            "resumed": resumed,
+            "n_users": int(len(user_ids)),
+            "rows_written": rows_this_run,
+            "rows_written_total": state["rows_written"],
+            "rows_pruned": pruned,
+            "seconds": elapsed,
+            "rows_per_second": rows_this_run / elapsed if elapsed > 0 else 0.0
+        }
+        logger.info(f"Benzerlik materyalizasyonu tamamlandı: {rows_this_run} satır, {elapsed:.1f}s "
+                    f"({report['rows_per_second']:.0f} satır/s), {pruned} eski kayıt silindi")
+        return report
+
+    @staticmethod
+    def _records(user_ids: np.ndarray, start: int, indices: np.ndarray, scores: np.ndarray,
+                 similarity_type: str, generation: int, calculated_at: datetime) -> List[Dict[str, Any]]:
+        query_pos, rank = np.nonzero(indices >= 0)
+        sources = user_ids[start + query_pos].tolist()
+        targets = user_ids[indices[query_pos, rank]].tolist()
+        values = scores[query_pos, rank].tolist()
+        return [
+            {
+                "user_id": source,
+                "similar_user_id": target,
+                "similarity_score": value,
+                "similarity_type": similarity_type,
+                "generation": generation,
+                "calculated_at": calculated_at,
+                "is_active": True
+            }
+            for source, target, value in zip(sources, targets, values)
+        ]
+
+    def _flush(self, records: List[Dict[str, Any]], state: Dict[str, Any],
+               similarity_type: str, next_block: int) -> int:
+        """Kayıtları tek transaction'da yazar, ardından checkpoint'i ilerletir."""
+        flush_start = time.perf_counter()
+        try:
+            UserSimilarity.bulk_upsert(records)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Benzerlik toplu yazma hatası: {str(e)}")
+            raise
+
+        state["progress"][similarity_type] = next_block
+        state["rows_written"] += len(records)
+        self._save_state(state)
+
+        elapsed = time.perf_counter() - flush_start
+        logger.info(f"{similarity_type}: blok {next_block}, {len(records)} satır yazıldı "
+                    f"({len(records) / elapsed if elapsed > 0 else 0:.0f} satır/s)")
+        return len(records)
+
+    @staticmethod
+    def _activate_generations(generations: Dict[str, int]):
+        try:
+            for similarity_type, generation in generations.items():
+                SimilarityGeneration.activate(similarity_type, generation)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Benzerlik nesli değiştirme hatası: {str(e)}")
+            raise
+
+    @staticmethod
+    def _prune(state: Dict[str, Any], calculated_at: datetime) -> int:
+        """Eski kayıtları parçalı siler: nesil modunda eski nesiller, aksi halde yeniden yazılmayanlar."""
+        deleted = 0
+        for similarity_type, generation in state["generations"].items():
+            if state.get("use_generations"):
+                deleted += UserSimilarity.drop_inactive_generations(similarity_type)
+            else:
+                deleted += UserSimilarity.delete_in_chunks(
+                    UserSimilarity.similarity_type == similarity_type,
+                    UserSimilarity.generation == generation,
+                    UserSimilarity.calculated_at < calculated_at
+                )
+        return deleted
@@ -0,0 +1,54 @@
+import os
+import tempfile
+
+import pytest
+
+# backend.app içe aktarılırken veritabanını ortam değişkeninden okur ve log dizinini çalışma
+# dizininde açar; test modülleri modelleri içe aktarmadan önce ikisi de geçici dizine yönlendirilir.
+# (Config'deki pool_size seçenekleri sqlite:///:memory: ile çalışmadığından dosya kullanılır.)
+_TEST_DIR = tempfile.mkdtemp(prefix="friendzone-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TEST_DIR, 'test.db')}"
+_previous_cwd = os.getcwd()
+os.chdir(_TEST_DIR)
+try:
+    from backend.app import app as flask_app, db
+finally:
+    os.chdir(_previous_cwd)
+
+from backend.tests.helpers import make_users, build_models, insert_users
+
+
+@pytest.fixture
+def users():
+    return make_users(300)
+
+
+@pytest.fixture
+def models(users):
+    return build_models(users)
+
+
+@pytest.fixture
+def db_session():
+    """Her test için boş şema; test sonunda tablolar düşürülür."""
+    with flask_app.app_context():
+        db.create_all()
+        try:
+            yield db.session
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+@pytest.fixture
+def recommendation_service(db_session, users, tmp_path):
+    """Sentetik kullanıcılarla DB'den kurulmuş, global örneklerden bağımsız öneri servisi."""
+    from backend.ml.candidate_pipeline import CandidatePipeline
+    from backend.ml.model_registry import ModelRegistry
+    from backend.services.recommendation_cache import RecommendationCache
+    from backend.services.recommendation_service import RecommendationService
+
+    insert_users(db_session, users)
+    return RecommendationService(registry=ModelRegistry(), cache=RecommendationCache(),
+                                 pipeline=CandidatePipeline(candidate_budget=60),
+                                 preprocessor_path=str(tmp_path / "preprocessor.pkl"))
@@ -0,0 +1,114 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from backend.ml.preprocessing import DataPreprocessor
+from backend.ml.similarity_engine import SimilarityEngine
+from backend.ml.community_assigner import CommunityAssigner
+
+PERSONALITY_TYPES = ["analytical_introvert", "creative_extrovert", "practical_ambivert", "social_leader"]
+HOBBIES = ["futbol", "satranç", "müzik", "kitap", "yüzme", "kodlama", "dans", "sinema", "fotoğraf", "doğa"]
+UNIVERSITIES = ["itu", "odtu", "boun"]
+DEPARTMENTS = ["cs", "ee", "me", "ie"]
+
+
+def make_users(n: int, seed: int = 0, start_id: int = 1):
+    """Deterministik sentetik kullanıcılar: (user_id, user_data) listesi."""
+    rng = np.random.default_rng(seed)
+    users = []
+    for user_id in range(start_id, start_id + n):
+        users.append((str(user_id), {
+            "id": user_id,
+            "personality_type": str(rng.choice(PERSONALITY_TYPES)),
+            "hobbies": [str(h) for h in rng.choice(HOBBIES, 3, replace=False)],
+            "university": str(rng.choice(UNIVERSITIES)),
+            "department": str(rng.choice(DEPARTMENTS)),
+            "year": int(rng.integers(1, 5))
+        }))
+    return users
+
+
+def build_models(users):
+    """Kullanıcılarla fit edilmiş preprocessor, motor ve topluluklara atanmış atayıcı."""
+    preprocessor = DataPreprocessor(incremental=True)
+    preprocessor.fit([data for _, data in users])
+    engine = SimilarityEngine(preprocessor)
+    engine.add_users(users)
+    assigner = CommunityAssigner(engine)
+    assigner.assign_users_bulk(users)
+    return preprocessor, engine, assigner
+
+
+def insert_users(session, users, **overrides):
+    """Sentetik kullanıcıları testi tamamlamış olarak users tablosuna yazar (şifre hash'i atlanır)."""
+    from backend.models.user_model import User
+
+    rows = [
+        {
+            "id": data["id"],
+            "name": f"Kullanıcı {data['id']}",
+            "email": f"user{data['id']}@test.edu",
+            "password_hash": "-",
+            "university": data["university"],
+            "department": data["department"],
+            "year": data["year"],
+            "personality_type": data["personality_type"],
+            "hobbies": data["hobbies"],
+            "is_test_completed": True,
+            "is_active": True,
+            **overrides
+        }
+        for _, data in users
+    ]
+    session.execute(User.__table__.insert(), rows)
+    session.commit()
+
+
+def expected_sums(assigner):
+    """Toplamların üyelerin motordaki güncel embedding'lerinden sıfırdan hesaplanmış hali."""
+    engine = assigner.similarity_engine
+    sums = np.zeros((len(assigner.communities), engine.dimension), dtype=np.float64)
+    square_sums = np.zeros_like(sums)
+    counts = np.zeros(len(assigner.communities), dtype=np.int64)
+    for idx, community in enumerate(assigner.communities):
+        for member_id in community['members']:
+            vector = engine.get_embedding(member_id)
+            if vector is not None:
+                sums[idx] += vector
+                square_sums[idx] += vector.astype(np.float64) ** 2
+                counts[idx] += 1
+    return sums, square_sums, counts
+
+
+def assert_sums_consistent(assigner):
+    sums, square_sums, counts = expected_sums(assigner)
+    n = len(assigner.communities)
+    np.testing.assert_array_equal(assigner._counts[:n], counts)
+    np.testing.assert_allclose(assigner._sums[:n], sums, atol=1e-4)
+    np.testing.assert_allclose(assigner._square_sums[:n], square_sums, atol=1e-4)
+    for idx, community in enumerate(assigner.communities):
+        assert community['compatibility'] == pytest.approx(assigner._group_compatibility(idx))
+
+
+def record(user_id, similar_user_id, score, generation=0, similarity_type='overall', calculated_at=None):
+    """UserSimilarity.bulk_upsert için tek kayıt."""
+    return {
+        "user_id": user_id,
+        "similar_user_id": similar_user_id,
+        "similarity_score": score,
+        "similarity_type": similarity_type,
+        "generation": generation,
+        "calculated_at": calculated_at or datetime.utcnow(),
+        "is_active": True
+    }
+
+
+def rows(session):
+    """Tablodaki kayıtlar: (user_id, similar_user_id, similarity_type, generation) -> skor."""
+    from backend.models.similarity_model import UserSimilarity
+
+    return {
+        (s.user_id, s.similar_user_id, s.similarity_type, s.generation): s.similarity_score
+        for s in session.query(UserSimilarity).all()
+    }
@@ -0,0 +1,90 @@
+import pytest
+
+from backend.ml.clustering_model import ClusteringModel
+from backend.ml.ivf_index import IVFIndex
+from backend.ml.lsh_index import LSHIndex
+from backend.tests.helpers import make_users
+
+TOP_K = 10
+N_QUERIES = 50
+
+
+def score_recall(engine, user_ids):
+    """
+    Yaklaşık sonuçların kesin top-k içinde kalan oranı. Eşit skorlu kullanıcılar arasında
+    hangisinin döndüğü önemli olmadığından id yerine k'inci kesin skora göre sayılır.
+    """
+    hits = total = 0
+    for user_id in user_ids:
+        exact = engine.find_similar_users(user_id, top_k=TOP_K)
+        approx = engine.find_similar_users(user_id, top_k=TOP_K, approximate=True)
+        threshold = exact[-1]['similarity_score'] - 1e-4
+        hits += sum(r['similarity_score'] >= threshold for r in approx)
+        total += len(exact)
+    return hits / total
+
+
+@pytest.fixture
+def clustering_model(models):
+    _, engine, _ = models
+    _, embeddings = engine.valid_snapshot()
+    model = ClusteringModel(n_clusters=8)
+    assert model.train(embeddings)["success"]
+    return model
+
+
+def test_ivf_full_probe_matches_brute_force(models, users, clustering_model):
+    _, engine, _ = models
+    engine.attach_index(IVFIndex.from_clustering_model(clustering_model, nprobe=clustering_model.n_clusters))
+    assert score_recall(engine, [uid for uid, _ in users[:N_QUERIES]]) == 1.0
+
+
+def test_ivf_recall_against_brute_force(models, users, clustering_model):
+    _, engine, _ = models
+    engine.attach_index(IVFIndex.from_clustering_model(clustering_model, nprobe=4))
+    assert score_recall(engine, [uid for uid, _ in users[:N_QUERIES]]) >= 0.9
+
+
+def test_ivf_build_keeps_clustering_centers(models, clustering_model):
+    _, engine, _ = models
+    centers = clustering_model.cluster_centers_.copy()
+    engine.attach_index(IVFIndex.from_clustering_model(clustering_model))
+    assert (clustering_model.cluster_centers_ == centers).all()
+
+
+def test_ivf_tracks_added_and_removed_users(models, clustering_model):
+    _, engine, _ = models
+    index = IVFIndex.from_clustering_model(clustering_model)
+    engine.attach_index(index)
+    new_users = make_users(5, seed=1, start_id=1000)
+    engine.add_users(new_users)
+    assert len(index) == engine.user_count
+
+    engine.remove_user(new_users[0][0])
+    assert len(index) == engine.user_count
+
+
+def test_lsh_recall_against_brute_force(models, users):
+    _, engine, _ = models
+    engine.attach_index(LSHIndex(n_tables=16, n_bits=6))
+    assert score_recall(engine, [uid for uid, _ in users[:N_QUERIES]]) >= 0.9
+
+
+def test_lsh_candidates_include_identical_vector(models, users):
+    _, engine, _ = models
+    index = LSHIndex(n_tables=4, n_bits=16)
+    engine.attach_index(index)
+    row = engine.row_of(users[0][0])
+    assert row in index.candidate_rows(engine.row_vector(row))
+
+
+def test_lsh_tracks_added_and_removed_users(models):
+    _, engine, _ = models
+    index = LSHIndex()
+    engine.attach_index(index)
+    new_users = make_users(5, seed=1, start_id=1000)
+    engine.add_users(new_users)
+    assert len(index) == engine.user_count
+
+    engine.remove_user(new_users[0][0])
+    assert len(index) == engine.user_count
@@ -0,0 +1,57 @@
+from collections import Counter
+
+from backend.tests.helpers import assert_sums_consistent, make_users
+
+
+def cohort(n=120):
+    return make_users(n, seed=5, start_id=1000)
+
+
+def test_bulk_assigns_each_user_once_within_capacity(models):
+    _, _, assigner = models
+    users = cohort()
+
+    assignments = assigner.assign_users_bulk(users)
+
+    assert set(assignments) == {uid for uid, _ in users}
+    memberships = Counter(uid for c in assigner.communities for uid in c['members'])
+    assert all(memberships[uid] == 1 for uid, _ in users)
+    for community in assigner.communities:
+        assert len(community['members']) <= assigner.max_community_size
+        for uid in community['members']:
+            if uid in assignments:
+                assert assignments[uid] == community['id']
+    assert_sums_consistent(assigner)
+
+
+def test_bulk_opens_communities_only_when_existing_are_full(models):
+    _, _, assigner = models
+    for community in assigner.communities:
+        community['members'].extend(f"dolgu_{community['id']}_{i}"
+                                    for i in range(assigner.max_community_size - len(community['members'])))
+    existing = {c['id'] for c in assigner.communities}
+    assigner.rebuild_community_vectors()
+
+    assignments = assigner.assign_users_bulk(cohort(40))
+
+    assert not existing & set(assignments.values())
+    new = [c for c in assigner.communities if c['id'] not in existing]
+    sizes = sorted(len(c['members']) for c in new)
+    assert sum(sizes) == 40
+    # Açılan topluluklar min_community_size'a tamamlanır (havuzun son artığı hariç)
+    assert all(size >= assigner.min_community_size for size in sizes[1:])
+    assert max(sizes) <= assigner.max_community_size
+
+
+def test_bulk_leaves_fewer_undersized_communities_than_sequential(models):
+    _, _, assigner = models
+    before = [dict(c, members=list(c['members'])) for c in assigner.communities]
+
+    report = assigner.compare_with_sequential(cohort())
+
+    assert report["n_users"] == 120
+    assert report["bulk"]["undersized_communities"] <= report["sequential"]["undersized_communities"]
+    assert report["bulk"]["total_compatibility"] >= 0.95 * report["sequential"]["total_compatibility"]
+    assert report["bulk"]["seconds"] > 0 and report["sequential"]["seconds"] > 0
+    # Karşılaştırma kopyalar üzerinde yapılır
+    assert assigner.communities == before
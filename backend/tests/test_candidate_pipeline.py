@@ -0,0 +1,121 @@
+import numpy as np
+
+from backend.ml.candidate_pipeline import CandidatePipeline
+
+
+class RecordingPipeline(CandidatePipeline):
+    """Son aday üretiminin kaynaklarını saklar."""
+
+    def generate(self, engine, assigner, user_id, exclude_ids=None):
+        candidates, sources = super().generate(engine, assigner, user_id, exclude_ids)
+        self.last_sources = sources
+        return candidates, sources
+
+
+def user_with_co_members(assigner):
+    community = next(c for c in assigner.communities if len(c['members']) > 2)
+    return community['members'][0], set(community['members'][1:])
+
+
+def test_generate_respects_budget_and_exclusions(models):
+    _, engine, assigner = models
+    pipeline = CandidatePipeline(candidate_budget=60)
+    user_id, co_members = user_with_co_members(assigner)
+    excluded = {uid for uid in engine.valid_snapshot()[0][:40] if uid != user_id}
+
+    candidates, sources = pipeline.generate(engine, assigner, user_id, exclude_ids=excluded)
+
+    assert len(candidates) <= 60
+    assert engine.row_of(user_id) not in candidates
+    assert not set(engine.user_ids_at(candidates)) & excluded
+    assert set(sources) >= {"ann", "community", "department"}
+
+
+def test_community_source_yields_co_members(models):
+    _, engine, assigner = models
+    pipeline = CandidatePipeline(candidate_budget=60)
+    user_id, co_members = user_with_co_members(assigner)
+
+    _, sources = pipeline.generate(engine, assigner, user_id)
+
+    assert len(sources["community"])
+    assert set(engine.user_ids_at(sources["community"])) <= co_members
+
+
+def test_recommend_marks_results_seen_and_rotates(models):
+    _, engine, assigner = models
+    pipeline = CandidatePipeline(candidate_budget=60)
+    user_id = engine.valid_snapshot()[0][0]
+
+    first = [r['user_id'] for r in pipeline.recommend(engine, assigner, user_id, limit=5)]
+    second = [r['user_id'] for r in pipeline.recommend(engine, assigner, user_id, limit=5)]
+
+    assert pipeline.seen(user_id) >= set(first)
+    assert not set(first) & set(second)
+
+
+def test_rerank_matches_exact_scores(models):
+    _, engine, assigner = models
+    pipeline = CandidatePipeline(candidate_budget=1000)  # tüm korpus aday
+    user_id = engine.valid_snapshot()[0][0]
+
+    results = pipeline.recommend(engine, assigner, user_id, limit=5)
+    exact = engine.find_similar_users(user_id, top_k=5)
+    np.testing.assert_allclose([r['similarity_score'] for r in results],
+                               [r['similarity_score'] for r in exact], atol=1e-4)
+
+
+def test_service_keeps_ml_co_members_as_candidates(recommendation_service, users):
+    service = recommendation_service
+    service.pipeline = RecordingPipeline(candidate_budget=60)
+    service.community_assigner.assign_users_bulk(users)
+    # ANN kaynağı ilk sırada en yakın üyeleri zaten alabilir; topluluk kaynağı tek başına ölçülür
+    service.similarity_engine.detach_index()
+    user_id, _ = user_with_co_members(service.community_assigner)
+
+    assert service.get_similar_users(int(user_id), limit=5)
+    assert len(service.pipeline.last_sources["community"])
+
+
+def test_service_excludes_existing_connections(recommendation_service, db_session):
+    from backend.models.community_model import Community, CommunityMember
+
+    service = recommendation_service
+    user_id = 1
+    community = Community(name="Satranç Kulübü", created_by=user_id)
+    db_session.add(community)
+    db_session.flush()
+    connected = [r['user_id'] for r in service._compute_similar_users(user_id, limit=3)]
+    for member_id in [user_id] + [int(uid) for uid in connected]:
+        db_session.add(CommunityMember(community_id=community.id, user_id=member_id))
+    db_session.commit()
+
+    service.pipeline = CandidatePipeline(candidate_budget=60)
+    results = service.get_similar_users(user_id, limit=5)
+    assert results
+    assert not {r['user_id'] for r in results} & set(connected)
+
+
+def test_batch_applies_business_rules_and_shares_cache(recommendation_service, db_session):
+    from backend.models.user_model import User
+
+    service = recommendation_service
+    service.pipeline = CandidatePipeline(candidate_budget=60)
+    user_ids = [1, 2, 3]
+    # Batch'ten önce önerilebilecek kullanıcıları pasifleştir (motordan çıkarılmadan)
+    inactive = {int(r['user_id']) for uid in user_ids
+                for r in service.pipeline.recommend(service.similarity_engine, service.community_assigner,
+                                                    str(uid), limit=5)}
+    db_session.query(User).filter(User.id.in_(inactive - set(user_ids))).update(
+        {User.is_active: False}, synchronize_session=False)
+    db_session.commit()
+    service.pipeline = CandidatePipeline(candidate_budget=60)
+
+    batch = service.get_similar_users_batch(user_ids, limit=5)
+
+    for uid in user_ids:
+        assert batch[uid]
+        assert not {int(r['user_id']) for r in batch[uid]} & (inactive - set(user_ids))
+        assert service.pipeline.seen(str(uid)) >= {r['user_id'] for r in batch[uid]}
+        # Tekil uç nokta aynı (filtrelenmiş) sonucu önbellekten döner
+        assert service.get_similar_users(uid, limit=5) == batch[uid]
@@ -0,0 +1,99 @@
+import threading
+
+from backend.tests.helpers import assert_sums_consistent
+
+
+def record_lock_state(optimizer, monkeypatch):
+    """Her batch'in hangi kilit altında puanlandığını kaydeder."""
+    lock = optimizer.assigner.similarity_engine.lock
+    states = []
+    original = optimizer._score_batch
+
+    def recording(*args, **kwargs):
+        states.append({
+            "writer": lock._writer == threading.get_ident(),
+            "reader": getattr(lock._local, 'reads', 0) > 0
+        })
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(optimizer, "_score_batch", recording)
+    return states
+
+
+def test_batches_are_scored_under_engine_lock(models, monkeypatch):
+    _, _, assigner = models
+    optimizer = assigner.optimizer
+    optimizer.batch_size = 32
+    states = record_lock_state(optimizer, monkeypatch)
+
+    report = optimizer.run(apply=False)
+    assert report["success"] and report["complete"]
+    assert states and all(s["reader"] and not s["writer"] for s in states)
+
+    states.clear()
+    report = optimizer.run(apply=True)
+    assert report["success"]
+    assert states and all(s["writer"] for s in states)
+    assert_sums_consistent(assigner)
+
+
+def test_members_removed_between_batches_are_skipped(models, monkeypatch):
+    _, engine, assigner = models
+    optimizer = assigner.optimizer
+    optimizer.batch_size = 32
+    members = optimizer._members()
+    removed = set(members[-40:])
+
+    original = optimizer._score_batch
+    calls = []
+
+    def remove_after_first(*args, **kwargs):
+        original(*args, **kwargs)
+        if not calls:
+            for uid in removed:
+                assigner.remove_user(uid)
+                engine.remove_user(uid)
+        calls.append(1)
+
+    monkeypatch.setattr(optimizer, "_score_batch", remove_after_first)
+    report = optimizer.run(apply=True)
+
+    assert report["success"] and len(calls) > 1
+    assert not removed & {move["user_id"] for move in report["moves"]}
+    assert_sums_consistent(assigner)
+
+
+def test_concurrent_updates_during_run_keep_sums_consistent(models, users):
+    _, engine, assigner = models
+    optimizer = assigner.optimizer
+    optimizer.batch_size = 16
+    reports = []
+
+    worker = threading.Thread(target=lambda: reports.append(optimizer.run(apply=True)))
+    worker.start()
+    for uid, data in users[:60]:
+        changed = dict(data, hobbies=list(data["hobbies"])[::-1] + ["satranç"])
+        engine.add_user(uid, changed)
+        assigner.refresh_member(uid)
+    worker.join()
+
+    assert reports and reports[0]["success"]
+    assert_sums_consistent(assigner)
+
+
+def test_rebuild_between_batches_stops_and_resets(models, monkeypatch):
+    _, _, assigner = models
+    optimizer = assigner.optimizer
+    optimizer.batch_size = 32
+    original = optimizer._score_batch
+
+    def rebuild_after_first(*args, **kwargs):
+        original(*args, **kwargs)
+        assigner.communities = list(assigner.communities)
+        assigner.rebuild_community_vectors()
+
+    monkeypatch.setattr(optimizer, "_score_batch", rebuild_after_first)
+    report = optimizer.run(apply=True)  # yazma kilidi tutulur; yeniden kurulum aynı thread'de iç içe alınır
+
+    assert report["success"] and not report["complete"]
+    assert optimizer._centroids == {} and optimizer._cursor == 0
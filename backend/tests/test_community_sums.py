@@ -0,0 +1,65 @@
+import numpy as np
+
+from backend.tests.helpers import assert_sums_consistent
+
+
+def member_and_other_community(assigner):
+    source = next(c for c in assigner.communities if len(c['members']) > 1)
+    target = next(c for c in assigner.communities if c['id'] != source['id'])
+    return source['members'][0], source['id'], target['id']
+
+
+def test_bulk_assignment_sums_are_consistent(models):
+    _, _, assigner = models
+    assert_sums_consistent(assigner)
+
+
+def test_move_user_keeps_sums_consistent(models):
+    _, _, assigner = models
+    user_id, source, target = member_and_other_community(assigner)
+
+    assert assigner.move_user(user_id, source, target)
+    assert_sums_consistent(assigner)
+
+
+def test_re_embed_after_move_keeps_sums_consistent(models, users):
+    _, engine, assigner = models
+    user_id, source, target = member_and_other_community(assigner)
+    assigner.move_user(user_id, source, target)
+
+    data = dict(next(data for uid, data in users if uid == user_id))
+    data['hobbies'] = ['kodlama', 'satranç', 'doğa']
+    data['personality_type'] = 'social_leader'
+    before = engine.get_embedding(user_id)
+    engine.add_user(user_id, data)
+    assert not np.allclose(engine.get_embedding(user_id), before)
+    assert assigner.refresh_member(user_id) == 1
+    assert_sums_consistent(assigner)
+
+    # Yeniden embed sonrası taşıma eklenen vektörü değil, katkıda bulunan vektörü düşer
+    assigner.move_user(user_id, target, source)
+    assert_sums_consistent(assigner)
+
+
+def test_removed_user_contribution_is_subtracted(models, users):
+    _, engine, assigner = models
+    user_id, _, _ = member_and_other_community(assigner)
+
+    engine.remove_user(user_id)
+    assigner.refresh_member(user_id)
+    assert_sums_consistent(assigner)
+
+    assert assigner.remove_user(user_id)
+    assert user_id not in assigner.community_members_of(users[-1][0])
+    assert_sums_consistent(assigner)
+
+
+def test_rebuild_matches_incremental_sums(models):
+    _, _, assigner = models
+    user_id, source, target = member_and_other_community(assigner)
+    assigner.move_user(user_id, source, target)
+    n = len(assigner.communities)
+    incremental = assigner._sums[:n].copy()
+
+    assigner.rebuild_community_vectors()
+    np.testing.assert_allclose(assigner._sums[:n], incremental, atol=1e-4)
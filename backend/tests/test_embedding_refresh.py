@@ -0,0 +1,106 @@
+import threading
+import time
+
+import numpy as np
+
+from backend.services.embedding_refresh_service import EmbeddingRefreshQueue
+
+
+class RecordingQueue(EmbeddingRefreshQueue):
+    """Batch'leri kaydeden, isteğe bağlı olarak bir kapı açılana kadar bekleyen kuyruk."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def _process(self, user_ids):
+        self.gate.wait(5.0)
+        self.batches.append(list(user_ids))
+        for callback in self._listeners:
+            callback(user_ids)
+
+
+def test_repeated_updates_are_coalesced():
+    from backend.app import app
+
+    queue = RecordingQueue(batch_size=64, batch_delay=0.05)
+    assert queue.enqueue(1, app=app)
+    assert not queue.enqueue(1, app=app)
+    assert queue.enqueue(2, app=app)
+    assert not queue.enqueue(2, app=app)
+    assert queue.flush()
+
+    assert sorted(uid for batch in queue.batches for uid in batch) == [1, 2]
+    stats = queue.get_stats()
+    assert stats["enqueued"] == 4 and stats["coalesced"] == 2 and stats["processed"] == 2
+    assert stats["depth"] == 0 and stats["worker_alive"]
+
+
+def test_users_are_processed_in_bounded_micro_batches():
+    from backend.app import app
+
+    queue = RecordingQueue(batch_size=4, batch_delay=0)
+    queue.gate.clear()
+    queue.enqueue(0, app=app)
+    for user_id in range(1, 10):
+        queue.enqueue(user_id, app=app)
+
+    # Worker ilk batch'te bekliyor: kalanlar kuyrukta görünür
+    stats = queue.get_stats()
+    assert stats["depth"] + stats["in_flight"] == 10
+    queue.gate.set()
+    assert queue.flush()
+
+    assert all(len(batch) <= 4 for batch in queue.batches)
+    assert [uid for batch in queue.batches for uid in batch] == list(range(10))
+    assert queue.get_stats()["max_lag_seconds"] > 0
+
+
+def test_user_enqueued_while_in_flight_is_processed_again():
+    from backend.app import app
+
+    queue = RecordingQueue(batch_size=8, batch_delay=0)
+    queue.gate.clear()
+    queue.enqueue(7, app=app)
+    deadline = time.time() + 5.0
+    while not queue.get_stats()["in_flight"] and time.time() < deadline:
+        time.sleep(0.001)
+    assert queue.enqueue(7, app=app)  # işlenen batch'teki kullanıcı yeniden kuyruğa girebilir
+    queue.gate.set()
+    assert queue.flush()
+    assert queue.batches == [[7], [7]]
+
+
+def test_listeners_receive_each_batch():
+    from backend.app import app
+
+    queue = RecordingQueue(batch_size=8, batch_delay=0)
+    received = []
+    queue.add_listener(received.append)
+    queue.enqueue(3, app=app)
+    assert queue.flush()
+    assert received == [[3]]
+
+
+def test_refresh_re_embeds_changed_users_only(recommendation_service, db_session, users):
+    from backend.models.user_model import User
+
+    service = recommendation_service
+    engine = service.similarity_engine
+    changed_id, unchanged_id = int(users[0][0]), int(users[1][0])
+    before = engine.get_embedding(str(changed_id))
+
+    user = db_session.get(User, changed_id)
+    user.hobbies = ["dans", "sinema", "fotoğraf"]
+    user.personality_type = "creative_extrovert"
+    db_session.commit()
+
+    assert service.refresh_user_embeddings([changed_id, unchanged_id]) == 1
+    assert not np.allclose(engine.get_embedding(str(changed_id)), before)
+
+    user.is_active = False
+    db_session.commit()
+    service.refresh_user_embeddings([changed_id])
+    assert not engine.has_user(str(changed_id))
@@ -0,0 +1,114 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from backend.ml.similarity_engine import SimilarityEngine
+from backend.tests.helpers import make_users
+
+
+@pytest.fixture
+def saved_engine(models, users, tmp_path):
+    preprocessor, engine, _ = models
+    engine.remove_user(users[1][0])  # boş satır (free list) da diske yazılmalı
+    directory = str(tmp_path / "engine_data")
+    engine.save_state(directory)
+    assert os.path.exists(os.path.join(directory, SimilarityEngine.HEADER_FILE))
+    return preprocessor, engine, directory
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_load_round_trip(saved_engine, users, mmap):
+    preprocessor, engine, directory = saved_engine
+    loaded = SimilarityEngine(preprocessor)
+    loaded.load_state(directory, mmap=mmap)
+
+    assert loaded.user_count == engine.user_count
+    assert not loaded.has_user(users[1][0])
+    assert loaded.user_metadata == engine.user_metadata
+
+    ids, matrix = engine.valid_snapshot()
+    loaded_ids, loaded_matrix = loaded.valid_snapshot()
+    assert loaded_ids == ids
+    np.testing.assert_array_equal(loaded_matrix, matrix)
+
+    for user_id, _ in users[2:12]:
+        assert loaded.find_similar_users(user_id, top_k=5) == engine.find_similar_users(user_id, top_k=5)
+
+
+def test_loaded_mmap_engine_accepts_writes(saved_engine, users):
+    preprocessor, engine, directory = saved_engine
+    loaded = SimilarityEngine(preprocessor)
+    loaded.load_state(directory, mmap=True)
+
+    new_users = make_users(3, seed=2, start_id=2000)
+    loaded.add_users(new_users)
+    loaded.remove_user(users[2][0])
+
+    assert loaded.user_count == engine.user_count + 2
+    assert loaded.find_similar_users(new_users[0][0], top_k=3)
+    # Diskteki durum yazmalardan etkilenmez
+    reloaded = SimilarityEngine(preprocessor)
+    reloaded.load_state(directory, mmap=True)
+    assert reloaded.user_count == engine.user_count
+    assert reloaded.has_user(users[2][0])
+
+
+def test_interrupted_save_keeps_previous_state(models, users, tmp_path, monkeypatch):
+    preprocessor, engine, _ = models
+    directory = str(tmp_path / "engine_data")
+    engine.save_state(directory)
+    _, saved_matrix = engine.valid_snapshot()
+
+    # Aynı satır sayısıyla farklı içerik: şekil kontrolü karışık bir durumu yakalayamazdı
+    data = dict(users[0][1], hobbies=["dans", "doğa", "fotoğraf"], personality_type="social_leader")
+    engine.add_user(users[0][0], data)
+
+    def crash_on_header(path, payload):
+        if path.endswith(SimilarityEngine.HEADER_FILE):
+            raise OSError("disk dolu")
+        SimilarityEngine._atomic_write_json(path, payload)
+
+    monkeypatch.setattr(engine, "_atomic_write_json", crash_on_header)
+    engine.save_state(directory)
+
+    loaded = SimilarityEngine(preprocessor)
+    loaded.load_state(directory, mmap=False)
+    np.testing.assert_array_equal(loaded.valid_snapshot()[1], saved_matrix)
+
+
+def test_save_keeps_current_and_previous_generation(models, tmp_path):
+    _, engine, _ = models
+    directory = str(tmp_path / "engine_data")
+    for _ in range(3):
+        engine.save_state(directory)
+
+    matrices = [f for f in os.listdir(directory) if f.startswith("embeddings.")]
+    assert len(matrices) == 2
+    with open(os.path.join(directory, SimilarityEngine.HEADER_FILE), encoding="utf-8") as f:
+        header = json.load(f)
+    assert header["files"][SimilarityEngine.MATRIX_FILE] in matrices
+
+
+def test_loads_version_1_layout(saved_engine):
+    preprocessor, engine, directory = saved_engine
+    header_path = os.path.join(directory, SimilarityEngine.HEADER_FILE)
+    with open(header_path, encoding="utf-8") as f:
+        header = json.load(f)
+    del header["generation"]
+    for name, filename in header.pop("files").items():
+        os.replace(os.path.join(directory, filename), os.path.join(directory, name))
+    header["format_version"] = 1
+    with open(header_path, "w", encoding="utf-8") as f:
+        json.dump(header, f)
+
+    loaded = SimilarityEngine(preprocessor)
+    loaded.load_state(directory, mmap=False)
+    assert loaded.valid_snapshot()[0] == engine.valid_snapshot()[0]
+
+    # Sonraki kayıt sürüm 1 dosyalarını bir nesil daha tutar, ardından siler
+    loaded.save_state(directory)
+    assert os.path.exists(os.path.join(directory, SimilarityEngine.MATRIX_FILE))
+    loaded.save_state(directory)
+    assert not os.path.exists(os.path.join(directory, SimilarityEngine.MATRIX_FILE))
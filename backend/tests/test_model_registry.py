@@ -0,0 +1,126 @@
+import threading
+
+from backend.ml.model_registry import ModelBundle, ModelRegistry
+
+
+def bundle(version):
+    return ModelBundle(version, preprocessor=None, similarity_engine=None)
+
+
+def wait_for_build(registry, timeout=5.0):
+    registry._build_thread.join(timeout)
+    assert not registry.is_building
+
+
+def test_publish_keeps_bounded_history():
+    registry = ModelRegistry(max_history=2)
+    for version in ("v1", "v2", "v3", "v4"):
+        registry.publish(bundle(version))
+
+    status = registry.status()
+    assert status["active_version"] == "v4"
+    assert status["history"] == ["v2", "v3"]
+
+
+def test_in_flight_reference_survives_publish():
+    registry = ModelRegistry()
+    registry.publish(bundle("v1"))
+    in_flight = registry.active
+
+    registry.publish(bundle("v2"))
+    assert in_flight.version == "v1"
+    assert registry.active.version == "v2"
+
+
+def test_rollback_to_previous_and_named_version():
+    registry = ModelRegistry(max_history=3)
+    for version in ("v1", "v2", "v3"):
+        registry.publish(bundle(version))
+
+    assert registry.rollback()
+    assert registry.active.version == "v2"
+    assert registry.status()["history"] == ["v1", "v3"]
+
+    assert registry.rollback("v1")
+    assert registry.active.version == "v1"
+    assert not registry.rollback("yok")
+    assert registry.active.version == "v1"
+
+
+def test_rollback_without_history_keeps_active():
+    registry = ModelRegistry()
+    registry.publish(bundle("v1"))
+    assert not registry.rollback()
+    assert registry.active.version == "v1"
+
+
+def test_build_async_publishes_and_catches_up_under_lock():
+    registry = ModelRegistry()
+    registry.publish(bundle("v0"))
+    publish_lock = threading.RLock()
+    release = threading.Event()
+    catch_up_calls, published = [], []
+
+    def builder(version):
+        release.wait(5.0)
+        return bundle(version)
+
+    def catch_up(new_bundle):
+        # İkinci çağrı yayından hemen önce, publish_lock tutulurken yapılır
+        catch_up_calls.append(publish_lock._is_owned())
+
+    assert registry.build_async(builder, on_published=published.append, catch_up=catch_up,
+                                publish_lock=publish_lock)
+    assert registry.is_building
+    assert not registry.build_async(builder)  # aynı anda tek kurulum
+    assert registry.active.version == "v0"  # kurulum sürerken eski sürüm servis edilir
+
+    release.set()
+    wait_for_build(registry)
+    assert registry.active.version != "v0"
+    assert published == [registry.active]
+    assert catch_up_calls == [False, True]
+    assert registry.last_error is None
+
+
+def test_failed_build_keeps_active_and_records_error():
+    registry = ModelRegistry()
+    registry.publish(bundle("v0"))
+
+    def builder(version):
+        raise RuntimeError("eğitim başarısız")
+
+    assert registry.build_async(builder)
+    wait_for_build(registry)
+    assert registry.active.version == "v0"
+    assert "eğitim başarısız" in registry.last_error
+
+
+def test_service_hot_swap_and_rollback(recommendation_service, users):
+    from backend.app import app
+
+    service = recommendation_service
+    old = service.models
+    user_id = int(users[0][0])
+    assert service.get_similar_users(user_id, limit=5)
+
+    assert service.reload_models_async(app)
+    wait_for_build(service.registry)
+    new = service.models
+    assert new is not old and new.similarity_engine.user_count == old.similarity_engine.user_count
+    # Eski set geri dönüş için tutulur ve hâlâ sorgulanabilir
+    assert old.similarity_engine.find_similar_users(str(user_id), top_k=3)
+
+    assert service.rollback_models()
+    assert service.models is old
+
+
+def test_health_reports_active_model_version():
+    from backend.app import app
+    from backend.ml.model_registry import model_registry
+
+    response = app.test_client().get("/health")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["ml_model_version"] == model_registry.status()["active_version"]
+    assert body["ml_models"]["active_version"] == body["ml_model_version"]
@@ -0,0 +1,173 @@
+import os
+
+import numpy as np
+import pytest
+
+from backend.ml.preprocessing import DataPreprocessor
+from backend.tests.helpers import make_users
+
+
+def snapshot(preprocessor):
+    return {
+        "mean": preprocessor.scaler.mean_.copy(),
+        "var": preprocessor.scaler.var_.copy(),
+        "n_samples": int(preprocessor.scaler.n_samples_seen_),
+        "n_docs": preprocessor.hobby_encoder.n_docs,
+        "doc_freq": preprocessor.hobby_encoder.doc_freq.copy(),
+        "feature_version": preprocessor.feature_version
+    }
+
+
+def assert_same_stats(before, after):
+    for key in ("mean", "var", "doc_freq"):
+        np.testing.assert_array_equal(after[key], before[key])
+    for key in ("n_samples", "n_docs", "feature_version"):
+        assert after[key] == before[key]
+
+
+def fitted_preprocessor(n=50):
+    preprocessor = DataPreprocessor(incremental=True)
+    preprocessor.fit([data for _, data in make_users(n)])
+    return preprocessor
+
+
+def test_partial_fit_skips_already_fitted_users():
+    preprocessor = fitted_preprocessor()
+    before = snapshot(preprocessor)
+
+    preprocessor.partial_fit([data for _, data in make_users(50)])
+    assert_same_stats(before, snapshot(preprocessor))
+
+
+def test_partial_fit_is_idempotent_for_new_users():
+    preprocessor = fitted_preprocessor()
+    new_users = [data for _, data in make_users(10, seed=3, start_id=500)]
+
+    preprocessor.partial_fit(new_users)
+    once = snapshot(preprocessor)
+    assert once["n_samples"] == 60
+
+    preprocessor.partial_fit(new_users)
+    preprocessor.fold_in_user(new_users[0])
+    assert_same_stats(once, snapshot(preprocessor))
+
+
+def test_partial_fit_counts_batch_duplicates_once():
+    preprocessor = fitted_preprocessor()
+    user = make_users(1, seed=4, start_id=700)[0][1]
+
+    preprocessor.partial_fit([user, dict(user)])
+    assert int(preprocessor.scaler.n_samples_seen_) == 51
+
+
+def test_fit_resets_seen_users():
+    preprocessor = fitted_preprocessor()
+    preprocessor.fit([data for _, data in make_users(20, start_id=900)])
+
+    preprocessor.partial_fit([data for _, data in make_users(5)])
+    assert int(preprocessor.scaler.n_samples_seen_) == 25
+
+
+def test_seen_users_survive_save_and_load(tmp_path):
+    preprocessor = fitted_preprocessor()
+    path = str(tmp_path / "preprocessor.pkl")
+    preprocessor.save(path)
+
+    loaded = DataPreprocessor(incremental=True)
+    loaded.load(path)
+    before = snapshot(loaded)
+    loaded.partial_fit([data for _, data in make_users(50)])
+    assert_same_stats(before, snapshot(loaded))
+
+
+def test_changed_profile_updates_vocabulary_and_embedding():
+    preprocessor = fitted_preprocessor()
+    encoder = preprocessor.hobby_encoder
+    user = make_users(1)[0][1]
+    old_terms = encoder.document_terms(user["hobbies"])[1]
+    old_freq = encoder.doc_freq.copy()
+    n_samples = int(preprocessor.scaler.n_samples_seen_)
+
+    changed = dict(user, hobbies=["okçuluk", "dağcılık"])
+    embedding = preprocessor.fold_in_user(changed)
+
+    assert {"okçuluk", "dağcılık"} <= set(encoder.vocabulary_)
+    assert encoder.n_docs == 50
+    np.testing.assert_array_equal(encoder.doc_freq[list(old_terms)], old_freq[list(old_terms)] - 1)
+    new_columns = {encoder.vocabulary_["okçuluk"], encoder.vocabulary_["dağcılık"]}
+    assert set(np.flatnonzero(preprocessor.transform_hobbies(changed["hobbies"]))) == new_columns
+    assert len(embedding) == preprocessor.embedding_size
+    assert int(preprocessor.scaler.n_samples_seen_) == n_samples + 1
+
+    # Aynı yeni içerik tekrar verilirse bir şey değişmez
+    before = snapshot(preprocessor)
+    preprocessor.partial_fit([changed])
+    assert_same_stats(before, snapshot(preprocessor))
+
+
+def test_academic_fields_are_one_hot_per_field():
+    preprocessor = DataPreprocessor(incremental=True)
+    a = preprocessor.encode_additional("Boğaziçi Üniversitesi", "Bilgisayar Mühendisliği")
+    b = preprocessor.encode_additional("  boğaziçi üniversitesi ", "Bilgisayar Mühendisliği")
+    np.testing.assert_array_equal(a, b)
+
+    buckets = preprocessor.ACADEMIC_BUCKETS
+    assert a.shape == (preprocessor.ADDITIONAL_DIM,)
+    assert a[:buckets].sum() == 1.0 and a[buckets:].sum() == 1.0
+    assert not preprocessor.encode_additional(None, None).any()
+
+    # Aynı değer farklı alanlarda ayrı bloklara düşer
+    same = preprocessor.encode_additional("Fizik", "Fizik")
+    assert np.flatnonzero(same)[0] < buckets <= np.flatnonzero(same)[1]
+
+
+def test_academic_buckets_are_process_independent():
+    # Kova özetten hesaplanır; sözlük ya da eğitim sırası yoktur
+    first = DataPreprocessor(incremental=True)
+    second = DataPreprocessor(incremental=True)
+    second.fit([data for _, data in reversed(make_users(30))])
+    for value in ("ODTÜ", "İTÜ", "Hukuk", "Tıp"):
+        assert first._academic_bucket("department", value) == second._academic_bucket("department", value)
+
+
+def test_distinct_departments_do_not_look_close():
+    preprocessor = DataPreprocessor(incremental=True)
+    values = ["Bilgisayar", "Elektrik", "Makine", "Hukuk", "Tıp", "Mimarlık"]
+    rows = preprocessor.additional_matrix([None] * len(values), values)
+    buckets = {int(np.flatnonzero(row)[0]) for row in rows}
+    similarity = rows @ rows.T
+    # Farklı kovadaki değerler ortogonaldir; sıralı kodlardaki gibi "komşu" değer olmaz
+    assert len(buckets) >= len(values) - 1
+    assert set(np.unique(similarity)) <= {0.0, 1.0}
+
+
+def test_load_rejects_incompatible_embedding_size(tmp_path):
+    path = str(tmp_path / "preprocessor.pkl")
+    fitted_preprocessor().save(path)
+
+    other = DataPreprocessor(incremental=True, max_hobby_features=32)
+    with pytest.raises(ValueError):
+        other.load(path)
+
+
+def test_service_persists_and_reuses_preprocessor(recommendation_service, users):
+    first = recommendation_service.models
+    assert os.path.exists(recommendation_service.preprocessor_path)
+
+    rebuilt = recommendation_service._build_models(recommendation_service.registry.next_version())
+    assert rebuilt.preprocessor.hobby_encoder.vocabulary_ == first.preprocessor.hobby_encoder.vocabulary_
+    # Kayıtlı tablo üzerine katlanır: değişmeyen kullanıcılar istatistikleri ikinci kez etkilemez
+    assert rebuilt.preprocessor.scaler.n_samples_seen_ == first.preprocessor.scaler.n_samples_seen_
+
+    user_id = str(users[0][0])
+    np.testing.assert_allclose(rebuilt.similarity_engine.row_vector(rebuilt.similarity_engine.row_of(user_id)),
+                               first.similarity_engine.row_vector(first.similarity_engine.row_of(user_id)))
+
+
+def test_service_retrains_when_saved_preprocessor_is_unusable(recommendation_service):
+    with open(recommendation_service.preprocessor_path, "wb") as f:
+        f.write(b"bozuk")
+
+    rebuilt = recommendation_service._build_models(recommendation_service.registry.next_version())
+    assert rebuilt.preprocessor.scaler_fitted
+    assert rebuilt.similarity_engine.user_count == recommendation_service.models.similarity_engine.user_count
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pytest
+
+from backend.ml.quantization import ScalarQuantizer, ProductQuantizer, evaluate_quantization
+from backend.tests.helpers import make_users
+
+
+@pytest.mark.parametrize("quantizer, min_recall", [(ScalarQuantizer(), 0.9), (ProductQuantizer(n_subspaces=8), 0.5)])
+def test_quantized_recall(models, quantizer, min_recall):
+    _, engine, _ = models
+    engine.attach_quantizer(quantizer, rerank=False)
+
+    report = evaluate_quantization(engine, sample_size=50)
+    assert report["success"]
+    assert report["recall_at_10"] >= min_recall
+
+
+def test_rerank_keeps_float_matrix_resident(models):
+    _, engine, _ = models
+    engine.attach_quantizer(ScalarQuantizer(), rerank=True)
+
+    footprint = engine.memory_footprint()
+    assert footprint["matrix_storage"] == "memory"
+    assert footprint["resident_bytes"] > footprint["float_bytes"]
+    assert footprint["compression_ratio"] < 1.0
+
+
+def test_codes_only_mode_spills_float_matrix(models, tmp_path):
+    _, engine, _ = models
+    baseline = engine.memory_footprint()
+    engine.attach_quantizer(ProductQuantizer(n_subspaces=8), rerank=False, spill_dir=str(tmp_path))
+
+    footprint = engine.memory_footprint()
+    assert footprint["matrix_storage"] == "mmap"
+    assert footprint["float_bytes"] == baseline["float_bytes"]
+    assert footprint["resident_bytes"] == footprint["code_bytes"] + footprint["row_state_bytes"]
+    assert footprint["compression_ratio"] > 4.0
+
+
+def test_spilled_matrix_survives_growth_and_detach(models, users, tmp_path):
+    _, engine, _ = models
+    _, before = engine.valid_snapshot()
+    engine.attach_quantizer(ScalarQuantizer(), rerank=False, spill_dir=str(tmp_path))
+
+    engine.add_users(make_users(2 * engine.capacity, seed=6, start_id=5000))
+    assert isinstance(engine._matrix, np.memmap)
+    assert engine.find_similar_users(users[0][0], top_k=5)
+
+    engine.detach_quantizer()
+    assert engine.memory_footprint()["matrix_storage"] == "memory"
+    np.testing.assert_array_equal(engine.valid_snapshot()[1][:len(before)], before)
+    assert not os.listdir(tmp_path)  # taşma dosyaları geride kalmaz
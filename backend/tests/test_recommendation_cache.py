@@ -0,0 +1,45 @@
+from backend.services.recommendation_cache import RecommendationCache
+
+
+def key(user_id, version='v1'):
+    return (user_id, 'similar_users', 5, version)
+
+
+def test_invalidate_user_drops_entries_that_reference_them():
+    cache = RecommendationCache()
+    cache.set(key(1), ['2', '3'], refs=[2, 3])
+    cache.set(key(4), ['3'], refs=[3])
+    cache.set(key(5), ['6'], refs=[6])
+
+    assert cache.invalidate_user(3) == 2
+    assert not cache.get(key(1))[0]
+    assert not cache.get(key(4))[0]
+    assert cache.get(key(5)) == (True, ['6'])
+
+
+def test_overwritten_entry_forgets_old_references():
+    cache = RecommendationCache()
+    cache.set(key(1), ['2'], refs=[2])
+    cache.set(key(1), ['3'], refs=[3])
+
+    assert cache.invalidate_user(2) == 0
+    assert cache.get(key(1)) == (True, ['3'])
+
+
+def test_get_or_compute_records_references():
+    cache = RecommendationCache()
+    cache.get_or_compute(1, 'similar_users', 5, 'v1', lambda: [{'user_id': '7'}],
+                         refs_of=lambda results: [int(r['user_id']) for r in results])
+
+    cache.invalidate_user(7)
+    assert not cache.get(key(1))[0]
+
+
+def test_eviction_and_version_change_clear_reverse_index():
+    cache = RecommendationCache(max_entries=1)
+    cache.set(key(1), [], refs=[2])
+    cache.set(key(3), [], refs=[4])
+    assert 2 not in cache._ref_keys
+
+    cache.get(key(3, version='v2'))
+    assert not cache._ref_keys and not cache._user_keys
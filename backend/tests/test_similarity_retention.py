@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+from backend.models.similarity_model import SimilarityGeneration, UserSimilarity
+from backend.tests.helpers import record, rows
+
+
+def seed(session, records):
+    UserSimilarity.bulk_upsert(records)
+    session.commit()
+
+
+def old(days=10):
+    return datetime.utcnow() - timedelta(days=days)
+
+
+def test_old_rows_are_deleted_in_bounded_chunks(db_session):
+    seed(db_session, [record(1, i, 0.5, calculated_at=old()) for i in range(2, 12)]
+         + [record(2, 1, 0.6)])
+
+    deleted = UserSimilarity.clear_old_similarities(days_old=7, chunk_size=3, pause=0)
+
+    assert deleted == 10
+    assert rows(db_session) == {(2, 1, 'overall', 0): 0.6}
+
+
+def test_max_chunks_bounds_a_single_run(db_session):
+    seed(db_session, [record(1, i, 0.5, calculated_at=old()) for i in range(2, 12)])
+
+    assert UserSimilarity.clear_old_similarities(days_old=7, chunk_size=3, pause=0, max_chunks=2) == 6
+    assert db_session.query(UserSimilarity).count() == 4
+    # Sonraki çalıştırma kalanları siler
+    assert UserSimilarity.clear_old_similarities(days_old=7, chunk_size=3, pause=0) == 4
+
+
+def test_user_scoped_expiry_covers_both_columns(db_session):
+    seed(db_session, [
+        record(1, 2, 0.5, calculated_at=old()),
+        record(3, 1, 0.5, calculated_at=old()),
+        record(2, 3, 0.5, calculated_at=old()),
+        record(1, 4, 0.5)
+    ])
+
+    assert UserSimilarity.clear_old_similarities(user_id=1, days_old=7, chunk_size=1, pause=0) == 2
+    assert set(rows(db_session)) == {(2, 3, 'overall', 0), (1, 4, 'overall', 0)}
+
+
+def test_readers_see_only_the_active_generation(db_session):
+    seed(db_session, [record(1, 2, 0.9, generation=0), record(1, 3, 0.8, generation=0)])
+    seed(db_session, [record(1, 4, 0.7, generation=1)])
+
+    assert [s.similar_user_id for s in UserSimilarity.get_similar_users(1)] == [2, 3]
+
+    SimilarityGeneration.activate('overall', 1)
+    db_session.commit()
+    assert [s.similar_user_id for s in UserSimilarity.get_similar_users(1)] == [4]
+
+
+def test_inactive_generations_are_dropped_per_type(db_session):
+    seed(db_session, [
+        record(1, 2, 0.9, generation=0),
+        record(1, 3, 0.8, generation=1),
+        record(1, 2, 0.6, generation=0, similarity_type='hobbies')
+    ])
+    SimilarityGeneration.activate('overall', 1)
+    db_session.commit()
+
+    assert UserSimilarity.drop_inactive_generations('overall', chunk_size=1, pause=0) == 1
+    assert set(rows(db_session)) == {(1, 3, 'overall', 1), (1, 2, 'hobbies', 0)}
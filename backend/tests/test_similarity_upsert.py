@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from backend.models.similarity_model import UserSimilarity
+from backend.tests.helpers import record, rows
+
+
+def test_bulk_upsert_inserts_new_pairs(db_session):
+    written = UserSimilarity.bulk_upsert([record(1, 2, 0.5), record(2, 1, 0.5), record(1, 3, 0.7)])
+    db_session.commit()
+
+    assert written == 3
+    assert rows(db_session) == {
+        (1, 2, 'overall', 0): 0.5,
+        (2, 1, 'overall', 0): 0.5,
+        (1, 3, 'overall', 0): 0.7
+    }
+
+
+def test_bulk_upsert_updates_existing_pairs_in_place(db_session):
+    old = datetime.utcnow() - timedelta(days=2)
+    UserSimilarity.bulk_upsert([record(1, 2, 0.5, calculated_at=old), record(1, 3, 0.7, calculated_at=old)])
+    db_session.commit()
+    first_id = db_session.query(UserSimilarity.id).filter_by(user_id=1, similar_user_id=2).scalar()
+
+    UserSimilarity.bulk_upsert([record(1, 2, 0.9), record(1, 4, 0.6)])
+    db_session.commit()
+
+    assert db_session.query(UserSimilarity).count() == 3
+    assert rows(db_session) == {
+        (1, 2, 'overall', 0): 0.9,
+        (1, 3, 'overall', 0): 0.7,
+        (1, 4, 'overall', 0): 0.6
+    }
+    updated = db_session.query(UserSimilarity).filter_by(user_id=1, similar_user_id=2).one()
+    assert updated.id == first_id
+    assert updated.calculated_at > old
+
+
+def test_bulk_upsert_keeps_generations_and_types_apart(db_session):
+    UserSimilarity.bulk_upsert([record(1, 2, 0.5, generation=0), record(1, 2, 0.4, similarity_type='hobbies')])
+    UserSimilarity.bulk_upsert([record(1, 2, 0.8, generation=1)])
+    db_session.commit()
+
+    assert rows(db_session) == {
+        (1, 2, 'overall', 0): 0.5,
+        (1, 2, 'hobbies', 0): 0.4,
+        (1, 2, 'overall', 1): 0.8
+    }
+
+
+def test_bulk_upsert_across_chunks(db_session):
+    records = [record(1, other, 0.1) for other in range(2, 12)]
+    UserSimilarity.bulk_upsert(records, chunk_size=3)
+    UserSimilarity.bulk_upsert([dict(r, similarity_score=0.2) for r in records], chunk_size=4)
+    db_session.commit()
+
+    scores = rows(db_session)
+    assert len(scores) == 10
+    assert set(scores.values()) == {0.2}
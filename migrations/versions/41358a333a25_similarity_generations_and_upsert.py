@@ -0,0 +1,64 @@
+"""similarity generations and upsert constraint
+
+user_similarities tablosuna toplu upsert için tekil kısıt, nesil kolonu ve temizlik
+indeksleri eklenir; similarity_generations tablosu oluşturulur. Kısıttan önce aynı
+(user_id, similar_user_id, similarity_type) için birden fazla olan kayıtların en yenisi
+(en büyük id) tutulur, diğerleri silinir.
+
+Revision ID: 41358a333a25
+Revises: b6744d664485
+Create Date: 2026-10-17 06:44:45.720662
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '41358a333a25'
+down_revision = 'b6744d664485'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('similarity_generations',
+    sa.Column('similarity_type', sa.String(length=20), nullable=False),
+    sa.Column('active_generation', sa.Integer(), nullable=False),
+    sa.Column('activated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('similarity_type')
+    )
+
+    # Mevcut satırlar nesil 0'a yazılır (NOT NULL kolon dolu tabloya server_default ile eklenir)
+    with op.batch_alter_table('user_similarities', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('generation', sa.Integer(), nullable=False, server_default='0'))
+
+    # NULL tür kısıtta çakışma sayılmaz; uygulamanın varsayılanına çekilir
+    op.execute("UPDATE user_similarities SET similarity_type = 'overall' WHERE similarity_type IS NULL")
+
+    # Kısıtı ihlal edecek tekrarlar: her anahtar için en yeni kayıt kalır
+    op.execute("""
+        DELETE FROM user_similarities
+        WHERE id NOT IN (
+            SELECT keep_id FROM (
+                SELECT MAX(id) AS keep_id
+                FROM user_similarities
+                GROUP BY user_id, similar_user_id, similarity_type, generation
+            ) AS keep
+        )
+    """)
+
+    with op.batch_alter_table('user_similarities', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_similarities_calculated_at'), ['calculated_at'], unique=False)
+        batch_op.create_index('ix_user_similarities_similar_user_id', ['similar_user_id'], unique=False)
+        batch_op.create_unique_constraint('uq_user_similarity_pair', ['user_id', 'similar_user_id', 'similarity_type', 'generation'])
+
+
+def downgrade():
+    with op.batch_alter_table('user_similarities', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_user_similarity_pair', type_='unique')
+        batch_op.drop_index('ix_user_similarities_similar_user_id')
+        batch_op.drop_index(batch_op.f('ix_user_similarities_calculated_at'))
+        batch_op.drop_column('generation')
+
+    op.drop_table('similarity_generations')
@@ -0,0 +1,232 @@
+"""baseline schema
+
+Revision ID: b6744d664485
+Revises: 
+Create Date: 2026-10-17 06:44:32.914716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6744d664485'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('university', sa.String(length=100), nullable=True),
+    sa.Column('department', sa.String(length=100), nullable=True),
+    sa.Column('year', sa.Integer(), nullable=True),
+    sa.Column('personality_type', sa.String(length=50), nullable=True),
+    sa.Column('personality_scores', sa.JSON(), nullable=True),
+    sa.Column('hobbies', sa.JSON(), nullable=True),
+    sa.Column('is_test_completed', sa.Boolean(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+        batch_op.create_index(batch_op.f('ix_users_is_active'), ['is_active'], unique=False)
+        batch_op.create_index(batch_op.f('ix_users_is_test_completed'), ['is_test_completed'], unique=False)
+        batch_op.create_index(batch_op.f('ix_users_personality_type'), ['personality_type'], unique=False)
+        batch_op.create_index(batch_op.f('ix_users_university'), ['university'], unique=False)
+
+    op.create_table('communities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('category', sa.String(length=50), nullable=True),
+    sa.Column('tags', sa.JSON(), nullable=True),
+    sa.Column('compatibility_score', sa.Float(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('max_members', sa.Integer(), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('communities', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_communities_category'), ['category'], unique=False)
+        batch_op.create_index(batch_op.f('ix_communities_compatibility_score'), ['compatibility_score'], unique=False)
+        batch_op.create_index(batch_op.f('ix_communities_created_by'), ['created_by'], unique=False)
+        batch_op.create_index(batch_op.f('ix_communities_is_active'), ['is_active'], unique=False)
+        batch_op.create_index(batch_op.f('ix_communities_name'), ['name'], unique=False)
+
+    op.create_table('hobby_results',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('hobbies', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('personality_test_results',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('personality_type', sa.String(length=50), nullable=False),
+    sa.Column('personality_scores', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('user_similarities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('similar_user_id', sa.Integer(), nullable=False),
+    sa.Column('similarity_score', sa.Float(), nullable=False),
+    sa.Column('similarity_type', sa.String(length=20), nullable=True),
+    sa.Column('calculated_at', sa.DateTime(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['similar_user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('chat_rooms',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('community_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.String(length=200), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('is_private', sa.Boolean(), nullable=True),
+    sa.Column('max_members', sa.Integer(), nullable=True),
+    sa.Column('current_members', sa.Integer(), nullable=True),
+    sa.Column('settings', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('last_activity', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['community_id'], ['communities.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('chat_rooms', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chat_rooms_community_id'), ['community_id'], unique=True)
+        batch_op.create_index(batch_op.f('ix_chat_rooms_is_active'), ['is_active'], unique=False)
+        batch_op.create_index(batch_op.f('ix_chat_rooms_last_activity'), ['last_activity'], unique=False)
+
+    op.create_table('community_members',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('community_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('role', sa.String(length=20), nullable=True),
+    sa.Column('joined_at', sa.DateTime(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('last_active', sa.DateTime(), nullable=True),
+    sa.Column('message_count', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['community_id'], ['communities.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('community_id', 'user_id', name='uq_community_user')
+    )
+    with op.batch_alter_table('community_members', schema=None) as batch_op:
+        batch_op.create_index('idx_community_user', ['community_id', 'user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_community_members_is_active'), ['is_active'], unique=False)
+        batch_op.create_index(batch_op.f('ix_community_members_role'), ['role'], unique=False)
+
+    op.create_table('chat_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('community_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('room_id', sa.Integer(), nullable=True),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('message_type', sa.String(length=20), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.Column('edited', sa.Boolean(), nullable=True),
+    sa.Column('edited_at', sa.DateTime(), nullable=True),
+    sa.Column('reply_to', sa.Integer(), nullable=True),
+    sa.Column('reactions', sa.JSON(), nullable=True),
+    sa.Column('metadata_json', sa.JSON(), nullable=True),
+    sa.ForeignKeyConstraint(['community_id'], ['communities.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['reply_to'], ['chat_messages.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['room_id'], ['chat_rooms.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('chat_messages', schema=None) as batch_op:
+        batch_op.create_index('idx_community_timestamp', ['community_id', 'timestamp'], unique=False)
+        batch_op.create_index('idx_user_messages', ['user_id', 'timestamp'], unique=False)
+        batch_op.create_index(batch_op.f('ix_chat_messages_community_id'), ['community_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_chat_messages_message_type'), ['message_type'], unique=False)
+        batch_op.create_index(batch_op.f('ix_chat_messages_room_id'), ['room_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_chat_messages_timestamp'), ['timestamp'], unique=False)
+        batch_op.create_index(batch_op.f('ix_chat_messages_user_id'), ['user_id'], unique=False)
+
+    op.create_table('chat_user_status',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('room_id', sa.Integer(), nullable=False),
+    sa.Column('is_online', sa.Boolean(), nullable=True),
+    sa.Column('last_seen', sa.DateTime(), nullable=True),
+    sa.Column('socket_id', sa.String(length=100), nullable=True),
+    sa.Column('total_messages', sa.Integer(), nullable=True),
+    sa.Column('joined_at', sa.DateTime(), nullable=True),
+    sa.Column('last_message_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['room_id'], ['chat_rooms.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'room_id', name='uq_user_room')
+    )
+    with op.batch_alter_table('chat_user_status', schema=None) as batch_op:
+        batch_op.create_index('idx_user_room_status', ['user_id', 'room_id', 'is_online'], unique=False)
+        batch_op.create_index(batch_op.f('ix_chat_user_status_is_online'), ['is_online'], unique=False)
+        batch_op.create_index(batch_op.f('ix_chat_user_status_last_seen'), ['last_seen'], unique=False)
+
+
+
+def downgrade():
+    with op.batch_alter_table('chat_user_status', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chat_user_status_last_seen'))
+        batch_op.drop_index(batch_op.f('ix_chat_user_status_is_online'))
+        batch_op.drop_index('idx_user_room_status')
+
+    op.drop_table('chat_user_status')
+    with op.batch_alter_table('chat_messages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chat_messages_user_id'))
+        batch_op.drop_index(batch_op.f('ix_chat_messages_timestamp'))
+        batch_op.drop_index(batch_op.f('ix_chat_messages_room_id'))
+        batch_op.drop_index(batch_op.f('ix_chat_messages_message_type'))
+        batch_op.drop_index(batch_op.f('ix_chat_messages_community_id'))
+        batch_op.drop_index('idx_user_messages')
+        batch_op.drop_index('idx_community_timestamp')
+
+    op.drop_table('chat_messages')
+    with op.batch_alter_table('community_members', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_community_members_role'))
+        batch_op.drop_index(batch_op.f('ix_community_members_is_active'))
+        batch_op.drop_index('idx_community_user')
+
+    op.drop_table('community_members')
+    with op.batch_alter_table('chat_rooms', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chat_rooms_last_activity'))
+        batch_op.drop_index(batch_op.f('ix_chat_rooms_is_active'))
+        batch_op.drop_index(batch_op.f('ix_chat_rooms_community_id'))
+
+    op.drop_table('chat_rooms')
+    op.drop_table('user_similarities')
+    op.drop_table('personality_test_results')
+    op.drop_table('hobby_results')
+    with op.batch_alter_table('communities', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_communities_name'))
+        batch_op.drop_index(batch_op.f('ix_communities_is_active'))
+        batch_op.drop_index(batch_op.f('ix_communities_created_by'))
+        batch_op.drop_index(batch_op.f('ix_communities_compatibility_score'))
+        batch_op.drop_index(batch_op.f('ix_communities_category'))
+
+    op.drop_table('communities')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_university'))
+        batch_op.drop_index(batch_op.f('ix_users_personality_type'))
+        batch_op.drop_index(batch_op.f('ix_users_is_test_completed'))
+        batch_op.drop_index(batch_op.f('ix_users_is_active'))
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+
+    op.drop_table('users')